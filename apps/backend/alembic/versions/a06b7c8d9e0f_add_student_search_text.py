@@ -0,0 +1,43 @@
+"""add trigram-indexed student search text
+
+Revision ID: a06b7c8d9e0f
+Revises: ff5a6b7c8d9e
+Create Date: 2026-10-17 16:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "a06b7c8d9e0f"
+down_revision: Union[str, None] = "ff5a6b7c8d9e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_TEXT_SQL = (
+    "translate(lower(coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' "
+    "|| coalesce(email, '') || ' ' || coalesce(phone, '')), 'áéíóúüñ', 'aeiouun')"
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        "students",
+        sa.Column("search_text", sa.Text(), sa.Computed(SEARCH_TEXT_SQL, persisted=True), nullable=True),
+    )
+    op.create_index(
+        "ix_students_search_text_trgm",
+        "students",
+        ["search_text"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"search_text": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_students_search_text_trgm", table_name="students")
+    op.drop_column("students", "search_text")
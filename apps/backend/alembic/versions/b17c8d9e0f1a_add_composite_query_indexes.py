@@ -0,0 +1,57 @@
+"""add composite and partial indexes for hot queries
+
+Revision ID: b17c8d9e0f1a
+Revises: a06b7c8d9e0f
+Create Date: 2026-10-17 17:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "b17c8d9e0f1a"
+down_revision: Union[str, None] = "a06b7c8d9e0f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nombre, tabla, columnas, where parcial)
+INDEXES = [
+    # asistencia por alumno/curso (portal, rollups, calendario, marcar asistencia)
+    ("ix_attendance_tenant_student_course_at", "attendance", ["tenant_id", "student_id", "course_id", "attended_at"], None),
+    # asistencia por curso y dia (course_status, asistencia de hoy, dashboard)
+    ("ix_attendance_tenant_course_at", "attendance", ["tenant_id", "course_id", "attended_at"], None),
+    # listado de pagos y cursor payment_date/created_at/id
+    ("ix_payments_tenant_date_created_id", "payments", ["tenant_id", "payment_date", "created_at", "id"], None),
+    ("ix_payments_tenant_type_student_course", "payments", ["tenant_id", "type", "student_id", "course_id"], None),
+    # flag de matricula pagada en el listado de alumnos
+    ("ix_payments_registration_student", "payments", ["tenant_id", "student_id"], "lower(type) = 'registration'"),
+    # matriculas vigentes / por vencer
+    ("ix_enrollments_tenant_active_end", "enrollments", ["tenant_id", "is_active", "end_date"], None),
+    # cursor del listado de alumnos (joined_at/created_at/id)
+    ("ix_students_tenant_joined_created_id", "students", ["tenant_id", "joined_at", "created_at", "id"], None),
+    # presencia de sesiones por tenant
+    ("ix_user_sessions_presence", "user_sessions", ["tenant_id", "last_seen_at"], "revoked_at IS NULL"),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY no puede correr dentro de una transaccion.
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _columns, _where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
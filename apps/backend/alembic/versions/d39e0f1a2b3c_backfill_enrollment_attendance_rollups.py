@@ -0,0 +1,79 @@
+"""backfill enrollment attendance rollups
+
+Revision ID: d39e0f1a2b3c
+Revises: b17c8d9e0f1a
+Create Date: 2026-10-17 19:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "d39e0f1a2b3c"
+down_revision: Union[str, None] = "b17c8d9e0f1a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Mismo calculo que app.pms.rollups: dias de clase con weekday lunes=0 (isodow - 1) y
+# asistencia comparada en rangos semiabiertos [inicio, fin + 1).
+BACKFILL_SQL = """
+INSERT INTO enrollment_attendance_rollups (
+    enrollment_id, tenant_id, student_id, course_id, period_start, period_end, course_updated_at,
+    expected_classes, scheduled_classes,
+    attended_in_period, attended_since_start, extra_outside, updated_at
+)
+SELECT
+    e.id, e.tenant_id, e.student_id, e.course_id, e.start_date, e.end_date, c.updated_at,
+    CASE
+        WHEN e.end_date = e.start_date THEN 1
+        WHEN coalesce(c.total_classes, 0) > 0 THEN c.total_classes
+        WHEN e.end_date IS NULL THEN NULL
+        ELSE s.scheduled
+    END,
+    s.scheduled,
+    count(a.id) FILTER (
+        WHERE a.attended_at >= e.start_date
+        AND (e.end_date IS NULL OR a.attended_at < e.end_date + 1)
+        AND (e.end_date = e.start_date OR a.notes IS NULL OR a.notes <> 'clase_suelta')
+    ),
+    count(a.id) FILTER (WHERE a.attended_at >= e.start_date AND (a.notes IS NULL OR a.notes <> 'clase_suelta')),
+    count(a.id) FILTER (
+        WHERE e.end_date IS NOT NULL AND (a.attended_at >= e.end_date + 1 OR a.notes = 'clase_suelta')
+    ),
+    now()
+FROM enrollments e
+JOIN courses c ON c.id = e.course_id
+CROSS JOIN LATERAL (
+    SELECT count(*) AS scheduled
+    FROM generate_series(e.start_date, e.end_date, interval '1 day') AS d
+    WHERE extract(isodow FROM d)::int - 1 IN (
+        c.day_of_week, c.day_of_week_2, c.day_of_week_3, c.day_of_week_4, c.day_of_week_5
+    )
+) s
+LEFT JOIN attendance a
+    ON a.tenant_id = e.tenant_id AND a.student_id = e.student_id AND a.course_id = e.course_id
+WHERE e.start_date IS NOT NULL
+GROUP BY e.id, c.id, s.scheduled
+ON CONFLICT (enrollment_id) DO UPDATE SET
+    period_start = excluded.period_start,
+    period_end = excluded.period_end,
+    course_updated_at = excluded.course_updated_at,
+    expected_classes = excluded.expected_classes,
+    scheduled_classes = excluded.scheduled_classes,
+    attended_in_period = excluded.attended_in_period,
+    attended_since_start = excluded.attended_since_start,
+    extra_outside = excluded.extra_outside,
+    updated_at = excluded.updated_at
+"""
+
+
+def upgrade() -> None:
+    # Las lecturas no escriben rollups: se generan aqui y luego los mantienen los endpoints de escritura.
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    # Solo datos derivados; fe4f5a6b7c8d borra la tabla.
+    pass
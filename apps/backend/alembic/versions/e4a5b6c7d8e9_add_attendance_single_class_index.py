@@ -0,0 +1,37 @@
+"""add partial index for single-class attendance marks
+
+Revision ID: e4a5b6c7d8e9
+Revises: d39e0f1a2b3c
+Create Date: 2026-10-17 21:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "e4a5b6c7d8e9"
+down_revision: Union[str, None] = "d39e0f1a2b3c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # course_status cuenta las clases sueltas previas al periodo: con este indice parcial
+    # esa rama no recorre el historial completo del alumno en el curso.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_attendance_single_class",
+            "attendance",
+            ["tenant_id", "student_id", "course_id", "attended_at"],
+            unique=False,
+            postgresql_concurrently=True,
+            postgresql_where=sa.text("notes = 'clase_suelta'"),
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_attendance_single_class", table_name="attendance", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,46 @@
+"""add whatsapp campaigns
+
+Revision ID: fc2d3e4f5a6b
+Revises: f4a5b6c7d8e9
+Create Date: 2026-10-17 10:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "fc2d3e4f5a6b"
+down_revision: Union[str, None] = "f4a5b6c7d8e9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "whatsapp_campaigns",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("tenant_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=40), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sent", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("failed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("skipped", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("started_at", sa.TIMESTAMP(), nullable=True),
+        sa.Column("finished_at", sa.TIMESTAMP(), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(), nullable=False),
+        sa.Column("updated_at", sa.TIMESTAMP(), nullable=False),
+        sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_whatsapp_campaigns_tenant_id"), "whatsapp_campaigns", ["tenant_id"], unique=False)
+    op.create_index(op.f("ix_whatsapp_campaigns_status"), "whatsapp_campaigns", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_whatsapp_campaigns_status"), table_name="whatsapp_campaigns")
+    op.drop_index(op.f("ix_whatsapp_campaigns_tenant_id"), table_name="whatsapp_campaigns")
+    op.drop_table("whatsapp_campaigns")
@@ -0,0 +1,41 @@
+"""add whatsapp status events
+
+Revision ID: fd3e4f5a6b7c
+Revises: fc2d3e4f5a6b
+Create Date: 2026-10-17 12:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "fd3e4f5a6b7c"
+down_revision: Union[str, None] = "fc2d3e4f5a6b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "whatsapp_status_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("sid", sa.String(length=64), nullable=False),
+        sa.Column("status", sa.String(length=40), nullable=True),
+        sa.Column("error_code", sa.String(length=40), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("received_at", sa.TIMESTAMP(), nullable=False, server_default=sa.func.now()),
+        sa.Column("next_attempt_at", sa.TIMESTAMP(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_whatsapp_status_events_sid"), "whatsapp_status_events", ["sid"], unique=False)
+    op.create_index(
+        op.f("ix_whatsapp_status_events_next_attempt_at"), "whatsapp_status_events", ["next_attempt_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_whatsapp_status_events_next_attempt_at"), table_name="whatsapp_status_events")
+    op.drop_index(op.f("ix_whatsapp_status_events_sid"), table_name="whatsapp_status_events")
+    op.drop_table("whatsapp_status_events")
@@ -0,0 +1,58 @@
+"""add enrollment attendance rollups
+
+Revision ID: fe4f5a6b7c8d
+Revises: fd3e4f5a6b7c
+Create Date: 2026-10-17 14:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "fe4f5a6b7c8d"
+down_revision: Union[str, None] = "fd3e4f5a6b7c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Las filas se cargan en d39e0f1a2b3c y las mantienen los endpoints de escritura.
+    op.create_table(
+        "enrollment_attendance_rollups",
+        sa.Column("enrollment_id", sa.Integer(), nullable=False),
+        sa.Column("tenant_id", sa.Integer(), nullable=False),
+        sa.Column("student_id", sa.Integer(), nullable=False),
+        sa.Column("course_id", sa.Integer(), nullable=False),
+        sa.Column("period_start", sa.Date(), nullable=False),
+        sa.Column("period_end", sa.Date(), nullable=True),
+        sa.Column("course_updated_at", sa.TIMESTAMP(), nullable=True),
+        sa.Column("expected_classes", sa.Integer(), nullable=True),
+        sa.Column("scheduled_classes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("attended_in_period", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("attended_since_start", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("extra_outside", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.TIMESTAMP(), nullable=False, server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(["enrollment_id"], ["enrollments.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["student_id"], ["students.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["course_id"], ["courses.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("enrollment_id"),
+    )
+    op.create_index(
+        op.f("ix_enrollment_attendance_rollups_tenant_id"), "enrollment_attendance_rollups", ["tenant_id"], unique=False
+    )
+    op.create_index(
+        op.f("ix_enrollment_attendance_rollups_student_id"), "enrollment_attendance_rollups", ["student_id"], unique=False
+    )
+    op.create_index(
+        op.f("ix_enrollment_attendance_rollups_course_id"), "enrollment_attendance_rollups", ["course_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_enrollment_attendance_rollups_course_id"), table_name="enrollment_attendance_rollups")
+    op.drop_index(op.f("ix_enrollment_attendance_rollups_student_id"), table_name="enrollment_attendance_rollups")
+    op.drop_index(op.f("ix_enrollment_attendance_rollups_tenant_id"), table_name="enrollment_attendance_rollups")
+    op.drop_table("enrollment_attendance_rollups")
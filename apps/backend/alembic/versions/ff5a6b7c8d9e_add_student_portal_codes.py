@@ -0,0 +1,41 @@
+"""add student portal codes
+
+Revision ID: ff5a6b7c8d9e
+Revises: fe4f5a6b7c8d
+Create Date: 2026-10-17 15:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "ff5a6b7c8d9e"
+down_revision: Union[str, None] = "fe4f5a6b7c8d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "student_portal_codes",
+        sa.Column("tenant_id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(length=255), nullable=False),
+        sa.Column("student_id", sa.Integer(), nullable=False),
+        sa.Column("code", sa.String(length=12), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("expires_at", sa.TIMESTAMP(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(), nullable=False, server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["student_id"], ["students.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("tenant_id", "email"),
+    )
+    op.create_index(op.f("ix_student_portal_codes_email"), "student_portal_codes", ["email"], unique=False)
+    op.create_index(op.f("ix_student_portal_codes_expires_at"), "student_portal_codes", ["expires_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_student_portal_codes_expires_at"), table_name="student_portal_codes")
+    op.drop_index(op.f("ix_student_portal_codes_email"), table_name="student_portal_codes")
+    op.drop_table("student_portal_codes")
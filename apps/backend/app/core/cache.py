@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+_MISSING = object()
+_registry: dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    """Cache en memoria del proceso con expiracion por entrada y LRU acotado.
+
+    No es compartido entre workers: cada proceso tiene su copia, por eso toda
+    escritura relevante debe invalidar explicitamente y el TTL acota la
+    desincronizacion entre procesos.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, maxsize: int = 1024):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        _registry[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float | None = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable = _MISSING) -> None:
+        self.invalidations += 1
+        if key is _MISSING:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        self.invalidations += 1
+        for key in [k for k in self._data if predicate(k)]:
+            del self._data[key]
+
+    def invalidate_values_where(self, predicate: Callable[[Any], bool]) -> None:
+        self.invalidations += 1
+        for key in [k for k, (_expires_at, value) in self._data.items() if predicate(value)]:
+            del self._data[key]
+
+    def values_where(self, predicate: Callable[[Hashable], bool]) -> list[Any]:
+        """Valores vigentes cuya clave cumple el predicado (sin tocar LRU ni contadores)."""
+        now = time.monotonic()
+        return [value for key, (expires_at, value) in self._data.items() if expires_at >= now and predicate(key)]
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+        }
+
+
+def cache_stats() -> dict[str, dict[str, Any]]:
+    return {name: cache.stats() for name, cache in _registry.items()}
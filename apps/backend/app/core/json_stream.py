@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from typing import Any, AsyncIterable, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+from app.core.responses import dumps
+
+
+# Respuestas JSON en streaming: cada elemento se serializa con orjson y se escribe apenas
+# esta listo. La salida es la misma que la de JSONResponse (JSON compacto en UTF-8).
+
+
+async def json_array_chunks(items: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+    yield b"["
+    first = True
+    async for item in items:
+        yield dumps(item) if first else b"," + dumps(item)
+        first = False
+    yield b"]"
+
+
+def streaming_json_response(chunks: AsyncIterable[bytes]) -> StreamingResponse:
+    return StreamingResponse(chunks, media_type="application/json")
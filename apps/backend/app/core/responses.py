@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.encoders import decimal_encoder
+from fastapi.responses import JSONResponse
+
+
+# Serializacion JSON del proyecto con orjson: fechas, horas y datetimes salen en ISO 8601
+# de forma nativa y Decimal igual que en jsonable_encoder (int si no tiene decimales).
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return decimal_encoder(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse con orjson. Devolverla directamente evita el paso por jsonable_encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,6 +1,9 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Callable, TypeVar, Union
 
+from fastapi import HTTPException
 from jose import jwt
 from passlib.context import CryptContext
 
@@ -8,6 +11,17 @@ from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+T = TypeVar("T")
+
+# bcrypt libera el GIL, asi que un pool de hilos chico basta para sacarlo del event loop.
+# El semaforo acota cuantas operaciones pueden esperar turno: una avalancha de logins
+# recibe 503 en vez de acumular trabajo y degradar el resto de la API.
+_password_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.password_hash_workers),
+    thread_name_prefix="password-hash",
+)
+_password_slots = asyncio.Semaphore(max(1, settings.password_hash_max_pending))
+
 
 def create_access_token(
     subject: Union[str, Any], expires_delta: timedelta | None = None, extra: dict | None = None
@@ -31,3 +45,26 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+async def _run_password_work(func: Callable[..., T], *args: Any) -> T:
+    try:
+        await asyncio.wait_for(_password_slots.acquire(), timeout=settings.password_hash_queue_timeout_seconds)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Servidor ocupado, intenta nuevamente en unos segundos")
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_slots.release()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_work(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_password_work(get_password_hash, password)
+
+
+def shutdown_password_executor() -> None:
+    _password_executor.shutdown(wait=False, cancel_futures=True)
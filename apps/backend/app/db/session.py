@@ -1,17 +1,65 @@
+import logging
+
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+
+def pool_limits() -> tuple[int, int]:
+    """(pool_size, max_overflow) por worker, dentro del presupuesto de conexiones."""
+    workers = max(1, settings.web_concurrency)
+    per_worker = (settings.db_max_connections - settings.db_reserved_connections) // workers
+    if per_worker < 1:
+        raise RuntimeError(
+            f"DB_MAX_CONNECTIONS={settings.db_max_connections} no alcanza para {workers} workers "
+            f"(reservadas: {settings.db_reserved_connections})"
+        )
+    pool_size = settings.db_pool_size or max(1, min(10, per_worker // 2))
+    max_overflow = (
+        settings.db_max_overflow if settings.db_max_overflow >= 0 else max(0, min(pool_size, per_worker - pool_size))
+    )
+    if pool_size + max_overflow > per_worker:
+        raise RuntimeError(
+            f"DB_POOL_SIZE + DB_MAX_OVERFLOW ({pool_size} + {max_overflow}) supera las {per_worker} "
+            f"conexiones disponibles por worker con WEB_CONCURRENCY={workers}"
+        )
+    return pool_size, max_overflow
+
+
+POOL_SIZE, MAX_OVERFLOW = pool_limits()
 
 engine = create_async_engine(
     settings.database_url,
-    pool_size=5,
-    max_overflow=10,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=settings.db_pool_timeout_seconds,
     pool_pre_ping=True,   # valida la conexión antes de usarla para evitar sockets cerrados
     pool_recycle=1800,    # recicla conexiones cada 30 min; ajusta según el timeout de tu DB
 )
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 
+async def check_connection_budget() -> None:
+    """Falla el arranque si todos los workers juntos pueden superar max_connections de Postgres."""
+    if not settings.db_check_max_connections:
+        return
+    try:
+        async with engine.connect() as conn:
+            server_max = int((await conn.execute(text("SHOW max_connections"))).scalar_one())
+    except Exception:
+        logger.warning("No se pudo leer max_connections de Postgres; se omite la validacion del pool")
+        return
+    required = max(1, settings.web_concurrency) * (POOL_SIZE + MAX_OVERFLOW) + settings.db_reserved_connections
+    if required > server_max:
+        raise RuntimeError(
+            f"El pool requiere hasta {required} conexiones ({settings.web_concurrency} workers x "
+            f"{POOL_SIZE + MAX_OVERFLOW} + {settings.db_reserved_connections} reservadas) y Postgres "
+            f"permite max_connections={server_max}"
+        )
+
+
 async def get_db():
     async with SessionLocal() as session:
         yield session
@@ -1,7 +1,8 @@
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
 from pathlib import Path
 import logging
 
@@ -20,8 +21,34 @@ from app.routers import pms_dashboard
 from app.routers import pms_reports
 from app.routers import pms_whatsapp
 from app.routers import pms_mercadopago
+from app.core.cache import cache_stats
+from app.core.responses import ORJSONResponse
+from app.core.security import shutdown_password_executor
+from app.db.session import check_connection_budget
+from app.pms.deps import get_current_active_superuser
+from app.pms.session_presence import start_session_ping_flusher, stop_session_ping_flusher
+from app.pms.twilio_client import close_twilio_client
+from app.routers.pms_whatsapp import (
+    cancel_whatsapp_campaigns,
+    start_whatsapp_status_worker,
+    stop_whatsapp_status_worker,
+)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await check_connection_budget()
+    start_whatsapp_status_worker()
+    start_session_ping_flusher()
+    yield
+    await stop_session_ping_flusher()
+    await stop_whatsapp_status_worker()
+    await cancel_whatsapp_campaigns()
+    await close_twilio_client()
+    shutdown_password_executor()
 
-app = FastAPI(title=settings.api_title)
+
+app = FastAPI(title=settings.api_title, lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS configuration
 cors_origins_raw = settings.cors_origins.split(',')
@@ -98,3 +125,9 @@ app.mount("/static", StaticFiles(directory=static_dir), name="static")
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/health/caches", dependencies=[Depends(get_current_active_superuser)])
+async def health_caches():
+    # Hit rate y tamaño de los caches en memoria de este worker
+    return cache_stats()
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.pms.models import AppSetting
+
+
+# Claves ausentes se cachean como "" para no volver a consultarlas en cada envio.
+_app_settings_cache = TTLCache("app_settings", ttl_seconds=settings.app_settings_cache_ttl_seconds, maxsize=256)
+
+
+async def get_app_settings(db: AsyncSession, keys: Iterable[str]) -> dict[str, str]:
+    values: dict[str, str] = {}
+    missing: list[str] = []
+    for key in keys:
+        cached = _app_settings_cache.get(key)
+        if cached is None:
+            missing.append(key)
+        else:
+            values[key] = cached
+
+    if missing:
+        rows = (
+            await db.execute(select(AppSetting.key, AppSetting.value).where(AppSetting.key.in_(missing)))
+        ).all()
+        loaded = {key: (value or "").strip() for key, value in rows}
+        for key in missing:
+            values[key] = loaded.get(key, "")
+            _app_settings_cache.set(key, values[key])
+    return values
+
+
+async def get_app_setting(db: AsyncSession, key: str) -> str:
+    return (await get_app_settings(db, (key,)))[key]
+
+
+def invalidate_app_settings(*keys: str) -> None:
+    if not keys:
+        _app_settings_cache.invalidate()
+        return
+    for key in keys:
+        _app_settings_cache.invalidate(key)
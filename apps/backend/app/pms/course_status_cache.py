@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import date
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+# Snapshot de /course_status por (tenant, dia, dia de semana, only_active). Los cambios de
+# asistencia, matriculas o pagos marcan solo ese curso como desactualizado y la siguiente
+# lectura recarga unicamente esos cursos; cambios de alumnos, cursos o profesores descartan
+# todo el tenant (tambien cuando el cambio no trae curso, p. ej. un pago sin curso).
+
+
+@dataclass
+class CourseStatusSnapshot:
+    courses: dict[int, dict]
+    stale: set[int] = field(default_factory=set)
+    # Se incrementa con cada marca: una recarga solo limpia `stale` si no hubo marcas nuevas.
+    version: int = 0
+    # Serializa las recargas: quien espera el lock no sirve cursos desactualizados como frescos.
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False, compare=False)
+
+
+_snapshot_cache = TTLCache(
+    "course_status_snapshot",
+    ttl_seconds=settings.course_status_cache_ttl_seconds,
+    maxsize=settings.course_status_cache_maxsize,
+)
+# Se incrementa en cada invalidacion: un snapshot armado mientras cambiaba el tenant no se guarda.
+_generations: dict[int, int] = {}
+
+
+def snapshot_key(tenant_id: int, day_of_week: int | None, only_active: bool) -> tuple:
+    return (tenant_id, date.today(), day_of_week, only_active)
+
+
+def tenant_generation(tenant_id: int) -> int:
+    return _generations.get(tenant_id, 0)
+
+
+def get_course_status_snapshot(key: tuple) -> CourseStatusSnapshot | None:
+    return _snapshot_cache.get(key)
+
+
+def set_course_status_snapshot(key: tuple, snapshot: CourseStatusSnapshot, generation: int) -> None:
+    if generation == tenant_generation(key[0]):
+        _snapshot_cache.set(key, snapshot)
+
+
+def invalidate_course_status(tenant_id: int, *course_ids: int | None) -> None:
+    """Marca los cursos indicados como desactualizados, o descarta todo el tenant si no se indica ninguno."""
+    _generations[tenant_id] = tenant_generation(tenant_id) + 1
+    ids = {cid for cid in course_ids if cid is not None}
+    if not ids:
+        _snapshot_cache.invalidate_where(lambda key: key[0] == tenant_id)
+        return
+    for snapshot in _snapshot_cache.values_where(lambda key: key[0] == tenant_id):
+        snapshot.stale |= ids
+        snapshot.version += 1
@@ -9,8 +9,10 @@ from jose import jwt, JWTError
 from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import make_transient_to_detached
 
 from app.db.session import get_db
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core import security
 from app.pms import models
@@ -24,6 +26,55 @@ reusable_oauth2 = OAuth2PasswordBearer(
 async def get_db_session(db: AsyncSession = Depends(get_db)) -> AsyncSession:
     return db
 
+# Principal autenticado por jti (o por sub si el token no trae jti): evita las consultas de
+# sesion y usuario en cada request. Logout, revocaciones y cambios de usuario invalidan el
+# cache local; con varios workers (AUTH_PRINCIPAL_SHARED_CHECK) cada hit se confirma ademas
+# con una consulta liviana a Postgres, asi una revocacion hecha en otro worker rige de inmediato.
+_principal_cache = TTLCache(
+    "auth_principal",
+    ttl_seconds=settings.auth_principal_cache_ttl_seconds,
+    maxsize=settings.auth_principal_cache_maxsize,
+)
+_USER_SNAPSHOT_FIELDS = tuple(column.key for column in models.User.__table__.columns)
+
+
+def _principal_key(payload: dict, token_data: token_schema.TokenPayload) -> tuple:
+    jti = payload.get("jti")
+    return ("jti", str(jti)) if jti else ("sub", str(token_data.sub))
+
+
+def _user_from_snapshot(snapshot: dict) -> models.User:
+    # Copia detached por request: no se comparte una instancia ORM entre sesiones.
+    user = models.User(**snapshot)
+    make_transient_to_detached(user)
+    return user
+
+
+async def _principal_still_valid(db: AsyncSession, payload: dict, snapshot: dict) -> bool:
+    """Sesion no revocada/expirada y usuario sin cambios desde que se guardo en cache."""
+    jti = payload.get("jti")
+    stmt = select(models.User.updated_at).where(models.User.id == snapshot["id"])
+    if jti:
+        stmt = stmt.join(models.UserSession, models.UserSession.user_id == models.User.id).where(
+            models.UserSession.token_jti == str(jti),
+            models.UserSession.revoked_at.is_(None),
+            models.UserSession.expires_at > datetime.utcnow(),
+        )
+    updated_at = (await db.execute(stmt)).scalar_one_or_none()
+    return updated_at is not None and updated_at == snapshot["updated_at"]
+
+
+def invalidate_principal(jti: str) -> None:
+    _principal_cache.invalidate(("jti", str(jti)))
+
+
+def invalidate_principals(*, user_id: int | None = None, tenant_id: int | None = None) -> None:
+    if user_id is not None:
+        _principal_cache.invalidate_values_where(lambda entry: entry[1]["id"] == user_id)
+    if tenant_id is not None:
+        _principal_cache.invalidate_values_where(lambda entry: entry[1]["tenant_id"] == tenant_id)
+
+
 async def get_current_user(
     db: AsyncSession = Depends(get_db), token: str = Depends(reusable_oauth2)
 ) -> models.User:
@@ -37,8 +88,19 @@ async def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
+    cache_key = _principal_key(payload, token_data)
+    cached = _principal_cache.get(cache_key)
+    if cached is not None:
+        session_expires_at, snapshot = cached
+        if (session_expires_at is None or session_expires_at > datetime.utcnow()) and (
+            not settings.auth_principal_shared_check or await _principal_still_valid(db, payload, snapshot)
+        ):
+            return _user_from_snapshot(snapshot)
+        _principal_cache.invalidate(cache_key)
+
     # Si el token viene con jti, validar que la sesión siga activa.
     jti = payload.get("jti")
+    session_expires_at = None
     if jti:
         session_res = await db.execute(
             select(models.UserSession).where(models.UserSession.token_jti == str(jti))
@@ -53,12 +115,15 @@ async def get_current_user(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Sesion cerrada o expirada. Vuelve a iniciar sesion.",
             )
+        session_expires_at = session.expires_at
     result = await db.execute(select(models.User).where(models.User.id == token_data.sub))
     user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    snapshot = {field: getattr(user, field) for field in _USER_SNAPSHOT_FIELDS}
+    _principal_cache.set(cache_key, (session_expires_at, snapshot))
     return user
 
 async def get_current_active_superuser(
@@ -13,6 +13,9 @@ from sqlalchemy import (
     Time,
     Boolean,
     Numeric,
+    Computed,
+    Index,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -37,6 +40,9 @@ class User(Base):
 
 class UserSession(Base):
     __tablename__ = "user_sessions"
+    __table_args__ = (
+        Index("ix_user_sessions_presence", "tenant_id", "last_seen_at", postgresql_where=text("revoked_at IS NULL")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     tenant_id: Mapped[Optional[int]] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), index=True, nullable=True)
@@ -116,8 +122,25 @@ class AppSetting(Base):
     updated_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 
+# Texto de busqueda sin mayusculas ni tildes, mantenido por Postgres (columna generada)
+# e indexado con pg_trgm para servir ILIKE '%termino%'.
+STUDENT_SEARCH_TEXT_SQL = (
+    "translate(lower(coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' "
+    "|| coalesce(email, '') || ' ' || coalesce(phone, '')), 'áéíóúüñ', 'aeiouun')"
+)
+
+
 class Student(Base):
     __tablename__ = "students"
+    __table_args__ = (
+        Index(
+            "ix_students_search_text_trgm",
+            "search_text",
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+        ),
+        Index("ix_students_tenant_joined_created_id", "tenant_id", "joined_at", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), index=True)
@@ -134,10 +157,26 @@ class Student(Base):
     inactive_note: Mapped[Optional[str]] = mapped_column(Text())
     inactive_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP)
     portal_enabled: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    search_text: Mapped[Optional[str]] = mapped_column(
+        Text(), Computed(STUDENT_SEARCH_TEXT_SQL, persisted=True), deferred=True
+    )
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=datetime.utcnow, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 
+class StudentPortalCode(Base):
+    __tablename__ = "student_portal_codes"
+
+    # Un codigo vigente por (tenant, email); compartido entre workers.
+    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), primary_key=True)
+    email: Mapped[str] = mapped_column(String(255), primary_key=True, index=True)
+    student_id: Mapped[int] = mapped_column(ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    code: Mapped[str] = mapped_column(String(12), nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(TIMESTAMP, nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+
+
 class Teacher(Base):
     __tablename__ = "teachers"
 
@@ -217,6 +256,9 @@ class Course(Base):
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
+    __table_args__ = (
+        Index("ix_enrollments_tenant_active_end", "tenant_id", "is_active", "end_date"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), index=True)
@@ -231,6 +273,18 @@ class Enrollment(Base):
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        Index("ix_attendance_tenant_student_course_at", "tenant_id", "student_id", "course_id", "attended_at"),
+        Index("ix_attendance_tenant_course_at", "tenant_id", "course_id", "attended_at"),
+        Index(
+            "ix_attendance_single_class",
+            "tenant_id",
+            "student_id",
+            "course_id",
+            "attended_at",
+            postgresql_where=text("notes = 'clase_suelta'"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), index=True)
@@ -242,8 +296,37 @@ class Attendance(Base):
     is_recovery: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 
 
+class EnrollmentAttendanceRollup(Base):
+    __tablename__ = "enrollment_attendance_rollups"
+
+    enrollment_id: Mapped[int] = mapped_column(ForeignKey("enrollments.id", ondelete="CASCADE"), primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), index=True)
+    student_id: Mapped[int] = mapped_column(ForeignKey("students.id", ondelete="CASCADE"), index=True)
+    course_id: Mapped[int] = mapped_column(ForeignKey("courses.id", ondelete="CASCADE"), index=True)
+    # Copia del periodo/curso con el que se calcularon los conteos (para detectar desfase).
+    period_start: Mapped[date] = mapped_column(Date, nullable=False)
+    period_end: Mapped[Optional[date]] = mapped_column(Date)
+    course_updated_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP)
+    expected_classes: Mapped[Optional[int]] = mapped_column(Integer)  # None: periodo abierto sin total configurado
+    scheduled_classes: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    attended_in_period: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    attended_since_start: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    extra_outside: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_tenant_date_created_id", "tenant_id", "payment_date", "created_at", "id"),
+        Index("ix_payments_tenant_type_student_course", "tenant_id", "type", "student_id", "course_id"),
+        Index(
+            "ix_payments_registration_student",
+            "tenant_id",
+            "student_id",
+            postgresql_where=text("lower(type) = 'registration'"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), index=True)
@@ -282,6 +365,36 @@ class WhatsAppMessageLog(Base):
     updated_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 
+class WhatsAppStatusEvent(Base):
+    __tablename__ = "whatsapp_status_events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    sid: Mapped[str] = mapped_column(String(64), index=True, nullable=False)
+    status: Mapped[Optional[str]] = mapped_column(String(40))
+    error_code: Mapped[Optional[str]] = mapped_column(String(40))
+    error_message: Mapped[Optional[str]] = mapped_column(Text())
+    received_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=datetime.utcnow, nullable=False, index=True)
+
+
+class WhatsAppCampaign(Base):
+    __tablename__ = "whatsapp_campaigns"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), index=True)
+    kind: Mapped[str] = mapped_column(String(40), nullable=False)  # payment_reminders
+    status: Mapped[str] = mapped_column(String(20), default="queued", nullable=False, index=True)  # queued, running, completed, failed, cancelled
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    sent: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    skipped: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(Text())
+    started_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP)
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
 class Rental(Base):
     __tablename__ = "rentals"
 
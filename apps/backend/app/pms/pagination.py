@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Mapping, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+
+# Paginacion por cursor (keyset): el cursor codifica los valores de orden de la ultima fila
+# y la pagina siguiente filtra "despues de" esa fila en vez de usar OFFSET.
+
+
+def _dump(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"t": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"n": str(value)}
+    return value
+
+
+def _load(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "t" in value:
+            return datetime.fromisoformat(value["t"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "n" in value:
+            return Decimal(value["n"])
+    return value
+
+
+class Keyset:
+    """Orden de un listado (expresion, descendente) con su cursor opaco."""
+
+    def __init__(self, name: str, *order: tuple[ColumnElement, bool]):
+        self.name = name
+        self.order = order
+        self.columns = [expr.label(f"_k{i}") for i, (expr, _desc) in enumerate(order)]
+
+    def order_by(self) -> list[ColumnElement]:
+        return [expr.desc() if desc else expr.asc() for expr, desc in self.order]
+
+    def after(self, cursor: str) -> ColumnElement:
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii") + b"=" * (-len(cursor) % 4)))
+            values = [_load(value) for value in raw["v"]]
+            valid = raw.get("k") == self.name and len(values) == len(self.order)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            valid = False
+        if not valid:
+            raise HTTPException(status_code=400, detail="Cursor invalido")
+
+        directions = {desc for _expr, desc in self.order}
+        exprs = [expr for expr, _desc in self.order]
+        if len(directions) == 1:
+            # Misma direccion en todas las columnas: comparacion de tuplas (usa el indice compuesto)
+            left, right = tuple_(*exprs), tuple_(*values)
+            return left < right if directions.pop() else left > right
+        clauses = []
+        for i, (expr, desc) in enumerate(self.order):
+            prefix = [exprs[j] == values[j] for j in range(i)]
+            clauses.append(and_(*prefix, expr < values[i] if desc else expr > values[i]))
+        return or_(*clauses)
+
+    def cursor_for(self, row: Mapping[str, Any] | Sequence[Any]) -> str:
+        mapping = row._mapping if hasattr(row, "_mapping") else row
+        values = [_dump(mapping[f"_k{i}"]) for i in range(len(self.order))]
+        raw = json.dumps({"k": self.name, "v": values}, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def next_cursor(self, rows: Sequence[Any], limit: int) -> str | None:
+        return self.cursor_for(rows[-1]) if rows and len(rows) >= limit else None
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import date
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.responses import dumps
+
+
+# Resumen del portal del alumno por (tenant, alumno, dia), ya serializado a JSON con su
+# ETag. El dia va en la clave porque el resumen depende de "hoy"; las escrituras invalidan
+# por (tenant, alumno) o por tenant.
+_portal_summary_cache = TTLCache(
+    "student_portal_summary",
+    ttl_seconds=settings.portal_summary_cache_ttl_seconds,
+    maxsize=settings.portal_summary_cache_maxsize,
+)
+
+
+def portal_summary_etag(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def get_cached_portal_summary(tenant_id: int, student_id: int) -> tuple[str, bytes] | None:
+    return _portal_summary_cache.get((tenant_id, student_id, date.today()))
+
+
+def set_cached_portal_summary(tenant_id: int, student_id: int, payload: dict) -> tuple[str, bytes]:
+    body = dumps(payload)
+    entry = (portal_summary_etag(body), body)
+    _portal_summary_cache.set((tenant_id, student_id, date.today()), entry)
+    return entry
+
+
+def invalidate_student_portal(tenant_id: int, *student_ids: int | None) -> None:
+    """Invalida el resumen de los alumnos indicados, o de todo el tenant si no se indica ninguno."""
+    ids = {sid for sid in student_ids if sid is not None}
+    if not student_ids:
+        _portal_summary_cache.invalidate_where(lambda key: key[0] == tenant_id)
+    elif ids:
+        _portal_summary_cache.invalidate_where(lambda key: key[0] == tenant_id and key[1] in ids)
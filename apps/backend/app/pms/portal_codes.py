@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import secrets
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.pms.models import Student, StudentPortalCode
+
+
+# Codigos de acceso al portal del alumno guardados en Postgres, para que un codigo emitido
+# por un worker se pueda canjear en cualquier otro. Ninguna funcion hace commit.
+
+
+async def purge_expired_portal_codes(db: AsyncSession) -> None:
+    await db.execute(delete(StudentPortalCode).where(StudentPortalCode.expires_at < datetime.utcnow()))
+
+
+async def issue_portal_code(db: AsyncSession, student: Student, tenant_id: int, minutes: int = 60) -> dict[str, object]:
+    email = (student.email or "").strip().lower()
+    code = f"{secrets.randbelow(1000000):06d}"
+    await purge_expired_portal_codes(db)
+    stmt = pg_insert(StudentPortalCode).values(
+        tenant_id=tenant_id,
+        email=email,
+        student_id=student.id,
+        code=code,
+        attempts=0,
+        expires_at=datetime.utcnow() + timedelta(minutes=minutes),
+        created_at=datetime.utcnow(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StudentPortalCode.tenant_id, StudentPortalCode.email],
+        set_={col: stmt.excluded[col] for col in ("student_id", "code", "attempts", "expires_at", "created_at")},
+    )
+    await db.execute(stmt)
+    return {"code": code, "expires_in_minutes": minutes}
+
+
+async def redeem_portal_code(
+    db: AsyncSession, email: str, code: str, tenant_id: int | None = None
+) -> StudentPortalCode | None:
+    """Devuelve y elimina el codigo si es valido; si no, suma un intento fallido.
+
+    Si no viene tenant se buscan los codigos del email en todos los tenants.
+    """
+    query = select(StudentPortalCode).where(StudentPortalCode.email == email).with_for_update()
+    if tenant_id is not None:
+        query = query.where(StudentPortalCode.tenant_id == tenant_id)
+    candidates = (await db.execute(query)).scalars().all()
+    entry = next((row for row in candidates if secrets.compare_digest(row.code.encode(), code.encode())), None)
+    if entry is None:
+        if candidates:
+            await db.execute(
+                update(StudentPortalCode)
+                .where(
+                    StudentPortalCode.email == email,
+                    StudentPortalCode.tenant_id.in_([row.tenant_id for row in candidates]),
+                )
+                .values(attempts=StudentPortalCode.attempts + 1)
+            )
+            # Tras agotar los intentos el codigo deja de servir
+            await db.execute(
+                delete(StudentPortalCode).where(
+                    StudentPortalCode.email == email,
+                    StudentPortalCode.attempts >= settings.portal_code_max_attempts,
+                )
+            )
+        return None
+    await db.delete(entry)
+    return entry
+
+
+async def revoke_portal_codes(db: AsyncSession, email: str, tenant_id: int) -> None:
+    await db.execute(
+        delete(StudentPortalCode).where(StudentPortalCode.email == email, StudentPortalCode.tenant_id == tenant_id)
+    )
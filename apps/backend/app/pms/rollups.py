@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import Integer, select, func, and_, or_, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.pms.models import Attendance, Course, Enrollment, EnrollmentAttendanceRollup
+from app.pms.schedule import count_weekdays_many, course_weekdays
+
+
+# Conteos de asistencia por matricula/periodo. Se recalculan solo para las matriculas
+# afectadas por cada escritura y se leen como una fila por matricula.
+ROLLUP_COUNT_FIELDS = (
+    "expected_classes",
+    "scheduled_classes",
+    "attended_in_period",
+    "attended_since_start",
+    "extra_outside",
+)
+
+
+# Asistencia contra fechas de matricula como rangos semiabiertos de timestamp: la fecha se
+# promueve a timestamp (y fin + 1 dia) para que attended_at siga usando su indice.
+def attended_from(day) -> ColumnElement[bool]:
+    return Attendance.attended_at >= day
+
+
+def attended_through(day) -> ColumnElement[bool]:
+    return Attendance.attended_at < day + literal_column("1", Integer)
+
+
+def attended_after(day) -> ColumnElement[bool]:
+    return Attendance.attended_at >= day + literal_column("1", Integer)
+
+
+def _expected_for_period(enrollment: Enrollment, course: Course, scheduled: int) -> int | None:
+    start, end = enrollment.start_date, enrollment.end_date
+    if end and start == end:
+        return 1
+    configured_total = int(getattr(course, "total_classes", None) or 0)
+    if configured_total > 0:
+        return configured_total
+    if end is None:
+        return None
+    return scheduled
+
+
+def _attendance_join():
+    return and_(
+        Attendance.tenant_id == Enrollment.tenant_id,
+        Attendance.student_id == Enrollment.student_id,
+        Attendance.course_id == Enrollment.course_id,
+    )
+
+
+def _is_stale(row: EnrollmentAttendanceRollup, enrollment: Enrollment, course: Course) -> bool:
+    # Los escritores mantienen las filas al dia; esto solo cubre cambios de periodo o curso
+    # hechos fuera de esos endpoints (comparacion contra objetos ya cargados, sin consultas).
+    return (
+        row.period_start != enrollment.start_date
+        or row.period_end != enrollment.end_date
+        or row.course_updated_at != getattr(course, "updated_at", None)
+    )
+
+
+async def _compute_rollups(
+    db: AsyncSession, rows: list[tuple[Enrollment, Course]]
+) -> dict[int, dict[str, int | None]]:
+    """Conteos de asistencia por matricula, en una sola consulta agrupada."""
+    not_single_class = or_(Attendance.notes == None, Attendance.notes != "clase_suelta")
+    is_single_period = and_(Enrollment.end_date != None, Enrollment.start_date == Enrollment.end_date)
+    in_period = and_(
+        attended_from(Enrollment.start_date),
+        or_(Enrollment.end_date == None, attended_through(Enrollment.end_date)),
+    )
+    counts = (
+        await db.execute(
+            select(
+                Enrollment.id,
+                func.count(Attendance.id).filter(and_(in_period, or_(is_single_period, not_single_class))),
+                func.count(Attendance.id).filter(and_(attended_from(Enrollment.start_date), not_single_class)),
+                func.count(Attendance.id).filter(
+                    and_(
+                        Enrollment.end_date != None,
+                        or_(attended_after(Enrollment.end_date), Attendance.notes == "clase_suelta"),
+                    )
+                ),
+            )
+            .select_from(Enrollment)
+            .outerjoin(Attendance, _attendance_join())
+            .where(Enrollment.id.in_([enr.id for enr, _course in rows]))
+            .group_by(Enrollment.id)
+        )
+    ).all()
+    counts_by_id = {int(eid): tuple(values) for eid, *values in counts}
+
+    # Clases programadas de todos los periodos cerrados en una sola pasada
+    scheduled_counts = iter(
+        count_weekdays_many(
+            (enr.start_date, enr.end_date, course_weekdays(course)) for enr, course in rows if enr.end_date
+        )
+    )
+
+    result: dict[int, dict[str, int | None]] = {}
+    for enr, course in rows:
+        attended_in_period, attended_since_start, extra_outside = counts_by_id.get(enr.id, (0, 0, 0))
+        scheduled = next(scheduled_counts) if enr.end_date else 0
+        result[enr.id] = {
+            "expected_classes": _expected_for_period(enr, course, scheduled),
+            "scheduled_classes": scheduled,
+            "attended_in_period": int(attended_in_period or 0),
+            "attended_since_start": int(attended_since_start or 0),
+            "extra_outside": int(extra_outside or 0),
+        }
+    return result
+
+
+async def refresh_enrollment_rollups(
+    db: AsyncSession,
+    tenant_id: int,
+    *,
+    enrollment_ids: Iterable[int] | None = None,
+    student_id: int | None = None,
+    course_id: int | None = None,
+) -> dict[int, dict[str, int | None]]:
+    """Recalcula (upsert) los rollups de las matriculas indicadas. No hace commit.
+
+    Bloquea las matriculas (FOR UPDATE) hasta el commit del llamador: dos marcas concurrentes
+    sobre el mismo alumno/curso se serializan y la segunda cuenta la asistencia de la primera.
+    """
+    conditions = [Enrollment.tenant_id == tenant_id]
+    if enrollment_ids is not None:
+        ids = list(enrollment_ids)
+        if not ids:
+            return {}
+        conditions.append(Enrollment.id.in_(ids))
+    if student_id is not None:
+        conditions.append(Enrollment.student_id == student_id)
+    if course_id is not None:
+        conditions.append(Enrollment.course_id == course_id)
+
+    rows = (
+        await db.execute(
+            select(Enrollment, Course)
+            .join(Course, Course.id == Enrollment.course_id)
+            .where(*conditions)
+            .order_by(Enrollment.id)
+            .with_for_update(of=Enrollment)
+        )
+    ).all()
+    if not rows:
+        return {}
+
+    result = await _compute_rollups(db, rows)
+    now = datetime.utcnow()
+    values: list[dict] = []
+    for enr, course in rows:
+        values.append(
+            {
+                "enrollment_id": enr.id,
+                "tenant_id": enr.tenant_id,
+                "student_id": enr.student_id,
+                "course_id": enr.course_id,
+                "period_start": enr.start_date,
+                "period_end": enr.end_date,
+                "course_updated_at": getattr(course, "updated_at", None),
+                "updated_at": now,
+                **result[enr.id],
+            }
+        )
+
+    stmt = pg_insert(EnrollmentAttendanceRollup).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[EnrollmentAttendanceRollup.enrollment_id],
+        set_={
+            col: stmt.excluded[col]
+            for col in (
+                "period_start",
+                "period_end",
+                "course_updated_at",
+                "updated_at",
+                *ROLLUP_COUNT_FIELDS,
+            )
+        },
+    )
+    await db.execute(stmt)
+    return result
+
+
+async def get_enrollment_rollups(
+    db: AsyncSession,
+    tenant_id: int,
+    enroll_rows: list[tuple[Enrollment, Course]],
+    stored: Iterable[EnrollmentAttendanceRollup | None] | None = None,
+) -> dict[int, dict[str, int | None]]:
+    """Conteos por matricula leidos de los rollups (una fila por matricula, sin agregar
+    asistencia). stored permite pasar filas ya cargadas junto con las matriculas.
+
+    Las filas las mantienen los endpoints que modifican asistencia, matriculas, pagos y
+    cursos; si alguna falta o quedo desfasada se calcula en memoria, sin escribir.
+    """
+    if not enroll_rows:
+        return {}
+    by_id = {enr.id: (enr, course) for enr, course in enroll_rows}
+    if stored is None:
+        stored = (
+            await db.execute(
+                select(EnrollmentAttendanceRollup).where(
+                    EnrollmentAttendanceRollup.tenant_id == tenant_id,
+                    EnrollmentAttendanceRollup.enrollment_id.in_(list(by_id)),
+                )
+            )
+        ).scalars().all()
+
+    result: dict[int, dict[str, int | None]] = {}
+    for row in stored:
+        if row is None or row.enrollment_id not in by_id:
+            continue
+        enr, course = by_id[row.enrollment_id]
+        if not _is_stale(row, enr, course):
+            result[row.enrollment_id] = {field: getattr(row, field) for field in ROLLUP_COUNT_FIELDS}
+
+    missing = [by_id[eid] for eid in by_id if eid not in result]
+    if missing:
+        result.update(await _compute_rollups(db, missing))
+    return result
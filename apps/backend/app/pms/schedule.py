@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Iterable, Iterator, Sequence
+
+from app.pms.models import Course, Enrollment
+
+
+# Aritmetica de calendario de cursos en O(1): los dias de clase se representan como una
+# mascara de 7 bits (lunes=0) y los conteos salen de semanas completas + tabla de restos.
+WEEKDAY_ATTRS = ("day_of_week", "day_of_week_2", "day_of_week_3", "day_of_week_4", "day_of_week_5")
+DEFAULT_PERIOD_DAYS = 21
+# Un periodo no se extiende mas alla de este numero de dias desde su inicio.
+MAX_PERIOD_DAYS = 370
+
+
+def course_weekdays(course: Course) -> list[int]:
+    days: set[int] = set()
+    for attr in WEEKDAY_ATTRS:
+        value = getattr(course, attr, None)
+        if value is not None:
+            days.add(int(value))
+    return sorted(days)
+
+
+def weekday_mask(weekdays: Iterable[int]) -> int:
+    mask = 0
+    for dow in weekdays:
+        mask |= 1 << (int(dow) % 7)
+    return mask
+
+
+# _PARTIAL[mask][wd][r]: dias de clase entre los r primeros dias a partir del weekday wd.
+_PARTIAL = [
+    [
+        [sum(1 for i in range(r) if mask >> ((wd + i) % 7) & 1) for r in range(7)]
+        for wd in range(7)
+    ]
+    for mask in range(128)
+]
+_POPCOUNT = [bin(mask).count("1") for mask in range(128)]
+
+
+def _count_mask(start: date, end: date, mask: int) -> int:
+    if end < start or not mask:
+        return 0
+    weeks, rem = divmod((end - start).days + 1, 7)
+    return weeks * _POPCOUNT[mask] + _PARTIAL[mask][start.weekday()][rem]
+
+
+def count_weekdays(start: date, end: date, weekdays: Iterable[int]) -> int:
+    """Cantidad de fechas en [start, end] (inclusive) que caen en alguno de los weekdays."""
+    return _count_mask(start, end, weekday_mask(weekdays))
+
+
+def count_weekdays_many(periods: Iterable[tuple[date, date, Iterable[int]]]) -> list[int]:
+    """Version masiva de count_weekdays; reutiliza la mascara cuando se repiten los dias."""
+    masks: dict[tuple[int, ...], int] = {}
+    result: list[int] = []
+    for start, end, weekdays in periods:
+        key = tuple(weekdays)
+        mask = masks.get(key)
+        if mask is None:
+            mask = masks[key] = weekday_mask(key)
+        result.append(_count_mask(start, end, mask))
+    return result
+
+
+def _offsets(start: date, weekdays: Iterable[int]) -> list[int]:
+    wd = start.weekday()
+    return sorted({(int(dow) - wd) % 7 for dow in weekdays})
+
+
+def nth_class_date(start: date, n: int, weekdays: Sequence[int]) -> date | None:
+    """Fecha de la n-esima clase (n >= 1) contando desde start inclusive."""
+    offsets = _offsets(start, weekdays)
+    if not offsets or n < 1:
+        return None
+    weeks, idx = divmod(n - 1, len(offsets))
+    return start + timedelta(days=weeks * 7 + offsets[idx])
+
+
+def next_class_date(after: date, weekdays: Sequence[int]) -> date | None:
+    """Primera fecha de clase estrictamente posterior a after."""
+    return nth_class_date(after + timedelta(days=1), 1, weekdays)
+
+
+def class_dates_between(start: date, end: date, weekdays: Sequence[int]) -> Iterator[date]:
+    """Fechas de clase en [start, end] en orden, sin recorrer los dias intermedios."""
+    offsets = _offsets(start, weekdays)
+    if not offsets:
+        return
+    week_start = start
+    while week_start <= end:
+        for offset in offsets:
+            current = week_start + timedelta(days=offset)
+            if current > end:
+                return
+            yield current
+        week_start += timedelta(days=7)
+
+
+def expected_classes_between(start: date | None, end: date | None, course: Course) -> int:
+    if not start:
+        return 0
+    if end and start == end:
+        return 1
+    return count_weekdays(start, end or date.today(), course_weekdays(course))
+
+
+def next_course_date(after_date: date, course: Course) -> date:
+    return next_class_date(after_date, course_weekdays(course)) or after_date + timedelta(days=1)
+
+
+def period_end_for_course(start: date, course: Course) -> date:
+    """Fecha de la clase numero total_classes, o la ultima dentro de MAX_PERIOD_DAYS si no alcanzan."""
+    total_classes = int(getattr(course, "total_classes", None) or 4)
+    if total_classes <= 1:
+        return start
+    weekdays = course_weekdays(course)
+    available = count_weekdays(start, start + timedelta(days=MAX_PERIOD_DAYS - 1), weekdays)
+    return nth_class_date(start, min(total_classes, available), weekdays) or start + timedelta(days=DEFAULT_PERIOD_DAYS)
+
+
+def next_payment_period(enrollment: Enrollment, course: Course, today: date) -> tuple[date, date]:
+    """Periodo siguiente a la matricula: parte en la proxima clase tras el fin (o hoy)."""
+    start = next_course_date(enrollment.end_date, course) if enrollment.end_date else today
+    if start < today:
+        start = today if today.weekday() in course_weekdays(course) else next_course_date(today - timedelta(days=1), course)
+    return start, period_end_for_course(start, course)
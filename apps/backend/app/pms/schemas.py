@@ -217,8 +217,9 @@ class StudentStats(BaseModel):
 
 class StudentListResponse(BaseModel):
     items: list[StudentOut]
-    total: int
-    stats: StudentStats
+    total: Optional[int] = None
+    stats: Optional[StudentStats] = None
+    next_cursor: Optional[str] = None
 
 
 class CourseBase(BaseModel):
@@ -357,8 +358,9 @@ class PaymentStats(BaseModel):
 
 class PaymentListResponse(BaseModel):
     items: list[PaymentOut]
-    total: int
+    total: Optional[int] = None
     stats: Optional[PaymentStats] = None
+    next_cursor: Optional[str] = None
 
 class PaymentByTeacher(BaseModel):
     teacher_id: Optional[int] = None
@@ -372,7 +374,8 @@ class PaymentByTeacher(BaseModel):
 
 class PaymentByTeacherListResponse(BaseModel):
     items: list[PaymentByTeacher]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 # -------- Anuncios --------
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from app.pms.models import Course
+
+
+# Serializadores compartidos por los routers que arman respuestas a mano. Los valores de
+# fecha/hora quedan nativos: ORJSONResponse (o jsonable_encoder) los escribe en ISO 8601.
+
+SLOT_SUFFIXES = ("", "_2", "_3", "_4", "_5")
+_SLOT_FIELDS = tuple((f"day_of_week{suffix}", f"start_time{suffix}", f"end_time{suffix}") for suffix in SLOT_SUFFIXES)
+
+
+def course_slot_fields(course: Course) -> dict[str, object]:
+    """Los cinco bloques semanales del curso: day_of_week*, start_time* y end_time*."""
+    data: dict[str, object] = {}
+    for dow_attr, start_attr, end_attr in _SLOT_FIELDS:
+        data[dow_attr] = getattr(course, dow_attr)
+        data[start_attr] = getattr(course, start_attr)
+        data[end_attr] = getattr(course, end_attr)
+    return data
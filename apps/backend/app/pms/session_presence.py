@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import String, TIMESTAMP, column, func, or_, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.pms.models import UserSession
+
+logger = logging.getLogger(__name__)
+
+SESSION_PRESENCE_MINUTES = 1
+
+# Heartbeats pendientes por jti (se guarda el ultimo ping); el flusher los escribe en un
+# solo UPDATE ... FROM (VALUES ...) cada pocos segundos.
+_pending_pings: dict[str, datetime] = {}
+_flusher_task: asyncio.Task | None = None
+
+# Sesiones presentes por tenant, calculadas con una sola consulta agrupada para todos.
+_presence_cache = TTLCache("session_presence", ttl_seconds=settings.session_presence_cache_ttl_seconds, maxsize=1)
+
+
+def record_session_ping(jti: str) -> None:
+    _pending_pings[str(jti)] = datetime.utcnow()
+
+
+async def flush_session_pings() -> int:
+    global _pending_pings
+    if not _pending_pings:
+        return 0
+    batch, _pending_pings = _pending_pings, {}
+    pings = values(column("token_jti", String), column("seen_at", TIMESTAMP), name="pings").data(list(batch.items()))
+    try:
+        async with SessionLocal() as db:
+            await db.execute(
+                update(UserSession)
+                .where(
+                    UserSession.token_jti == pings.c.token_jti,
+                    UserSession.revoked_at.is_(None),
+                    UserSession.expires_at > datetime.utcnow(),
+                )
+                .values(last_seen_at=func.greatest(UserSession.last_seen_at, pings.c.seen_at))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+    except Exception:
+        # Reencolar sin pisar pings mas nuevos que llegaron mientras tanto
+        for jti, seen_at in batch.items():
+            if _pending_pings.get(jti, seen_at) <= seen_at:
+                _pending_pings[jti] = seen_at
+        raise
+    return len(batch)
+
+
+async def _flusher_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.session_ping_flush_seconds)
+        try:
+            await flush_session_pings()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("No se pudieron guardar los heartbeats de sesion")
+
+
+def start_session_ping_flusher() -> None:
+    global _flusher_task
+    if _flusher_task is None:
+        _flusher_task = asyncio.create_task(_flusher_loop())
+
+
+async def stop_session_ping_flusher() -> None:
+    global _flusher_task
+    if _flusher_task is not None:
+        _flusher_task.cancel()
+        await asyncio.gather(_flusher_task, return_exceptions=True)
+        _flusher_task = None
+    try:
+        await flush_session_pings()
+    except Exception:
+        logger.exception("No se pudieron guardar los heartbeats de sesion al cerrar")
+
+
+async def get_active_sessions_by_tenant(db: AsyncSession) -> dict[int, int]:
+    """Indice cacheado para listados (puede ir unos segundos atrasado); no usar para limitar logins."""
+    cached = _presence_cache.get("all")
+    if cached is not None:
+        return cached
+    now_dt = datetime.utcnow()
+    presence_cutoff = now_dt - timedelta(minutes=SESSION_PRESENCE_MINUTES)
+    rows = await db.execute(
+        select(UserSession.tenant_id, func.count(UserSession.id))
+        .where(
+            UserSession.tenant_id.is_not(None),
+            UserSession.revoked_at.is_(None),
+            UserSession.expires_at > now_dt,
+            UserSession.last_seen_at > presence_cutoff,
+        )
+        .group_by(UserSession.tenant_id)
+    )
+    sessions_map = {int(tid): int(cnt) for tid, cnt in rows.all() if tid is not None}
+    _presence_cache.set("all", sessions_map)
+    return sessions_map
+
+
+async def count_active_sessions(db: AsyncSession, tenant_id: int) -> int:
+    """Sesiones presentes del tenant leidas directo de user_sessions (para el limite de login).
+
+    Cuenta tambien los pings de este worker aun no guardados y da un margen de un intervalo
+    de flush a los last_seen_at de los demas workers.
+    """
+    now_dt = datetime.utcnow()
+    presence_cutoff = now_dt - timedelta(minutes=SESSION_PRESENCE_MINUTES)
+    pending = [jti for jti, seen_at in _pending_pings.items() if seen_at > presence_cutoff]
+    seen_recently = UserSession.last_seen_at > presence_cutoff - timedelta(seconds=settings.session_ping_flush_seconds)
+    if pending:
+        seen_recently = or_(seen_recently, UserSession.token_jti.in_(pending))
+    result = await db.execute(
+        select(func.count(UserSession.id)).where(
+            UserSession.tenant_id == tenant_id,
+            UserSession.revoked_at.is_(None),
+            UserSession.expires_at > now_dt,
+            seen_recently,
+        )
+    )
+    return int(result.scalar() or 0)
+
+
+def invalidate_session_presence() -> None:
+    _presence_cache.invalidate()
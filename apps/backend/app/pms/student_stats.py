@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Sequence
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.pms.models import Enrollment, Student
+
+
+# Agregados del listado de alumnos por tenant. Sin filtro de busqueda se cachean por
+# (tenant, dia); altas/cambios de alumnos y matriculas invalidan el tenant.
+_student_stats_cache = TTLCache(
+    "student_list_stats",
+    ttl_seconds=settings.student_stats_cache_ttl_seconds,
+    maxsize=2048,
+)
+
+
+async def get_student_list_stats(
+    db: AsyncSession,
+    tenant_id: int,
+    conditions: Sequence[ColumnElement] = (),
+) -> dict[str, int]:
+    cache_key = (tenant_id, date.today())
+    if not conditions:
+        cached = _student_stats_cache.get(cache_key)
+        if cached is not None:
+            # Copia: los llamadores hacen pop("total") sobre el resultado
+            return dict(cached)
+
+    filters = [Student.tenant_id == tenant_id, *conditions]
+    lower_gender = func.lower(Student.gender)
+    female_case = case((lower_gender.like('f%'), 1), (lower_gender.like('muj%'), 1), else_=0)
+    male_case = case((lower_gender.like('m%'), 1), (lower_gender.like('hombre%'), 1), (lower_gender.like('masculino%'), 1), else_=0)
+    week_cut = date.today() - timedelta(days=7)
+    # Alumnos con al menos una matricula: un solo conteo distinct en vez de un EXISTS por fila
+    with_course = (
+        select(func.count(func.distinct(Enrollment.student_id)))
+        .join(Student, Student.id == Enrollment.student_id)
+        .where(Enrollment.tenant_id == tenant_id, *filters)
+        .scalar_subquery()
+    )
+    row = (
+        await db.execute(
+            select(
+                func.count().label('total'),
+                func.sum(case((Student.is_active == True, 1), else_=0)).label('active'),
+                func.sum(case((Student.is_active == False, 1), else_=0)).label('inactive'),
+                func.sum(female_case).label('female'),
+                func.sum(male_case).label('male'),
+                func.sum(case(((Student.joined_at != None) & (Student.joined_at >= week_cut), 1), else_=0)).label('new_week'),
+                with_course.label('with_course'),
+            ).where(*filters)
+        )
+    ).one()
+
+    total = int(row.total or 0)
+    stats = {
+        "total": total,
+        "total_active": int(row.active or 0),
+        "total_inactive": int(row.inactive or 0),
+        "female": int(row.female or 0),
+        "male": int(row.male or 0),
+        "new_this_week": int(row.new_week or 0),
+        "without_course": total - int(row.with_course or 0),
+    }
+    if not conditions:
+        _student_stats_cache.set(cache_key, dict(stats))
+    return stats
+
+
+def invalidate_student_list_stats(tenant_id: int) -> None:
+    _student_stats_cache.invalidate_where(lambda key: key[0] == tenant_id)
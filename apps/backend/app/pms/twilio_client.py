@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import httpx
+
+from app.core.config import settings
+
+
+# Cliente HTTP compartido por todo el proceso: reutiliza conexiones keep-alive
+# hacia Twilio y no bloquea el event loop mientras Twilio responde.
+_client: httpx.AsyncClient | None = None
+
+
+def get_twilio_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=settings.twilio_api_base_url.rstrip("/"),
+            timeout=httpx.Timeout(settings.twilio_timeout_seconds, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=settings.twilio_max_connections,
+                max_keepalive_connections=settings.twilio_max_connections,
+                keepalive_expiry=60.0,
+            ),
+        )
+    return _client
+
+
+async def close_twilio_client() -> None:
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
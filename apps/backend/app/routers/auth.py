@@ -5,19 +5,19 @@ from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from sqlalchemy import func, select, update
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core import security
 from app.core.config import settings
 from app.db.session import get_db
 from app.pms import models
-from app.pms.deps import reusable_oauth2
+from app.pms.deps import invalidate_principal, invalidate_principals, reusable_oauth2
+from app.pms.session_presence import count_active_sessions, invalidate_session_presence, record_session_ping
 from app.schemas import token as token_schema
 
 router = APIRouter()
 DEFAULT_MAX_SESSIONS_PER_TENANT = 3
-SESSION_PRESENCE_MINUTES = 1
 
 
 @router.post("/login/access-token", response_model=token_schema.TokenWithUser)
@@ -32,7 +32,7 @@ async def login_access_token(
     result = await db.execute(select(models.User).where(models.User.email == form_data.username))
     user = result.scalars().first()
 
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    if not user or not await security.verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -40,19 +40,11 @@ async def login_access_token(
         raise HTTPException(status_code=403, detail="Acceso disponible solo desde el portal de profesores")
 
     if user.tenant_id is not None:
-        tenant = await db.get(models.Tenant, user.tenant_id)
+        # Bloquea el tenant hasta el commit: logins concurrentes (en cualquier worker) se cuentan en serie.
+        tenant = await db.get(models.Tenant, user.tenant_id, with_for_update=True)
         max_sessions = int(getattr(tenant, "max_sessions", None) or DEFAULT_MAX_SESSIONS_PER_TENANT)
-        now_dt = datetime.utcnow()
-        presence_cutoff = now_dt - timedelta(minutes=SESSION_PRESENCE_MINUTES)
-        active_sessions = await db.scalar(
-            select(func.count(models.UserSession.id)).where(
-                models.UserSession.tenant_id == user.tenant_id,
-                models.UserSession.revoked_at.is_(None),
-                models.UserSession.expires_at > now_dt,
-                models.UserSession.last_seen_at > presence_cutoff,
-            )
-        ) or 0
-        if int(active_sessions) >= max_sessions:
+        active_sessions = await count_active_sessions(db, user.tenant_id)
+        if active_sessions >= max_sessions:
             raise HTTPException(
                 status_code=403,
                 detail=f"Limite de sesiones activas alcanzado (maximo {max_sessions}). Cierra una sesion para continuar.",
@@ -93,6 +85,8 @@ async def login_access_token(
         )
     )
     await db.commit()
+    invalidate_principals(user_id=user.id)
+    invalidate_session_presence()
 
     return {
         "access_token": access_token,
@@ -126,13 +120,14 @@ async def logout_access_token(
         .values(revoked_at=datetime.utcnow())
     )
     await db.commit()
+    invalidate_principal(jti)
+    invalidate_session_presence()
     return
 
 
 @router.post("/login/session-ping", status_code=status.HTTP_204_NO_CONTENT)
 async def ping_access_token(
     token: str = Depends(reusable_oauth2),
-    db: AsyncSession = Depends(get_db),
 ) -> None:
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
@@ -141,14 +136,6 @@ async def ping_access_token(
     jti = payload.get("jti")
     if not jti:
         return
-    await db.execute(
-        update(models.UserSession)
-        .where(
-            models.UserSession.token_jti == str(jti),
-            models.UserSession.revoked_at.is_(None),
-            models.UserSession.expires_at > datetime.utcnow(),
-        )
-        .values(last_seen_at=datetime.utcnow())
-    )
-    await db.commit()
+    # Se acumula en memoria y se escribe en lote (ver app.pms.session_presence)
+    record_session_ping(str(jti))
     return
@@ -7,6 +7,9 @@ from zoneinfo import ZoneInfo
 
 from app.pms.models import Attendance, Course, Student, Enrollment
 from app.pms.deps import get_tenant_id, get_db_session
+from app.pms.rollups import refresh_enrollment_rollups
+from app.pms.portal_cache import invalidate_student_portal
+from app.pms.course_status_cache import invalidate_course_status
 from app.core.config import settings
 
 router = APIRouter(prefix="/api/pms", tags=["pms-attendance"])
@@ -139,7 +142,10 @@ async def mark_attendance(
         notes=notes,
     )
     db.add(att)
+    await refresh_enrollment_rollups(db, tenant_id, student_id=student_id, course_id=course_id)
     await db.commit()
+    invalidate_student_portal(tenant_id, student_id)
+    invalidate_course_status(tenant_id, course_id)
     await db.refresh(att)
     return {
         "status": "ok",
@@ -177,7 +183,10 @@ async def unmark_attendance(
         return {"status": "not_found"}
     for r in rows:
         await db.delete(r)
+    await refresh_enrollment_rollups(db, tenant_id, student_id=student_id, course_id=course_id)
     await db.commit()
+    invalidate_student_portal(tenant_id, student_id)
+    invalidate_course_status(tenant_id, course_id)
     return {"status": "deleted", "count": len(rows)}
 
 @router.get("/attendance/today")
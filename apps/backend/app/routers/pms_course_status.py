@@ -1,32 +1,48 @@
 from __future__ import annotations
 
+from typing import AsyncIterator
+
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_, func, cast, Date
+from sqlalchemy import select, or_, and_, func, cast, Date, true, union_all
 from datetime import date, timedelta, datetime, time
 from zoneinfo import ZoneInfo
 
 from app.pms.models import Course, Enrollment, Student, Teacher, Attendance, Payment
 from app.pms.deps import get_tenant_id, get_db_session
+from app.pms.schedule import count_weekdays, course_weekdays
+from app.pms.serializers import course_slot_fields
+from app.pms.rollups import attended_after, attended_from, attended_through
+from app.pms.course_status_cache import (
+    CourseStatusSnapshot,
+    get_course_status_snapshot,
+    set_course_status_snapshot,
+    snapshot_key,
+    tenant_generation,
+)
 from app.core.config import settings
+from app.core.json_stream import json_array_chunks, streaming_json_response
+from app.core.responses import ORJSONResponse
+from app.db.session import SessionLocal
 
 
 router = APIRouter(prefix="/api/pms/course_status", tags=["pms-course-status"])
 
 
-def _course_slots_for_day(course: Course, day_idx: int) -> list[tuple[time, time]]:
-    slots: list[tuple[time, time]] = []
+def _course_slots(course: Course) -> list[tuple[int, time, time]]:
+    slots: list[tuple[int, time, time]] = []
     for suffix in ["", "_2", "_3", "_4", "_5"]:
         dow = getattr(course, f"day_of_week{suffix}", None)
         start = getattr(course, f"start_time{suffix}", None)
         end = getattr(course, f"end_time{suffix}", None)
-        if dow == day_idx and start and end:
-            slots.append((start, end))
+        if dow is not None and start and end:
+            slots.append((dow, start, end))
     return slots
 
 
-def _attendance_window_payload(course: Course, local_now: datetime) -> dict[str, object]:
-    slots = _course_slots_for_day(course, local_now.weekday())
+def _attendance_window_payload(course_slots: list[tuple[int, time, time]], local_now: datetime) -> dict[str, object]:
+    day_idx = local_now.weekday()
+    slots = [(start, end) for dow, start, end in course_slots if dow == day_idx]
     if not slots:
         return {
             "attendance_window_open": False,
@@ -68,67 +84,29 @@ def _attendance_window_payload(course: Course, local_now: datetime) -> dict[str,
     }
 
 
-@router.get("/")
-@router.get("")
-async def course_status(
-    tenant_id: int = Depends(get_tenant_id),
-    db: AsyncSession = Depends(get_db_session),
-    course_q: str | None = Query(default=None),
-    course_id: int | None = Query(default=None),
-    student_q: str | None = Query(default=None),
-    teacher_q: str | None = Query(default=None),
-    only_active: bool = Query(default=True),
-    day_of_week: int | None = Query(default=None, ge=0, le=6),
-    use_today: bool = Query(default=False),
-):
-    # Subquery for attendance count per (student, course) within THEIR enrollment dates
-    att_subquery = (
-        select(
-            Enrollment.id.label("enrollment_id"),
-            Attendance.student_id, 
-            Attendance.course_id, 
-            func.count(Attendance.id).label("count"),
-            func.array_agg(func.distinct(cast(Attendance.attended_at, Date))).label("dates"),
-        )
-        .join(Enrollment, and_(
-            Enrollment.student_id == Attendance.student_id,
-            Enrollment.course_id == Attendance.course_id,
-            Enrollment.tenant_id == Attendance.tenant_id
-        ))
-        .where(
-            Attendance.tenant_id == tenant_id,
-            cast(Attendance.attended_at, Date) >= Enrollment.start_date,
-            or_(Enrollment.end_date == None, cast(Attendance.attended_at, Date) <= Enrollment.end_date),
-            or_(Attendance.notes == None, Attendance.notes != 'clase_suelta')
-        )
-        .group_by(Enrollment.id, Attendance.student_id, Attendance.course_id)
-        .subquery()
-    )
-
-    # Subquery for extra attendances per (student, course) OUTSIDE THEIR enrollment dates
-    extra_subquery = (
-        select(
-            Enrollment.id.label("enrollment_id"),
-            Attendance.student_id, 
-            Attendance.course_id, 
-            func.count(Attendance.id).label("count"),
-            func.array_agg(func.distinct(cast(Attendance.attended_at, Date))).label("dates"),
-        )
-        .join(Enrollment, and_(
-            Enrollment.student_id == Attendance.student_id,
-            Enrollment.course_id == Attendance.course_id,
-            Enrollment.tenant_id == Attendance.tenant_id
-        ))
-        .where(
-            Attendance.tenant_id == tenant_id,
+async def _iter_course_entries(
+    db: AsyncSession,
+    tenant_id: int,
+    only_active: bool,
+    effective_day: int | None,
+    course_ids: set[int] | None = None,
+) -> AsyncIterator[dict]:
+    """Bloques por curso leidos con cursor del servidor; cada uno se entrega apenas se completa."""
+    course_conditions = [Course.tenant_id == tenant_id]
+    if only_active:
+        course_conditions.append(Course.is_active == True)
+    if course_ids is not None:
+        course_conditions.append(Course.id.in_(course_ids))
+    if effective_day is not None:
+        course_conditions.append(
             or_(
-                and_(Enrollment.end_date != None, cast(Attendance.attended_at, Date) > Enrollment.end_date),
-                Attendance.notes == 'clase_suelta'
+                Course.day_of_week == effective_day,
+                Course.day_of_week_2 == effective_day,
+                Course.day_of_week_3 == effective_day,
+                Course.day_of_week_4 == effective_day,
+                Course.day_of_week_5 == effective_day,
             )
         )
-        .group_by(Enrollment.id, Attendance.student_id, Attendance.course_id)
-        .subquery()
-    )
 
     # Latest single-class payment per (student, course).
     # This lets course-status distinguish a paid one-off class from a real pending renewal.
@@ -142,11 +120,77 @@ async def course_status(
         .where(
             Payment.tenant_id == tenant_id,
             Payment.type == "single_class",
+            Payment.course_id.in_(select(Course.id).where(*course_conditions)),
         )
         .group_by(Payment.student_id, Payment.course_id)
         .subquery()
     )
 
+    # Matriculas que salen en el resultado (solo se agrega asistencia para ellas)
+    enrollment_scope = (
+        select(
+            Enrollment.id,
+            Enrollment.student_id,
+            Enrollment.course_id,
+            Enrollment.start_date,
+            Enrollment.end_date,
+        )
+        .join(Course, and_(Course.id == Enrollment.course_id, Course.tenant_id == Enrollment.tenant_id))
+        .where(Enrollment.tenant_id == tenant_id, *course_conditions)
+    )
+    if only_active:
+        enrollment_scope = enrollment_scope.where(Enrollment.is_active == True)
+    enrollment_scope = enrollment_scope.subquery()
+
+    # Asistencia por matricula (indice tenant/alumno/curso/attended_at): dentro del periodo y
+    # extras fuera de el. Las marcas de clase suelta cuentan como extra en cualquier fecha; el
+    # resto solo importa desde el inicio del periodo. Tope superior: fin de hoy (el snapshot es
+    # por dia). Las dos ramas leen rangos acotados del indice, asi el costo no crece con el
+    # historial: desde el inicio del periodo, y clases sueltas previas por su indice parcial.
+    is_single_class_mark = Attendance.notes == 'clase_suelta'
+    in_period = and_(
+        attended_from(enrollment_scope.c.start_date),
+        or_(enrollment_scope.c.end_date == None, attended_through(enrollment_scope.c.end_date)),
+        or_(Attendance.notes == None, ~is_single_class_mark),
+    )
+    outside_period = or_(
+        and_(enrollment_scope.c.end_date != None, attended_after(enrollment_scope.c.end_date)),
+        is_single_class_mark,
+    )
+
+    def scoped_attendance(*conditions):
+        return select(
+            cast(Attendance.attended_at, Date).label("attended_day"),
+            in_period.label("in_period"),
+            outside_period.label("outside_period"),
+        ).where(
+            Attendance.tenant_id == tenant_id,
+            Attendance.student_id == enrollment_scope.c.student_id,
+            Attendance.course_id == enrollment_scope.c.course_id,
+            *conditions,
+        )
+
+    # LATERAL: el planificador resuelve cada matricula con busquedas en el indice en vez de
+    # recorrer la asistencia del tenant cuando el historial es mediano.
+    tomorrow = date.today() + timedelta(days=1)
+    scoped = union_all(
+        scoped_attendance(attended_from(enrollment_scope.c.start_date), Attendance.attended_at < tomorrow),
+        scoped_attendance(is_single_class_mark, Attendance.attended_at < enrollment_scope.c.start_date),
+    ).lateral("scoped_attendance")
+    attendance_subquery = (
+        select(
+            enrollment_scope.c.id.label("enrollment_id"),
+            func.count().filter(scoped.c.in_period).label("att_count"),
+            func.array_agg(func.distinct(scoped.c.attended_day)).filter(scoped.c.in_period).label("att_dates"),
+            func.count().filter(scoped.c.outside_period).label("extra_count"),
+            func.array_agg(func.distinct(scoped.c.attended_day)).filter(scoped.c.outside_period).label("extra_dates"),
+        )
+        .select_from(enrollment_scope)
+        .join(scoped, true())
+        .group_by(enrollment_scope.c.id)
+        .subquery()
+    )
+
     enrollment_join = and_(Enrollment.course_id == Course.id, Enrollment.tenant_id == Course.tenant_id)
     student_join = and_(Student.id == Enrollment.student_id, Student.tenant_id == Course.tenant_id)
     if only_active:
@@ -161,123 +205,52 @@ async def course_status(
             Enrollment.id.label("enr_id"),
             Enrollment.start_date.label("enr_start"),
             Enrollment.end_date.label("enr_end"),
-            func.coalesce(att_subquery.c.count, 0).label("att_count"),
-            att_subquery.c.dates.label("att_dates"),
-            func.coalesce(extra_subquery.c.count, 0).label("extra_count"),
-            extra_subquery.c.dates.label("extra_dates"),
+            func.coalesce(attendance_subquery.c.att_count, 0).label("att_count"),
+            attendance_subquery.c.att_dates,
+            func.coalesce(attendance_subquery.c.extra_count, 0).label("extra_count"),
+            attendance_subquery.c.extra_dates,
             single_class_payment_subquery.c.latest_single_class_date.label("latest_single_class_date"),
             single_class_payment_subquery.c.single_class_paid_dates.label("single_class_paid_dates"),
         )
         .join(Enrollment, enrollment_join, isouter=True)
         .join(Student, student_join, isouter=True)
         .join(Teacher, and_(Teacher.id == Course.teacher_id, Teacher.tenant_id == Course.tenant_id), isouter=True)
-        .join(att_subquery, att_subquery.c.enrollment_id == Enrollment.id, isouter=True)
-        .join(extra_subquery, extra_subquery.c.enrollment_id == Enrollment.id, isouter=True)
+        .join(attendance_subquery, attendance_subquery.c.enrollment_id == Enrollment.id, isouter=True)
         .join(single_class_payment_subquery, and_(single_class_payment_subquery.c.student_id == Student.id, single_class_payment_subquery.c.course_id == Course.id), isouter=True)
-        .where(Course.tenant_id == tenant_id)
+        .where(*course_conditions)
     )
 
-    if only_active:
-        stmt = stmt.where(Course.is_active == True)
-
-    if course_q: stmt = stmt.where(Course.name.ilike(f"%{course_q}%"))
-    if course_id: stmt = stmt.where(Course.id == course_id)
-    if student_q:
-        clean_student_q = " ".join(student_q.split())
-        student_full_name = func.concat(
-            func.coalesce(Student.first_name, ""),
-            " ",
-            func.coalesce(Student.last_name, ""),
-        )
-        student_reverse_name = func.concat(
-            func.coalesce(Student.last_name, ""),
-            " ",
-            func.coalesce(Student.first_name, ""),
-        )
-        student_tokens = [token for token in clean_student_q.split(" ") if token]
-        if student_tokens:
-            stmt = stmt.where(and_(*[
-                or_(
-                    Student.first_name.ilike(f"%{token}%"),
-                    Student.last_name.ilike(f"%{token}%"),
-                    student_full_name.ilike(f"%{token}%"),
-                    student_reverse_name.ilike(f"%{token}%"),
-                )
-                for token in student_tokens
-            ]))
-    effective_day = day_of_week
-    local_now = datetime.now(ZoneInfo(settings.tz))
-    if effective_day is None and use_today:
-        effective_day = local_now.weekday()
-
-    if effective_day is not None:
-        stmt = stmt.where(
-            or_(
-                Course.day_of_week == effective_day,
-                Course.day_of_week_2 == effective_day,
-                Course.day_of_week_3 == effective_day,
-                Course.day_of_week_4 == effective_day,
-                Course.day_of_week_5 == effective_day,
-            )
-        )
-    if teacher_q:
-        stmt = stmt.where(Teacher.name.ilike(f"%{teacher_q}%"))
-
-    rows = (await db.execute(stmt.order_by(Course.name, Student.last_name))).all()
+    # Course.id desempata cursos con el mismo nombre para que sus filas lleguen contiguas
+    rows = await db.stream(stmt.order_by(Course.name, Course.id, Student.last_name).execution_options(yield_per=500))
 
-    grouped = {}
+    entry: dict | None = None
+    position = 0
     today = date.today()
 
-    def count_weekdays(start, end, dows):
-        if not start or not end or not dows: return 0
-        days = (end - start).days + 1
-        if days <= 0: return 0
-        weeks = days // 7
-        count = weeks * len(dows)
-        rem = days % 7
-        for i in range(rem):
-            if (start + timedelta(days=i)).weekday() in dows:
-                count += 1
-        return count
-
-    for course_obj, t_name, student_obj, enr_id, enr_start, enr_end, att_count, att_dates, extra_count, extra_dates, latest_single_class_date, single_class_paid_dates in rows:
+    async for course_obj, t_name, student_obj, enr_id, enr_start, enr_end, att_count, att_dates, extra_count, extra_dates, latest_single_class_date, single_class_paid_dates in rows:
         cid = course_obj.id
-        if cid not in grouped:
-            attendance_window = _attendance_window_payload(course_obj, local_now)
-            grouped[cid] = {
+        if entry is None or entry["course"]["id"] != cid:
+            if entry is not None:
+                yield entry
+                position += 1
+            entry = {
+                "position": position,
                 "course": {
                     "id": course_obj.id,
                     "name": course_obj.name,
                     "level": course_obj.level,
                     "price": float(course_obj.price) if course_obj.price else None,
                     "image_url": course_obj.image_url,
-                    "day_of_week": course_obj.day_of_week,
-                    "day_of_week_2": course_obj.day_of_week_2,
-                    "day_of_week_3": course_obj.day_of_week_3,
-                    "day_of_week_4": course_obj.day_of_week_4,
-                    "day_of_week_5": course_obj.day_of_week_5,
-                    "start_time": course_obj.start_time.isoformat() if course_obj.start_time else None,
-                    "start_time_2": course_obj.start_time_2.isoformat() if course_obj.start_time_2 else None,
-                    "start_time_3": course_obj.start_time_3.isoformat() if course_obj.start_time_3 else None,
-                    "end_time": course_obj.end_time.isoformat() if course_obj.end_time else None,
-                    "start_time_4": course_obj.start_time_4.isoformat() if course_obj.start_time_4 else None,
-                    "end_time_2": course_obj.end_time_2.isoformat() if course_obj.end_time_2 else None,
-                    "start_time_5": course_obj.start_time_5.isoformat() if course_obj.start_time_5 else None,
-                    "end_time_3": course_obj.end_time_3.isoformat() if course_obj.end_time_3 else None,
-                    "end_time_4": course_obj.end_time_4.isoformat() if course_obj.end_time_4 else None,
-                    "end_time_5": course_obj.end_time_5.isoformat() if course_obj.end_time_5 else None,
-                    "start_date": course_obj.start_date.isoformat() if course_obj.start_date else None,
-                    **attendance_window,
+                    **course_slot_fields(course_obj),
+                    "start_date": course_obj.start_date,
                 },
-                "teacher": {"name": t_name} if t_name else None,
+                "slots": _course_slots(course_obj),
+                "teacher_name": t_name,
                 "students": [],
-                "counts": {"total": 0, "female": 0, "male": 0}
             }
         
         if student_obj:
-            dows = [getattr(course_obj, f"day_of_week{suffix}", None) for suffix in ["", "_2", "_3", "_4", "_5"]]
-            dows = [d for d in dows if d is not None]
-            expected = count_weekdays(enr_start, enr_end or today, dows)
+            expected = count_weekdays(enr_start, enr_end or today, course_weekdays(course_obj)) if enr_start else 0
             current_period_active = bool(enr_end and enr_end >= today)
 
             payment_status = "activo" if current_period_active else "pendiente"
@@ -286,7 +259,7 @@ async def course_status(
             raw_att_dates = sorted([d for d in (att_dates or []) if d])
             raw_extra_dates = sorted([d for d in (extra_dates or []) if d])
             paid_single_class_dates = sorted([d for d in (single_class_paid_dates or []) if d])
-            display_extra_dates = [d.isoformat() for d in raw_extra_dates]
+            display_extra_dates = raw_extra_dates
             enrollment_mode = "regular"
 
             # A standalone single-class should read as:
@@ -324,7 +297,7 @@ async def course_status(
                 elif pending_extra_dates:
                     payment_status = "pendiente"
                     display_extra_count = len(pending_extra_dates)
-                    display_extra_dates = [d.isoformat() for d in pending_extra_dates]
+                    display_extra_dates = pending_extra_dates
                 else:
                     payment_status = "inactivo"
                     display_attendance_count = expected
@@ -339,21 +312,188 @@ async def course_status(
                 "enrollment_id": enr_id,
                 "photo_url": student_obj.photo_url,
                 "gender": student_obj.gender,
-                "enrolled_since": enr_start.isoformat() if enr_start else None,
-                "renewal_date": enr_end.isoformat() if enr_end else None,
+                "enrolled_since": enr_start,
+                "renewal_date": enr_end,
                 "payment_status": payment_status,
                 "enrollment_mode": enrollment_mode,
-                "single_class_date": single_class_date.isoformat() if single_class_date else None,
+                "single_class_date": single_class_date,
                 "attendance_count": display_attendance_count,
                 "expected_count": expected,
                 "extra_count": display_extra_count,
                 "extra_dates": display_extra_dates,
                 "birthday_today": bool(student_obj.birthdate and student_obj.birthdate.month == today.month and student_obj.birthdate.day == today.day),
             }
-            grouped[cid]["students"].append(student_data)
-            grouped[cid]["counts"]["total"] += 1
-            gen = (student_obj.gender or "").lower()
-            if gen.startswith("f"): grouped[cid]["counts"]["female"] += 1
-            elif gen.startswith("m"): grouped[cid]["counts"]["male"] += 1
+            entry["students"].append(student_data)
+
+    if entry is not None:
+        yield entry
+
+
+async def _load_course_entries(
+    db: AsyncSession,
+    tenant_id: int,
+    only_active: bool,
+    effective_day: int | None,
+    course_ids: set[int] | None = None,
+) -> dict[int, dict]:
+    return {
+        entry["course"]["id"]: entry
+        async for entry in _iter_course_entries(db, tenant_id, only_active, effective_day, course_ids)
+    }
+
+
+async def _course_status_snapshot(
+    db: AsyncSession, tenant_id: int, only_active: bool, effective_day: int | None
+) -> CourseStatusSnapshot:
+    key = snapshot_key(tenant_id, effective_day, only_active)
+    snapshot = get_course_status_snapshot(key)
+    if snapshot is None:
+        generation = tenant_generation(tenant_id)
+        snapshot = CourseStatusSnapshot(await _load_course_entries(db, tenant_id, only_active, effective_day))
+        set_course_status_snapshot(key, snapshot, generation)
+        return snapshot
+    if snapshot.stale:
+        await _refresh_stale_courses(db, snapshot, tenant_id, only_active, effective_day)
+    return snapshot
+
+
+async def _refresh_stale_courses(
+    db: AsyncSession, snapshot: CourseStatusSnapshot, tenant_id: int, only_active: bool, effective_day: int | None
+) -> None:
+    # Solo se recargan los cursos que cambiaron. Los ids se limpian recien cuando la recarga
+    # termina, asi los lectores concurrentes esperan el lock en vez de servir datos viejos.
+    async with snapshot.lock:
+        if not snapshot.stale:
+            return
+        version, stale = snapshot.version, set(snapshot.stale)
+        fresh = await _load_course_entries(db, tenant_id, only_active, effective_day, course_ids=stale)
+        added = False
+        for cid in stale:
+            previous = snapshot.courses.pop(cid, None)
+            if cid in fresh:
+                fresh[cid]["position"] = previous["position"] if previous else -1
+                added = added or previous is None
+                snapshot.courses[cid] = fresh[cid]
+        if added:
+            # Un curso nuevo en el snapshot: se renumera con el mismo orden (nombre, id) de la base
+            ordered = await db.execute(
+                select(Course.id)
+                .where(Course.tenant_id == tenant_id, Course.id.in_(list(snapshot.courses)))
+                .order_by(Course.name, Course.id)
+            )
+            for position, cid in enumerate(ordered.scalars()):
+                snapshot.courses[cid]["position"] = position
+        if snapshot.version == version:
+            snapshot.stale.clear()
+
+
+def _student_matches(student: dict, tokens: list[str]) -> bool:
+    first_name = (student["first_name"] or "").lower()
+    last_name = (student["last_name"] or "").lower()
+    return all(token in first_name or token in last_name for token in tokens)
+
+
+def _course_block(
+    entry: dict,
+    local_now: datetime,
+    course_id: int | None,
+    course_text: str,
+    teacher_text: str,
+    student_tokens: list[str],
+) -> dict | None:
+    """Bloque de respuesta de un curso del snapshot, o None si no pasa los filtros."""
+    course_data = entry["course"]
+    t_name = entry["teacher_name"]
+    if course_id and course_data["id"] != course_id:
+        return None
+    if course_text and course_text not in (course_data["name"] or "").lower():
+        return None
+    if teacher_text and teacher_text not in (t_name or "").lower():
+        return None
+    students = entry["students"]
+    if student_tokens:
+        students = [student for student in students if _student_matches(student, student_tokens)]
+        if not students:
+            return None
+
+    counts = {"total": len(students), "female": 0, "male": 0}
+    for student in students:
+        gen = (student["gender"] or "").lower()
+        if gen.startswith("f"): counts["female"] += 1
+        elif gen.startswith("m"): counts["male"] += 1
+
+    return {
+        "course": {**course_data, **_attendance_window_payload(entry["slots"], local_now)},
+        "teacher": {"name": t_name} if t_name else None,
+        "students": students,
+        "counts": counts,
+    }
+
+
+async def _stream_course_blocks(
+    tenant_id: int, only_active: bool, effective_day: int | None, local_now: datetime, *filters
+) -> AsyncIterator[dict]:
+    # La sesion del request ya se cerro cuando corre el stream: se abre una propia.
+    key = snapshot_key(tenant_id, effective_day, only_active)
+    snapshot = get_course_status_snapshot(key)
+    if snapshot is not None:
+        if snapshot.stale:
+            async with SessionLocal() as db:
+                await _refresh_stale_courses(db, snapshot, tenant_id, only_active, effective_day)
+        for entry in sorted(snapshot.courses.values(), key=lambda item: item["position"]):
+            block = _course_block(entry, local_now, *filters)
+            if block is not None:
+                yield block
+        return
+
+    # Sin snapshot: cada curso se escribe apenas llega su ultima fila y el snapshot se guarda al final
+    generation = tenant_generation(tenant_id)
+    courses: dict[int, dict] = {}
+    async with SessionLocal() as db:
+        async for entry in _iter_course_entries(db, tenant_id, only_active, effective_day):
+            courses[entry["course"]["id"]] = entry
+            block = _course_block(entry, local_now, *filters)
+            if block is not None:
+                yield block
+    set_course_status_snapshot(key, CourseStatusSnapshot(courses), generation)
+
+
+@router.get("/")
+@router.get("")
+async def course_status(
+    tenant_id: int = Depends(get_tenant_id),
+    db: AsyncSession = Depends(get_db_session),
+    course_q: str | None = Query(default=None),
+    course_id: int | None = Query(default=None),
+    student_q: str | None = Query(default=None),
+    teacher_q: str | None = Query(default=None),
+    only_active: bool = Query(default=True),
+    day_of_week: int | None = Query(default=None, ge=0, le=6),
+    use_today: bool = Query(default=False),
+    stream: bool = Query(default=False, description="Escribe cada curso apenas esta listo (mismo formato)"),
+):
+    effective_day = day_of_week
+    local_now = datetime.now(ZoneInfo(settings.tz))
+    if effective_day is None and use_today:
+        effective_day = local_now.weekday()
+
+    # Filtros sobre el snapshot en memoria
+    filters = (
+        course_id,
+        (course_q or "").lower(),
+        (teacher_q or "").lower(),
+        [token.lower() for token in (student_q or "").split()],
+    )
+
+    if stream:
+        return streaming_json_response(
+            json_array_chunks(_stream_course_blocks(tenant_id, only_active, effective_day, local_now, *filters))
+        )
 
-    return list(grouped.values())
+    snapshot = await _course_status_snapshot(db, tenant_id, only_active, effective_day)
+    result = []
+    for entry in sorted(snapshot.courses.values(), key=lambda item: item["position"]):
+        block = _course_block(entry, local_now, *filters)
+        if block is not None:
+            result.append(block)
+    return ORJSONResponse(result)
@@ -9,6 +9,9 @@ from sqlalchemy import select, func
 from app.pms.models import Course, Teacher, Room, Enrollment, Payment
 from app.pms.schemas import CourseOut, CourseCreate, CourseUpdate, CourseListItem, CourseListResponse
 from app.pms.deps import get_tenant_id, get_db_session
+from app.pms.portal_cache import invalidate_student_portal
+from app.pms.course_status_cache import invalidate_course_status
+from app.pms.rollups import refresh_enrollment_rollups
 
 router = APIRouter(prefix="/api/pms/courses", tags=["pms-courses"])
 
@@ -90,6 +93,7 @@ async def create_course(
     await db.flush()
     await db.refresh(obj)
     await db.commit()
+    invalidate_course_status(tenant_id)
     return obj
 
 
@@ -108,7 +112,12 @@ async def update_course(
     for k, v in payload.model_dump(exclude_unset=True).items():
         setattr(obj, k, v)
 
+    # Dias de clase y total_classes entran en los esperados de cada matricula del curso
+    await db.flush()
+    await refresh_enrollment_rollups(db, tenant_id, course_id=course_id)
     await db.commit()
+    invalidate_student_portal(tenant_id)
+    invalidate_course_status(tenant_id)
     await db.refresh(obj)
     return obj
 
@@ -154,6 +163,8 @@ async def delete_course(
 
     await db.delete(obj)
     await db.commit()
+    invalidate_student_portal(tenant_id)
+    invalidate_course_status(tenant_id)
     return {"detail": "Curso eliminado"}
 
 
@@ -183,6 +194,11 @@ async def upload_course_image(
         buffer.write(await file.read())
 
     course.image_url = f"/static/uploads/courses/{new_name}"
+    # Cambia updated_at del curso: los rollups guardan ese valor para detectar desfase
+    await db.flush()
+    await refresh_enrollment_rollups(db, tenant_id, course_id=course_id)
     await db.commit()
+    invalidate_student_portal(tenant_id)
+    invalidate_course_status(tenant_id)
     await db.refresh(course)
     return course
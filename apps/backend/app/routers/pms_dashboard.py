@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from bisect import bisect_left, bisect_right
+
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_, case
@@ -9,6 +11,8 @@ from typing import Any
 
 from app.pms.models import Course, Enrollment, Student, Payment, Attendance, Teacher
 from app.pms.deps import get_tenant_id, get_db_session
+from app.pms.schedule import count_weekdays_many, course_weekdays
+from app.core.responses import ORJSONResponse
 
 router = APIRouter(prefix="/api/pms/dashboard", tags=["pms-dashboard"])
 
@@ -27,32 +31,6 @@ def _subtract_months(value: date, months: int) -> date:
     return date(year, month, min(value.day, last_day))
 
 
-def _course_days(course: Course) -> list[int]:
-    return [
-        day for day in [
-            course.day_of_week,
-            course.day_of_week_2,
-            course.day_of_week_3,
-            course.day_of_week_4,
-            course.day_of_week_5,
-        ] if day is not None
-    ]
-
-
-def _count_weekdays(start: date, end: date, dows: list[int]) -> int:
-    if start > end or not dows:
-        return 0
-    total = 0
-    for dow in set(dows):
-        current = start
-        diff = (dow - current.weekday()) % 7
-        current += timedelta(days=diff)
-        while current <= end:
-            total += 1
-            current += timedelta(days=7)
-    return total
-
-
 async def _highlighted_students(db: AsyncSession, tenant_id: int, today: date) -> dict[str, Any]:
     tiers = [
         {"months": 12, "threshold": 95.0, "label": "Excelencia 12M"},
@@ -91,7 +69,8 @@ async def _highlighted_students(db: AsyncSession, tenant_id: int, today: date) -
     if not by_student:
         return {"total": 0, "by_tier": {"4": 0, "6": 0, "12": 0}, "items": []}
 
-    attendance_set: set[tuple[int, int, date]] = set()
+    # Fechas unicas de asistencia por (alumno, curso), ordenadas para contar rangos con bisect.
+    attendance_dates: dict[tuple[int, int], set[date]] = {}
     min_cutoff_dt = datetime.combine(min_cutoff, datetime.min.time())
     tomorrow_dt = datetime.combine(today + timedelta(days=1), datetime.min.time())
     att_rows = (
@@ -108,40 +87,49 @@ async def _highlighted_students(db: AsyncSession, tenant_id: int, today: date) -
         )
     ).all()
     for student_id, course_id, attended_at in att_rows:
-        attendance_set.add((int(student_id), int(course_id), attended_at.date()))
-
-    highlighted: list[dict[str, Any]] = []
-    by_tier = {"4": 0, "6": 0, "12": 0}
+        attendance_dates.setdefault((int(student_id), int(course_id)), set()).add(attended_at.date())
+    attendance_index = {key: sorted(dates) for key, dates in attendance_dates.items()}
+    tier_cutoffs = [(tier, _subtract_months(today, int(tier["months"]))) for tier in tiers]
 
+    # Ventanas (alumno, tier, matricula) de todos los alumnos; los esperados salen de una sola
+    # pasada por count_weekdays_many y lo asistido de las fechas ordenadas con bisect.
+    windows: list[tuple[int, int, date, date, Course]] = []
     for student_id, entry in by_student.items():
         student: Student = entry["student"]
         enrollments: list[tuple[Enrollment, Course]] = entry["enrollments"]
         payments_current = all(enr.end_date is not None and enr.end_date >= today for enr, _course in enrollments)
         if not payments_current:
             continue
-
-        best: dict[str, Any] | None = None
-        for tier in tiers:
-            cutoff = _subtract_months(today, int(tier["months"]))
+        for tier_idx, (tier, cutoff) in enumerate(tier_cutoffs):
             if student.joined_at and student.joined_at > cutoff:
                 continue
             if not any(enr.start_date <= cutoff for enr, _course in enrollments):
                 continue
-
-            expected = 0
-            attended = 0
             for enr, course in enrollments:
                 window_start = max(enr.start_date, cutoff)
                 window_end = min(enr.end_date or today, today)
-                if window_start > window_end:
-                    continue
-                expected += _count_weekdays(window_start, window_end, _course_days(course))
-                attended += sum(
-                    1
-                    for sid, cid, att_date in attendance_set
-                    if sid == student_id and cid == course.id and window_start <= att_date <= window_end
-                )
+                if window_start <= window_end:
+                    windows.append((student_id, tier_idx, window_start, window_end, course))
 
+    expected_counts = count_weekdays_many(
+        (window_start, window_end, course_weekdays(course)) for _sid, _tier, window_start, window_end, course in windows
+    )
+    totals: dict[tuple[int, int], list[int]] = {}
+    for (student_id, tier_idx, window_start, window_end, course), expected in zip(windows, expected_counts):
+        total = totals.setdefault((student_id, tier_idx), [0, 0])
+        total[0] += expected
+        dates = attendance_index.get((student_id, course.id))
+        if dates:
+            total[1] += bisect_right(dates, window_end) - bisect_left(dates, window_start)
+
+    highlighted: list[dict[str, Any]] = []
+    by_tier = {"4": 0, "6": 0, "12": 0}
+
+    for student_id, entry in by_student.items():
+        student = entry["student"]
+        best: dict[str, Any] | None = None
+        for tier_idx, (tier, _cutoff) in enumerate(tier_cutoffs):
+            expected, attended = totals.get((student_id, tier_idx), (0, 0))
             if expected <= 0:
                 continue
             rate = min(100.0, round((attended / expected) * 100, 1))
@@ -270,7 +258,7 @@ async def get_summary(
     soon_res = await db.execute(soon_stmt)
     highlighted = await _highlighted_students(db, tenant_id, today)
 
-    return {
+    return ORJSONResponse({
         "kpis": {
             "active_students": res[0] or 0,
             "active_courses": res[1] or 0,
@@ -281,17 +269,17 @@ async def get_summary(
         "classes_today": res[7] or [],
         "recent_payments": [
             {
-                "id": r[0], "amount": float(r[1] or 0), "payment_date": r[2].isoformat(),
+                "id": r[0], "amount": float(r[1] or 0), "payment_date": r[2],
                 "method": r[3], "type": r[4], "reference": r[5], "course_name": r[6],
                 "student_name": f"{r[7]} {r[8]}" if r[7] else None
             } for r in recent_res.all()
         ],
         "alerts": {
             "pending_count": res[4] or 0,
-            "pending_preview": [{"student": f"{r[0]} {r[1]}", "course": r[2], "end_date": r[3].isoformat() if r[3] else None} for r in p_prev_res.all()],
+            "pending_preview": [{"student": f"{r[0]} {r[1]}", "course": r[2], "end_date": r[3]} for r in p_prev_res.all()],
             "birthdays": res[6] or [],
-            "soon_end": [{"student": f"{r[0]} {r[1]}", "course": r[2], "renewal_date": r[3].isoformat()} for r in soon_res.all()]
+            "soon_end": [{"student": f"{r[0]} {r[1]}", "course": r[2], "renewal_date": r[3]} for r in soon_res.all()]
         },
         "attendance_30d": res[5] or 0,
         "highlighted_students": highlighted,
-    }
+    })
@@ -9,6 +9,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.pms.models import Enrollment, Student, Course
 from app.pms.deps import get_tenant_id, get_db_session
+from app.pms.rollups import refresh_enrollment_rollups
+from app.pms.portal_cache import invalidate_student_portal
+from app.pms.student_stats import invalidate_student_list_stats
+from app.pms.course_status_cache import invalidate_course_status
 from pydantic import BaseModel
 
 
@@ -79,8 +83,12 @@ async def create_enrollment(
     )
     db.add(obj)
     await db.flush()
+    await refresh_enrollment_rollups(db, tenant_id, enrollment_ids=[obj.id])
     await db.refresh(obj)
     await db.commit()
+    invalidate_student_portal(tenant_id, obj.student_id)
+    invalidate_student_list_stats(tenant_id)
+    invalidate_course_status(tenant_id, obj.course_id)
     return obj
 
 
@@ -108,8 +116,12 @@ async def update_enrollment(
     for k, v in data.items():
         setattr(obj, k, v)
     await db.flush()
+    await refresh_enrollment_rollups(db, tenant_id, enrollment_ids=[obj.id])
     await db.refresh(obj)
     await db.commit()
+    invalidate_student_portal(tenant_id, obj.student_id)
+    invalidate_student_list_stats(tenant_id)
+    invalidate_course_status(tenant_id, obj.course_id)
     return obj
 
 @router.delete("/{enrollment_id}", status_code=204)
@@ -123,4 +135,7 @@ async def delete_enrollment(
         raise HTTPException(status_code=404, detail="Inscripción no encontrada")
     await db.delete(obj)
     await db.commit()
+    invalidate_student_portal(tenant_id, obj.student_id)
+    invalidate_student_list_stats(tenant_id)
+    invalidate_course_status(tenant_id, obj.course_id)
     return None
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 from decimal import Decimal
 from typing import Any
 
@@ -14,6 +14,10 @@ from sqlalchemy.orm import selectinload
 from app.core.config import settings
 from app.pms.deps import get_current_student, get_db_session
 from app.pms.models import Course, Enrollment, Payment, Student, Teacher, Tenant
+from app.pms.rollups import refresh_enrollment_rollups
+from app.pms.schedule import next_payment_period
+from app.pms.portal_cache import invalidate_student_portal
+from app.pms.course_status_cache import invalidate_course_status
 
 router = APIRouter(prefix="/api/pms/mercadopago", tags=["pms-mercadopago"])
 
@@ -32,55 +36,8 @@ def _mp_headers() -> dict[str, str]:
     }
 
 
-def _course_weekdays(course: Course) -> list[int]:
-    days: set[int] = set()
-    for attr in ("day_of_week", "day_of_week_2", "day_of_week_3", "day_of_week_4", "day_of_week_5"):
-        value = getattr(course, attr, None)
-        if value is not None:
-            days.add(int(value))
-    return sorted(days)
-
-
-def _period_end_for_course(start: date, course: Course) -> date:
-    total_classes = int(getattr(course, "total_classes", None) or 4)
-    if total_classes <= 1:
-        return start
-    days = _course_weekdays(course)
-    if not days:
-        return start + timedelta(days=21)
-
-    attended_dates: list[date] = []
-    current = start
-    guard = 0
-    while len(attended_dates) < total_classes and guard < 370:
-        if current.weekday() in days:
-            attended_dates.append(current)
-        current += timedelta(days=1)
-        guard += 1
-    return attended_dates[-1] if attended_dates else start + timedelta(days=21)
-
-
-def _next_course_date(after_date: date, course: Course) -> date:
-    days = _course_weekdays(course)
-    if not days:
-        return after_date + timedelta(days=1)
-    current = after_date + timedelta(days=1)
-    for _ in range(14):
-        if current.weekday() in days:
-            return current
-        current += timedelta(days=1)
-    return after_date + timedelta(days=1)
-
-
 def _next_period(enrollment: Enrollment, course: Course) -> tuple[date, date]:
-    today = date.today()
-    if enrollment.end_date:
-        start = _next_course_date(enrollment.end_date, course)
-    else:
-        start = today
-    if start < today:
-        start = today if today.weekday() in _course_weekdays(course) else _next_course_date(today - timedelta(days=1), course)
-    return start, _period_end_for_course(start, course)
+    return next_payment_period(enrollment, course, date.today())
 
 
 def _payment_reference(payment_id: str | int) -> str:
@@ -153,6 +110,7 @@ async def _register_approved_payment(db: AsyncSession, payment_data: dict[str, A
         enrollment.start_date = period_start
         enrollment.end_date = period_end
         enrollment.is_active = True
+        await refresh_enrollment_rollups(db, tenant_id, enrollment_ids=[enrollment.id])
 
     amount = Decimal(str(payment_data.get("transaction_amount") or metadata.get("amount") or 0))
     if amount <= 0:
@@ -176,6 +134,8 @@ async def _register_approved_payment(db: AsyncSession, payment_data: dict[str, A
         )
     )
     await db.commit()
+    invalidate_student_portal(tenant_id, student_id)
+    invalidate_course_status(tenant_id, course_id)
     return True
 
 
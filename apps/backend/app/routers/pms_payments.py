@@ -8,6 +8,9 @@ from sqlalchemy import select, func, case, or_
 from app.pms.models import Payment, Course, Teacher, Student
 from app.pms.schemas import PaymentOut, PaymentCreate, PaymentUpdate, PaymentListResponse, PaymentByTeacherListResponse
 from app.pms.deps import get_tenant_id, get_db_session
+from app.pms.portal_cache import invalidate_student_portal
+from app.pms.course_status_cache import invalidate_course_status
+from app.pms.pagination import Keyset
 
 router = APIRouter(prefix="/api/pms/payments", tags=["pms-payments"])
 
@@ -26,6 +29,8 @@ async def payments_by_teacher(
     type: str | None = Query(default=None),
     limit: int = Query(default=50, ge=1, le=1000),
     offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None, description="Cursor de la pagina anterior (reemplaza offset)"),
+    with_totals: bool | None = Query(default=None, description="Por defecto solo en la primera pagina"),
 ):
     def parse_date(val: str | None):
         if not val:
@@ -70,12 +75,22 @@ async def payments_by_teacher(
         base = base.where(Payment.type == type)
 
     grouped = base.group_by(Course.teacher_id, Teacher.name, Payment.teacher_name_snapshot)
-    ordered = grouped.order_by(func.sum(Payment.amount).desc(), teacher_name_expr.asc())
-    res = await db.execute(ordered.offset(offset).limit(limit))
+    keyset = Keyset(
+        "payments:by_teacher",
+        (func.sum(Payment.amount), True),
+        (teacher_name_expr, False),
+        (func.coalesce(Course.teacher_id, 0), False),
+        (func.coalesce(Payment.teacher_name_snapshot, ""), False),
+    )
+    ordered = grouped.add_columns(*keyset.columns).order_by(*keyset.order_by()).limit(limit)
+    ordered = ordered.having(keyset.after(cursor)) if cursor else ordered.offset(offset)
+    res = await db.execute(ordered)
     rows = res.all()
 
-    count_q = select(func.count()).select_from(grouped.subquery())
-    total = await db.scalar(count_q)
+    total = None
+    if with_totals if with_totals is not None else cursor is None:
+        count_q = select(func.count()).select_from(grouped.subquery())
+        total = int(await db.scalar(count_q) or 0)
 
     items = []
     for r in rows:
@@ -89,7 +104,7 @@ async def payments_by_teacher(
             'transfer': m['transfer'] or 0,
             'agreement': m['agreement'] or 0,
         })
-    return {'items': items, 'total': int(total or 0)}
+    return {'items': items, 'total': total, 'next_cursor': keyset.next_cursor(rows, limit)}
 
 
 @router.get("/", response_model=PaymentListResponse)
@@ -107,6 +122,8 @@ async def list_payments(
     date_sort: str = Query(default="desc"),
     limit: int = Query(default=50, ge=1, le=1000),
     offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None, description="Cursor de la pagina anterior (reemplaza offset)"),
+    with_totals: bool | None = Query(default=None, description="Por defecto solo en la primera pagina"),
 ):
     stmt = select(Payment).where(Payment.tenant_id == tenant_id)
     if student_id:
@@ -177,6 +194,36 @@ async def list_payments(
             q_stmt = q_stmt.join(Course, Payment.course_id == Course.id, isouter=True)
         return q_stmt.where(*filters)
 
+    # List query
+    descending = date_sort != "asc"
+    keyset = Keyset(
+        f"payments:{'desc' if descending else 'asc'}",
+        (Payment.payment_date, descending),
+        (Payment.created_at, descending),
+        (Payment.id, descending),
+    )
+    list_stmt = apply_filters(
+        select(Payment, Student.first_name, Student.last_name, *keyset.columns)
+        .join(Student, Payment.student_id == Student.id, isouter=True)
+    ).order_by(*keyset.order_by()).limit(limit)
+    list_stmt = list_stmt.where(keyset.after(cursor)) if cursor else list_stmt.offset(offset)
+
+    res = await db.execute(list_stmt)
+    rows = res.all()
+    
+    items = []
+    for r in rows:
+        p = r.Payment
+        # If the student name isn't stored in the payment record yet (old data),
+        # but the student still exists, use the joined data.
+        if not p.student_name and r.first_name:
+            p.student_name = f"{r.first_name} {r.last_name}".strip()
+        items.append(p)
+    
+    next_cursor = keyset.next_cursor(rows, limit)
+    if not (with_totals if with_totals is not None else cursor is None):
+        return {"items": items, "next_cursor": next_cursor}
+
     stats_stmt = apply_filters(select(
         func.sum(Payment.amount).label('total_amount'),
         func.sum(case((Payment.method == 'efectivo', Payment.amount), else_=0)).label('cash_amount'),
@@ -184,10 +231,10 @@ async def list_payments(
         func.sum(case((or_(Payment.method == 'transferencia', Payment.method == 'transfer'), Payment.amount), else_=0)).label('transfer_amount'),
         func.sum(case((or_(Payment.method == 'convenio', Payment.method == 'agreement'), Payment.amount), else_=0)).label('agreement_amount'),
     ))
-    
+
     stats_res = await db.execute(stats_stmt)
     stats_row = stats_res.mappings().one_or_none()
-    
+
     stats_data = {
         "total_amount": stats_row["total_amount"] or 0,
         "cash_amount": stats_row["cash_amount"] or 0,
@@ -196,32 +243,11 @@ async def list_payments(
         "agreement_amount": stats_row["agreement_amount"] or 0,
     }
 
-    # List query
-    payment_date_order = Payment.payment_date.asc() if date_sort == "asc" else Payment.payment_date.desc()
-    created_at_order = Payment.created_at.asc() if date_sort == "asc" else Payment.created_at.desc()
-
-    list_stmt = apply_filters(
-        select(Payment, Student.first_name, Student.last_name)
-        .join(Student, Payment.student_id == Student.id, isouter=True)
-    ).order_by(payment_date_order, created_at_order)
-    
-    res = await db.execute(list_stmt.offset(offset).limit(limit))
-    rows = res.all()
-    
-    items = []
-    for r in rows:
-        p = r.Payment
-        # If the student name isn't stored in the payment record yet (old data),
-        # but the student still exists, use the joined data.
-        if not p.student_name and r.first_name:
-            p.student_name = f"{r.first_name} {r.last_name}".strip()
-        items.append(p)
-    
     # Total count
     total_stmt = apply_filters(select(func.count()).select_from(Payment))
     total = await db.scalar(total_stmt)
-    
-    return {"items": items, "total": total or 0, "stats": stats_data}
+
+    return {"items": items, "total": total or 0, "stats": stats_data, "next_cursor": next_cursor}
 
 
 @router.get("/{payment_id}", response_model=PaymentOut)
@@ -266,6 +292,8 @@ async def create_payment(
     await db.flush()
     await db.refresh(obj)
     await db.commit()
+    invalidate_student_portal(tenant_id, obj.student_id)
+    invalidate_course_status(tenant_id, obj.course_id)
     return obj
 
 
@@ -280,11 +308,15 @@ async def update_payment(
     obj = res.scalar_one_or_none()
     if not obj:
         raise HTTPException(status_code=404, detail="Pago no encontrado")
+    previous_student_id = obj.student_id
+    previous_course_id = obj.course_id
     for k, v in payload.model_dump(exclude_unset=True).items():
         setattr(obj, k, v)
     await db.flush()
     await db.refresh(obj)
     await db.commit()
+    invalidate_student_portal(tenant_id, previous_student_id, obj.student_id)
+    invalidate_course_status(tenant_id, previous_course_id, obj.course_id)
     return obj
 
 
@@ -300,6 +332,8 @@ async def delete_payment(
         raise HTTPException(status_code=404, detail="Pago no encontrado")
     await db.delete(obj)
     await db.commit()
+    invalidate_student_portal(tenant_id, obj.student_id)
+    invalidate_course_status(tenant_id, obj.course_id)
     return None
 
 
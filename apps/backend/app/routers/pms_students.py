@@ -1,113 +1,44 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from bisect import bisect_left, bisect_right
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Request, Response
 from pathlib import Path
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date, timedelta
-from sqlalchemy import select, func, case, or_, and_, cast, Date
-from sqlalchemy.orm import selectinload
-import secrets
+from sqlalchemy import select, func, or_, and_, cast, Date
+from sqlalchemy.orm import joinedload, aliased
 from datetime import datetime
 import unicodedata
 
 from app.core import security
 from app.core.config import settings
+from app.core.json_stream import streaming_json_response
+from app.core.responses import dumps
+from app.db.session import SessionLocal
 
 from app.pms.models import Student, Tenant, TenantPlan
-from app.pms.models import Course, Enrollment, Attendance, Payment, Teacher
+from app.pms.models import Course, Enrollment, Attendance, Payment, Teacher, EnrollmentAttendanceRollup
 from app.pms.schemas import StudentOut, StudentCreate, StudentUpdate, StudentListResponse, StudentStats
 from app.pms.deps import get_tenant_id, get_db_session, get_current_student
 from app.pms.phone_utils import COUNTRY_PHONE_PRESETS, resolve_tenant_phone_prefix, normalize_phone_value
+from app.pms.rollups import get_enrollment_rollups
+from app.pms.schedule import course_weekdays, expected_classes_between, next_payment_period, class_dates_between
+from app.pms.portal_cache import get_cached_portal_summary, set_cached_portal_summary, invalidate_student_portal
+from app.pms.portal_codes import issue_portal_code, redeem_portal_code, revoke_portal_codes
+from app.pms.pagination import Keyset
+from app.pms.serializers import course_slot_fields
+from app.pms.student_stats import get_student_list_stats, invalidate_student_list_stats
+from app.pms.course_status_cache import invalidate_course_status
 
 router = APIRouter(prefix="/api/pms/students", tags=["pms-students"])
 
-# Almacen simple en memoria para codigos de portal (en un entorno real usar DB + email)
-_portal_codes: dict[tuple[str, int | None], dict[str, object]] = {}
-
-
 def _student_portal_path(tenant: Tenant | None, tenant_id: int) -> str:
     slug = getattr(tenant, "slug", None) or f"tenant-{tenant_id}"
     return f"/mobile/{slug}"
 
 
-def _create_student_portal_code(student: Student, tenant_id: int, minutes: int = 60) -> dict[str, object]:
-    email = (student.email or "").strip().lower()
-    code = f"{secrets.randbelow(1000000):06d}"
-    _portal_codes[(email, tenant_id)] = {
-        "code": code,
-        "expires": datetime.utcnow() + timedelta(minutes=minutes),
-        "student_id": student.id,
-        "tenant_id": tenant_id,
-    }
-    return {"code": code, "expires_in_minutes": minutes}
-
-
-def _course_weekdays(course: Course) -> list[int]:
-    days: set[int] = set()
-    for attr in ("day_of_week", "day_of_week_2", "day_of_week_3", "day_of_week_4", "day_of_week_5"):
-        value = getattr(course, attr, None)
-        if value is not None:
-            days.add(int(value))
-    return sorted(days)
-
-
-def _expected_classes_between(start: date | None, end: date | None, course: Course) -> int:
-    if not start:
-        return 0
-    if end and start == end:
-        return 1
-    period_end = end or date.today()
-    if period_end < start:
-        return 0
-    total = 0
-    for target_dow in _course_weekdays(course):
-        cur = start + timedelta(days=(target_dow - start.weekday() + 7) % 7)
-        while cur <= period_end:
-            total += 1
-            cur += timedelta(days=7)
-    return total
-
-
-def _next_course_date(after_date: date, course: Course) -> date:
-    days = _course_weekdays(course)
-    if not days:
-        return after_date + timedelta(days=1)
-    current = after_date + timedelta(days=1)
-    for _ in range(14):
-        if current.weekday() in days:
-            return current
-        current += timedelta(days=1)
-    return after_date + timedelta(days=1)
-
-
-def _period_end_for_course(start: date, course: Course) -> date:
-    total_classes = int(getattr(course, "total_classes", None) or 4)
-    if total_classes <= 1:
-        return start
-    days = _course_weekdays(course)
-    if not days:
-        return start + timedelta(days=21)
-    class_dates: list[date] = []
-    current = start
-    guard = 0
-    while len(class_dates) < total_classes and guard < 370:
-        if current.weekday() in days:
-            class_dates.append(current)
-        current += timedelta(days=1)
-        guard += 1
-    return class_dates[-1] if class_dates else start + timedelta(days=21)
-
-
-def _next_payment_period(enrollment: Enrollment, course: Course, today_dt: date) -> tuple[date, date]:
-    if enrollment.end_date:
-        start = _next_course_date(enrollment.end_date, course)
-    else:
-        start = today_dt
-    if start < today_dt:
-        start = today_dt if today_dt.weekday() in _course_weekdays(course) else _next_course_date(today_dt - timedelta(days=1), course)
-    return start, _period_end_for_course(start, course)
-
-
 def _subtract_months(value: date, months: int) -> date:
     month = value.month - months
     year = value.year
@@ -145,19 +76,48 @@ def _full_months_between(start: date | None, end: date) -> int:
     return max(0, months)
 
 
-async def _student_highlight_progress(
-    db: AsyncSession,
-    tenant_id: int,
+def _highlight_active_rows(enroll_rows: list[tuple[Enrollment, Course]]) -> list[tuple[Enrollment, Course]]:
+    return [(enr, course) for enr, course in enroll_rows if enr.is_active and getattr(course, "is_active", True)]
+
+
+def _highlight_attendance_subquery(tenant_id: int, student_id: int, today: date):
+    """Fechas de asistencia (ultimos 12 meses, sin clases sueltas) del alumno, agrupadas por curso."""
+    min_cutoff = _subtract_months(today, 12)
+    return (
+        select(
+            Attendance.course_id,
+            func.array_agg(func.distinct(cast(Attendance.attended_at, Date))).label("dates"),
+        )
+        .where(
+            Attendance.tenant_id == tenant_id,
+            Attendance.student_id == student_id,
+            Attendance.attended_at >= datetime.combine(min_cutoff, datetime.min.time()),
+            Attendance.attended_at < datetime.combine(today + timedelta(days=1), datetime.min.time()),
+            or_(Attendance.notes == None, Attendance.notes != "clase_suelta"),
+        )
+        .group_by(Attendance.course_id)
+        .subquery()
+    )
+
+
+def _count_dates_between(dates: list[date] | None, start: date, end: date) -> int:
+    if not dates or start > end:
+        return 0
+    return bisect_right(dates, end) - bisect_left(dates, start)
+
+
+def _student_highlight_progress(
     student: Student,
     enroll_rows: list[tuple[Enrollment, Course]],
     today: date,
+    attendance_by_course: dict[int, list[date]],
 ) -> dict[str, object]:
     tiers = [
         {"months": 4, "threshold": 90.0, "label": "Constancia 4M"},
         {"months": 6, "threshold": 95.0, "label": "Disciplina 6M"},
         {"months": 12, "threshold": 95.0, "label": "Excelencia 12M"},
     ]
-    active_rows = [(enr, course) for enr, course in enroll_rows if enr.is_active and getattr(course, "is_active", True)]
+    active_rows = _highlight_active_rows(enroll_rows)
     if len(active_rows) >= 2:
         tiers[0] = {**tiers[0], "threshold": 80.0}
     if not active_rows:
@@ -181,25 +141,6 @@ async def _student_highlight_progress(
     months_completed = _full_months_between(base_start, today)
     payments_current = all(enr.end_date is not None and enr.end_date >= today for enr, _course in active_rows)
 
-    min_cutoff = _subtract_months(today, 12)
-    course_ids = [course.id for _enr, course in active_rows]
-    attendance_set: set[tuple[int, date]] = set()
-    if course_ids:
-        rows = (
-            await db.execute(
-                select(Attendance.course_id, Attendance.attended_at)
-                .where(
-                    Attendance.tenant_id == tenant_id,
-                    Attendance.student_id == student.id,
-                    Attendance.course_id.in_(course_ids),
-                    Attendance.attended_at >= datetime.combine(min_cutoff, datetime.min.time()),
-                    Attendance.attended_at < datetime.combine(today + timedelta(days=1), datetime.min.time()),
-                    or_(Attendance.notes == None, Attendance.notes != "clase_suelta"),
-                )
-            )
-        ).all()
-        attendance_set = {(int(course_id), attended_at.date()) for course_id, attended_at in rows}
-
     def evaluate(months: int) -> dict[str, object]:
         cutoff = _subtract_months(today, months)
         enough_time = bool(base_start and base_start <= cutoff and any(enr.start_date <= cutoff for enr, _course in active_rows))
@@ -210,12 +151,8 @@ async def _student_highlight_progress(
             window_end = min(enr.end_date or today, today)
             if window_start > window_end:
                 continue
-            expected += _expected_classes_between(window_start, window_end, course)
-            attended += sum(
-                1
-                for course_id, att_date in attendance_set
-                if course_id == course.id and window_start <= att_date <= window_end
-            )
+            expected += expected_classes_between(window_start, window_end, course)
+            attended += _count_dates_between(attendance_by_course.get(course.id), window_start, window_end)
         rate = min(100.0, round((attended / expected) * 100, 1)) if expected > 0 else 0.0
         return {
             "months": months,
@@ -256,7 +193,7 @@ async def _student_highlight_progress(
     current_attended = 0
     period_completed_recently = False
     for enr, course in active_rows:
-        expected_for_period = _expected_classes_between(enr.start_date, enr.end_date, course)
+        expected_for_period = expected_classes_between(enr.start_date, enr.end_date, course)
         if not (enr.end_date and enr.start_date == enr.end_date):
             configured_total = int(getattr(course, "total_classes", None) or 0)
             if configured_total > 0:
@@ -265,11 +202,7 @@ async def _student_highlight_progress(
             continue
         period_end = enr.end_date or today
         current_expected += expected_for_period
-        current_attended += sum(
-            1
-            for course_id, att_date in attendance_set
-            if course_id == course.id and enr.start_date <= att_date <= period_end
-        )
+        current_attended += _count_dates_between(attendance_by_course.get(course.id), enr.start_date, period_end)
     period_completion = min(100.0, round((current_attended / current_expected) * 100, 1)) if current_expected > 0 else 0.0
     period_completion_threshold = float(tiers[0]["threshold"])
     if current_expected > 0 and period_completion >= period_completion_threshold:
@@ -453,36 +386,79 @@ def _normalize_search_text(value: str) -> str:
     return " ".join(without_accents.split())
 
 
-@router.get("/", response_model=StudentListResponse)
-@router.get("", response_model=StudentListResponse)
-async def list_students(
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@router.get("/search")
+async def search_students(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(default=10, ge=1, le=50),
     tenant_id: int = Depends(get_tenant_id),
     db: AsyncSession = Depends(get_db_session),
-    q: str | None = Query(default=None),
-    limit: int = Query(default=20, ge=1, le=1000),
-    offset: int = Query(default=0, ge=0),
-    joined_sort: str = Query(default="desc", pattern="^(asc|desc)$"),
-    name_sort: str | None = Query(default=None, pattern="^(asc|desc)$"),
 ):
+    # Typeahead: cada termino debe ser prefijo de alguna palabra; orden por similitud.
+    terms = [term for term in _normalize_search_text(q).split(" ") if term]
+    if not terms:
+        return {"items": []}
+    padded = func.concat(" ", Student.search_text)
     conditions = [Student.tenant_id == tenant_id]
-    if q:
-        normalized_q = _normalize_search_text(q)
-        search_blob = func.translate(
-            func.lower(func.concat_ws(
-                " ",
-                func.coalesce(Student.first_name, ""),
-                func.coalesce(Student.last_name, ""),
-                func.coalesce(Student.email, ""),
-                func.coalesce(Student.phone, ""),
-            )),
-            "áéíóúüñ",
-            "aeiouun",
+    for term in terms:
+        escaped = _escape_like(term)
+        # El ILIKE simple lo sirve el indice trigram; el segundo exige inicio de palabra.
+        conditions.append(Student.search_text.ilike(f"%{escaped}%"))
+        conditions.append(padded.ilike(f"% {escaped}%"))
+    normalized_q = " ".join(terms)
+    rank = func.word_similarity(normalized_q, Student.search_text)
+    rows = (
+        await db.execute(
+            select(Student.id, Student.first_name, Student.last_name, Student.email, Student.phone, Student.is_active)
+            .where(*conditions)
+            .order_by(
+                Student.search_text.ilike(f"{_escape_like(terms[0])}%").desc(),
+                rank.desc(),
+                Student.first_name,
+                Student.last_name,
+                Student.id,
+            )
+            .limit(limit)
         )
-        terms = [term for term in normalized_q.split(" ") if term]
-        if terms:
-            conditions.append(and_(*(search_blob.ilike(f"%{term}%") for term in terms)))
+    ).all()
+    return {
+        "items": [
+            {
+                "id": sid,
+                "first_name": first_name,
+                "last_name": last_name,
+                "email": email,
+                "phone": phone,
+                "is_active": bool(is_active),
+            }
+            for sid, first_name, last_name, email, phone, is_active in rows
+        ]
+    }
+
 
-    registration_exists = (
+def _student_search_conditions(q: str | None) -> list:
+    # search_text es una columna generada con indice trigram (ver models.Student)
+    terms = [term for term in _normalize_search_text(q).split(" ") if term] if q else []
+    return [and_(*(Student.search_text.ilike(f"%{_escape_like(term)}%") for term in terms))] if terms else []
+
+
+@router.get("/stats")
+async def student_list_stats(
+    q: str | None = Query(default=None),
+    tenant_id: int = Depends(get_tenant_id),
+    db: AsyncSession = Depends(get_db_session),
+):
+    # Agregados del listado, separados de la paginacion; sin busqueda vienen del cache del tenant
+    stats = await get_student_list_stats(db, tenant_id, _student_search_conditions(q))
+    total = stats.pop("total")
+    return {"total": total, "stats": StudentStats(**stats)}
+
+
+def _registration_exists(tenant_id: int):
+    return (
         select(Payment.id)
         .where(
             Payment.tenant_id == tenant_id,
@@ -493,78 +469,129 @@ async def list_students(
         .exists()
     )
 
+
+async def _student_list_extras(db: AsyncSession, tenant_id: int, page_ids: list[int]) -> dict[int, tuple[int, bool]]:
+    # Matriculas y pago de matricula para los ids de la pagina, en una consulta agrupada
+    if not page_ids:
+        return {}
+    extras_res = await db.execute(
+        select(Student.id, func.count(Enrollment.id), _registration_exists(tenant_id))
+        .outerjoin(Enrollment, Enrollment.student_id == Student.id)
+        .where(Student.id.in_(page_ids))
+        .group_by(Student.id)
+    )
+    return {sid: (int(count or 0), bool(has_fee)) for sid, count, has_fee in extras_res.all()}
+
+
+STUDENT_STREAM_CHUNK = 200
+
+
+async def _stream_student_list(
+    tenant_id: int, stmt, keyset: Keyset, limit: int, conditions: list, include_totals: bool
+) -> AsyncIterator[bytes]:
+    # La sesion del request ya se cerro cuando corre el stream: se abre una propia. La pagina
+    # llega en bloques y cada bloque trae sus conteos con la misma consulta agrupada del listado.
+    async with SessionLocal() as db:
+        rows = await db.stream(stmt.execution_options(yield_per=STUDENT_STREAM_CHUNK))
+        yield b'{"items":['
+        last_row = None
+        count = 0
+        async for chunk in rows.partitions():
+            extras = await _student_list_extras(db, tenant_id, [row.Student.id for row in chunk])
+            for row in chunk:
+                s = row.Student
+                enrollment_count, has_registration_fee = extras.get(s.id, (0, False))
+                setattr(s, 'enrollment_count', enrollment_count)
+                setattr(s, 'has_registration_fee', has_registration_fee)
+                item = dumps(StudentOut.model_validate(s).model_dump(mode="json"))
+                yield item if last_row is None else b"," + item
+                last_row = row
+                count += 1
+
+        tail: dict = {"total": None, "stats": None}
+        if include_totals:
+            stats = await get_student_list_stats(db, tenant_id, conditions[1:])
+            tail["total"] = stats.pop("total")
+            tail["stats"] = StudentStats(**stats).model_dump(mode="json")
+    tail["next_cursor"] = keyset.cursor_for(last_row) if last_row is not None and count >= limit else None
+    yield b"]," + dumps(tail)[1:]
+
+
+@router.get("/", response_model=StudentListResponse)
+@router.get("", response_model=StudentListResponse)
+async def list_students(
+    tenant_id: int = Depends(get_tenant_id),
+    db: AsyncSession = Depends(get_db_session),
+    q: str | None = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+    joined_sort: str = Query(default="desc", pattern="^(asc|desc)$"),
+    name_sort: str | None = Query(default=None, pattern="^(asc|desc)$"),
+    cursor: str | None = Query(default=None, description="Cursor de la pagina anterior (reemplaza offset)"),
+    with_totals: bool | None = Query(default=None, description="Por defecto solo en la primera pagina"),
+    stream: bool = Query(default=False, description="Escribe cada alumno apenas llega (mismo formato)"),
+):
+    conditions = [Student.tenant_id == tenant_id, *_student_search_conditions(q)]
+
     if name_sort:
         first_name_order = func.translate(func.lower(func.coalesce(Student.first_name, "")), "áéíóúüñ", "aeiouun")
         last_name_order = func.translate(func.lower(func.coalesce(Student.last_name, "")), "áéíóúüñ", "aeiouun")
-        order_by = (
-            (first_name_order.asc(), last_name_order.asc(), Student.id.asc())
-            if name_sort == "asc"
-            else (first_name_order.desc(), last_name_order.desc(), Student.id.desc())
+        descending = name_sort == "desc"
+        keyset = Keyset(
+            f"students:name:{name_sort}",
+            (first_name_order, descending),
+            (last_name_order, descending),
+            (Student.id, descending),
         )
     else:
-        order_by = (
-            (Student.joined_at.asc(), Student.created_at.asc())
-            if joined_sort == "asc"
-            else (Student.joined_at.desc(), Student.created_at.desc())
+        descending = joined_sort == "desc"
+        keyset = Keyset(
+            f"students:joined:{joined_sort}",
+            (Student.joined_at, descending),
+            (Student.created_at, descending),
+            (Student.id, descending),
         )
 
-    # Fetch items with enrollment count
-    stmt = (
-        select(Student, func.count(Enrollment.id), registration_exists.label("has_registration_fee"))
-        .outerjoin(Enrollment, Enrollment.student_id == Student.id)
-        .where(*conditions)
-        .group_by(Student.id)
-        .order_by(*order_by)
-        .offset(offset)
-        .limit(limit)
-    )
+    # Primero la pagina de alumnos (sin join ni group by) y luego conteos solo para esos ids
+    stmt = select(Student, *keyset.columns).where(*conditions).order_by(*keyset.order_by()).limit(limit)
+    stmt = stmt.where(keyset.after(cursor)) if cursor else stmt.offset(offset)
+    include_totals = with_totals if with_totals is not None else cursor is None
+    if stream:
+        return streaming_json_response(
+            _stream_student_list(tenant_id, stmt, keyset, limit, conditions, include_totals)
+        )
     res = await db.execute(stmt)
     rows = res.all()
-    
+
+    extras = await _student_list_extras(db, tenant_id, [row.Student.id for row in rows])
+
     items = []
-    for s, count, has_registration_fee in rows:
+    for row in rows:
+        s = row.Student
+        count, has_registration_fee = extras.get(s.id, (0, False))
         setattr(s, 'enrollment_count', count)
-        setattr(s, 'has_registration_fee', bool(has_registration_fee))
+        setattr(s, 'has_registration_fee', has_registration_fee)
         items.append(s)
 
-    # Combine total count and stats into ONE query
-    lower_gender = func.lower(Student.gender)
-    female_case = case((lower_gender.like('f%'), 1), (lower_gender.like('muj%'), 1), else_=0)
-    male_case = case((lower_gender.like('m%'), 1), (lower_gender.like('hombre%'), 1), (lower_gender.like('masculino%'), 1), else_=0)
-    week_cut = date.today() - timedelta(days=7)
-    enrollment_exists = (
-        select(Enrollment.id)
-        .where(
-            Enrollment.tenant_id == tenant_id,
-            Enrollment.student_id == Student.id,
-        )
-        .limit(1)
-        .exists()
-    )
-    
-    stats_stmt = select(
-        func.count().label('total'),
-        func.sum(case((Student.is_active == True, 1), else_=0)).label('active'),
-        func.sum(case((Student.is_active == False, 1), else_=0)).label('inactive'),
-        func.sum(female_case).label('female'),
-        func.sum(male_case).label('male'),
-        func.sum(case(((Student.joined_at != None) & (Student.joined_at >= week_cut), 1), else_=0)).label('new_week'),
-        func.sum(case((~enrollment_exists, 1), else_=0)).label('without_course'),
-    ).where(*conditions)
-    
-    sres = await db.execute(stats_stmt)
-    row = sres.one()
-    
-    stats = StudentStats(
-        total_active=int(row.active or 0),
-        total_inactive=int(row.inactive or 0),
-        female=int(row.female or 0),
-        male=int(row.male or 0),
-        new_this_week=int(row.new_week or 0),
-        without_course=int(row.without_course or 0),
-    )
+    next_cursor = keyset.next_cursor(rows, limit)
+    if not include_totals:
+        return {"items": items, "next_cursor": next_cursor}
 
-    return {"items": items, "total": int(row.total or 0), "stats": stats}
+    stats = await get_student_list_stats(db, tenant_id, conditions[1:])
+    total = stats.pop("total")
+    return {"items": items, "total": total, "stats": StudentStats(**stats), "next_cursor": next_cursor}
+
+
+@router.get("/full_stats")
+async def get_students_full_stats(
+    student_ids: list[int] = Query(..., min_length=1, max_length=500),
+    tenant_id: int = Depends(get_tenant_id),
+    db: AsyncSession = Depends(get_db_session),
+):
+    # Variante masiva para el listado: {student_id: {enrollment_id: {...}}}
+    unique_ids = list(dict.fromkeys(student_ids))
+    results = await _full_stats_by_student(db, tenant_id, unique_ids)
+    return {sid: results.get(sid, {}) for sid in unique_ids}
 
 
 @router.get("/{student_id}", response_model=StudentOut)
@@ -611,6 +638,7 @@ async def create_student(
     await db.flush()
     await db.refresh(obj)
     await db.commit()
+    invalidate_student_list_stats(tenant_id)
     return obj
 
 
@@ -659,6 +687,9 @@ async def update_student(
     await db.flush()
     await db.refresh(obj)
     await db.commit()
+    invalidate_student_portal(tenant_id, student_id)
+    invalidate_student_list_stats(tenant_id)
+    invalidate_course_status(tenant_id)
     return obj
 
 
@@ -676,6 +707,9 @@ async def delete_student(
         raise HTTPException(status_code=404, detail="Alumno no encontrado")
     await db.delete(obj)
     await db.commit()
+    invalidate_student_portal(tenant_id, student_id)
+    invalidate_student_list_stats(tenant_id)
+    invalidate_course_status(tenant_id)
     return None
 
 
@@ -711,6 +745,8 @@ async def upload_student_photo(
     await db.flush()
     await db.refresh(obj)
     await db.commit()
+    invalidate_student_portal(tenant_id, student_id)
+    invalidate_course_status(tenant_id)
     return {"url": public_url}
 
 
@@ -746,10 +782,11 @@ async def generate_student_mobile_access(
         raise HTTPException(status_code=403, detail="Portal de alumnos no habilitado para este estudio")
 
     student.portal_enabled = True
-    code_data = _create_student_portal_code(student, tenant_id, minutes=60)
+    code_data = await issue_portal_code(db, student, tenant_id, minutes=60)
     await db.flush()
     await db.refresh(student)
     await db.commit()
+    invalidate_student_portal(tenant_id, student_id)
     return _student_mobile_access_payload(student, tenant, tenant_id, code_data)
 
 
@@ -766,54 +803,82 @@ async def disable_student_mobile_access(
     student.portal_enabled = False
     email = (student.email or "").strip().lower()
     if email:
-        _portal_codes.pop((email, tenant_id), None)
-        _portal_codes.pop((email, None), None)
+        await revoke_portal_codes(db, email, tenant_id)
     await db.flush()
     await db.refresh(student)
     await db.commit()
+    invalidate_student_portal(tenant_id, student_id)
     tenant = await db.get(Tenant, tenant_id)
     return _student_mobile_access_payload(student, tenant, tenant_id)
 
 
+async def _portal_summary_response(request: Request, db: AsyncSession, tenant_id: int, student_id: int) -> Response:
+    cached = get_cached_portal_summary(tenant_id, student_id)
+    if cached is None:
+        payload = await _build_student_portal_summary(db, tenant_id, student_id)
+        cached = set_cached_portal_summary(tenant_id, student_id, payload)
+    etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match") or ""
+    if etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/{student_id}/portal")
 async def student_portal_summary(
     student_id: int,
+    request: Request,
     tenant_id: int = Depends(get_tenant_id),
     db: AsyncSession = Depends(get_db_session),
 ):
-    sres = await db.execute(select(Student).where(Student.id == student_id, Student.tenant_id == tenant_id))
-    student = sres.scalar_one_or_none()
-    if not student:
-        raise HTTPException(status_code=404, detail="Alumno no encontrado")
+    return await _portal_summary_response(request, db, tenant_id, student_id)
 
-    tres = await db.execute(select(Tenant).where(Tenant.id == tenant_id))
-    tenant = tres.scalar_one_or_none()
 
+async def _build_student_portal_summary(db: AsyncSession, tenant_id: int, student_id: int) -> dict:
+    # Numero fijo de consultas sin importar cuantas matriculas tenga el alumno.
+    sres = await db.execute(
+        select(Student, Tenant)
+        .outerjoin(Tenant, Tenant.id == Student.tenant_id)
+        .where(Student.id == student_id, Student.tenant_id == tenant_id)
+    )
+    srow = sres.first()
+    if not srow:
+        raise HTTPException(status_code=404, detail="Alumno no encontrado")
+    student, tenant = srow
+
+    # Matriculas junto con su rollup y la asistencia agrupada por curso para el destacado
+    today_dt = date.today()
+    highlight_sq = _highlight_attendance_subquery(tenant_id, student_id, today_dt)
     eres = await db.execute(
-        select(Enrollment, Course)
+        select(Enrollment, Course, EnrollmentAttendanceRollup, highlight_sq.c.dates)
         .join(Course, Course.id == Enrollment.course_id)
+        .outerjoin(EnrollmentAttendanceRollup, EnrollmentAttendanceRollup.enrollment_id == Enrollment.id)
+        .outerjoin(highlight_sq, highlight_sq.c.course_id == Enrollment.course_id)
         .options(
-            selectinload(Course.teacher),
-            selectinload(Course.room),
+            joinedload(Course.teacher),
+            joinedload(Course.room),
         )
         .where(Enrollment.tenant_id == tenant_id, Enrollment.student_id == student_id)
         .order_by(Enrollment.start_date.desc())
     )
-    enroll_rows = eres.all()
-    today_dt = date.today()
+    rows = eres.all()
+    enroll_rows = [(e, c) for e, c, _rollup, _dates in rows]
+    stored_rollups = [rollup for e, _c, rollup, _dates in rows if e.is_active]
+    highlight_attendance = {c.id: sorted(dates) for _e, c, _rollup, dates in rows if dates}
     enrollments = []
     for e, c in enroll_rows:
         is_paid = False
         if e.end_date and e.end_date >= today_dt:
             is_paid = True
-        next_period_start, next_period_end = _next_payment_period(e, c, today_dt)
+        next_period_start, next_period_end = next_payment_period(e, c, today_dt)
 
         enrollments.append({
             "id": e.id,
-            "start_date": e.start_date.isoformat() if e.start_date else None,
-            "end_date": e.end_date.isoformat() if e.end_date else None,
-            "next_payment_period_start": next_period_start.isoformat() if not is_paid else None,
-            "next_payment_period_end": next_period_end.isoformat() if not is_paid else None,
+            "start_date": e.start_date,
+            "end_date": e.end_date,
+            "next_payment_period_start": next_period_start if not is_paid else None,
+            "next_payment_period_end": next_period_end if not is_paid else None,
             "payment_amount": float(c.price) if getattr(c, "price", None) is not None else None,
             "is_active": bool(e.is_active),
             "payment_status": "activo" if is_paid else "pendiente",
@@ -822,21 +887,7 @@ async def student_portal_summary(
                 "name": c.name,
                 "level": c.level,
                 "classes_per_week": c.classes_per_week,
-                "day_of_week": c.day_of_week,
-                "start_time": c.start_time.isoformat() if c.start_time else None,
-                "end_time": c.end_time.isoformat() if c.end_time else None,
-                "day_of_week_2": c.day_of_week_2,
-                "start_time_2": c.start_time_2.isoformat() if c.start_time_2 else None,
-                "end_time_2": c.end_time_2.isoformat() if c.end_time_2 else None,
-                "day_of_week_3": c.day_of_week_3,
-                "start_time_3": c.start_time_3.isoformat() if c.start_time_3 else None,
-                "end_time_3": c.end_time_3.isoformat() if c.end_time_3 else None,
-                "day_of_week_4": c.day_of_week_4,
-                "start_time_4": c.start_time_4.isoformat() if c.start_time_4 else None,
-                "end_time_4": c.end_time_4.isoformat() if c.end_time_4 else None,
-                "day_of_week_5": c.day_of_week_5,
-                "start_time_5": c.start_time_5.isoformat() if c.start_time_5 else None,
-                "end_time_5": c.end_time_5.isoformat() if c.end_time_5 else None,
+                **course_slot_fields(c),
                 "teacher_id": c.teacher_id,
                 "teacher_name": getattr(c.teacher, "name", None),
                 "image_url": c.image_url,
@@ -855,7 +906,7 @@ async def student_portal_summary(
     attendance_recent = [
         {
             "course": name,
-            "attended_at": a.attended_at.isoformat(),
+            "attended_at": a.attended_at,
             "status": "presente",
         }
         for a, name in att_rows
@@ -864,39 +915,38 @@ async def student_portal_summary(
     expected_total = 0
     elapsed_expected_total = 0
     attended_total = 0
-    for e, c in enroll_rows:
-        if not e.is_active:
-            continue
-        expected = _expected_classes_between(e.start_date, e.end_date, c)
-        if not (e.end_date and e.start_date == e.end_date):
-            configured_total = int(getattr(c, "total_classes", None) or 0)
-            if configured_total > 0:
-                expected = configured_total
+    active_rows = [(e, c) for e, c in enroll_rows if e.is_active]
+    rollups = await get_enrollment_rollups(db, tenant_id, active_rows, stored_rollups)
+    for e, c in active_rows:
+        rollup = rollups.get(e.id) or {}
+        expected = rollup.get("expected_classes")
+        if expected is None:
+            # Periodo abierto sin total configurado: depende de la fecha de hoy.
+            expected = expected_classes_between(e.start_date, e.end_date, c)
         if expected <= 0:
             continue
-        is_single_class = bool(e.end_date and e.start_date == e.end_date)
-        attendance_filters = [
-            Attendance.tenant_id == tenant_id,
-            Attendance.student_id == student_id,
-            Attendance.course_id == c.id,
-            cast(Attendance.attended_at, Date) >= e.start_date,
-        ]
-        if e.end_date:
-            attendance_filters.append(cast(Attendance.attended_at, Date) <= e.end_date)
-        if not is_single_class:
-            attendance_filters.append(or_(Attendance.notes == None, Attendance.notes != 'clase_suelta'))
-        a_count_res = await db.execute(select(func.count(Attendance.id)).where(*attendance_filters))
         expected_total += expected
         elapsed_end = min(e.end_date or today_dt, today_dt)
-        elapsed_expected_total += _expected_classes_between(e.start_date, elapsed_end, c)
-        attended_total += int(a_count_res.scalar() or 0)
+        elapsed_expected_total += expected_classes_between(e.start_date, elapsed_end, c)
+        attended_total += int(rollup.get("attended_in_period") or 0)
     att_percent = int(round((min(attended_total, expected_total) / expected_total) * 100)) if expected_total > 0 else 0
     attendance_rate = int(round((min(attended_total, elapsed_expected_total) / elapsed_expected_total) * 100)) if elapsed_expected_total > 0 else 0
     period_progress_percent = int(round((elapsed_expected_total / expected_total) * 100)) if expected_total > 0 else 0
-    highlight_progress = await _student_highlight_progress(db, tenant_id, student, enroll_rows, today_dt)
+    highlight_progress = _student_highlight_progress(student, enroll_rows, today_dt, highlight_attendance)
 
+    cutoff = date.today() - timedelta(days=90)
+    recent_payment = aliased(Payment)
+    total_paid_recent_sq = (
+        select(func.coalesce(func.sum(recent_payment.amount), 0))
+        .where(
+            recent_payment.tenant_id == tenant_id,
+            recent_payment.student_id == student_id,
+            recent_payment.payment_date >= cutoff,
+        )
+        .scalar_subquery()
+    )
     pres = await db.execute(
-        select(Payment, Course, Teacher)
+        select(Payment, Course, Teacher, total_paid_recent_sq)
         .join(Course, Course.id == Payment.course_id, isouter=True)
         .join(Teacher, Teacher.id == Course.teacher_id, isouter=True)
         .where(Payment.tenant_id == tenant_id, Payment.student_id == student_id)
@@ -904,28 +954,23 @@ async def student_portal_summary(
         .limit(10)
     )
     payments_recent = []
-    for p, c, t in pres.all():
+    total_paid_recent = 0.0
+    for p, c, t, total_recent in pres.all():
+        total_paid_recent = float(total_recent or 0)
         payments_recent.append({
             "id": p.id,
             "amount": float(p.amount),
-            "payment_date": p.payment_date.isoformat() if p.payment_date else None,
+            "payment_date": p.payment_date,
             "method": p.method,
             "type": p.type,
             "reference": p.reference,
             "course_id": p.course_id,
             "course_name": getattr(c, "name", None),
             "teacher_name": getattr(t, "name", None),
-            "period_start": p.period_start.isoformat() if p.period_start else None,
-            "period_end": p.period_end.isoformat() if p.period_end else None,
+            "period_start": p.period_start,
+            "period_end": p.period_end,
         })
 
-    cutoff = date.today() - timedelta(days=90)
-    pres2 = await db.execute(
-        select(func.sum(Payment.amount))
-        .where(Payment.tenant_id == tenant_id, Payment.student_id == student_id, Payment.payment_date >= cutoff)
-    )
-    total_paid_recent = float(pres2.scalar() or 0)
-
     return {
         "tenant": {
             "id": tenant.id if tenant else tenant_id,
@@ -947,14 +992,14 @@ async def student_portal_summary(
             "email": student.email,
             "phone": getattr(student, "phone", None),
             "gender": getattr(student, "gender", None),
-            "birthdate": student.birthdate.isoformat() if getattr(student, "birthdate", None) else None,
-            "joined_at": student.joined_at.isoformat() if getattr(student, "joined_at", None) else None,
+            "birthdate": getattr(student, "birthdate", None),
+            "joined_at": getattr(student, "joined_at", None),
             "notes": getattr(student, "notes", None),
             "photo_url": student.photo_url,
             "is_active": bool(getattr(student, "is_active", False)),
             "portal_enabled": bool(getattr(student, "portal_enabled", False)),
             "inactive_note": getattr(student, "inactive_note", None),
-            "inactive_at": student.inactive_at.isoformat() if getattr(student, "inactive_at", None) else None,
+            "inactive_at": getattr(student, "inactive_at", None),
             "tenant_id": student.tenant_id,
             "emergency_contact": getattr(student, "emergency_contact", None),
             "emergency_phone": getattr(student, "emergency_phone", None),
@@ -998,7 +1043,8 @@ async def request_portal_code(payload: dict, db: AsyncSession = Depends(get_db_s
         raise HTTPException(status_code=403, detail="Portal de alumnos no habilitado para este estudio")
     if not getattr(student, "portal_enabled", False):
         raise HTTPException(status_code=403, detail="Acceso mobile no habilitado para este alumno")
-    code_data = _create_student_portal_code(student, tenant_id or student.tenant_id, minutes=10)
+    code_data = await issue_portal_code(db, student, tenant_id or student.tenant_id, minutes=10)
+    await db.commit()
     # En un entorno real se enviaría por correo. Para pruebas devolvemos el código.
     return {"ok": True, "code": code_data["code"], "expires_in_minutes": code_data["expires_in_minutes"]}
 
@@ -1009,30 +1055,19 @@ async def portal_login(payload: dict, db: AsyncSession = Depends(get_db_session)
     tenant_id = payload.get("tenant_id")
     if not email or not code:
         raise HTTPException(status_code=400, detail="Email y codigo requeridos")
-    # buscar código considerando que tenant_id puede no venir en la app
-    entry = None
-    # primer intento: clave exacta enviada
-    key = (email, tenant_id)
-    if key in _portal_codes and _portal_codes[key].get("code") == code:
-        entry = _portal_codes[key]
-    else:
-        # intentar con tenant None
-        key2 = (email, None)
-        if key2 in _portal_codes and _portal_codes[key2].get("code") == code:
-            entry = _portal_codes[key2]
-        else:
-            # buscar cualquier entry por email con ese código
-            for (em, tidv), val in list(_portal_codes.items()):
-                if em == email and val.get("code") == code:
-                    entry = val
-                    tenant_id = tidv
-                    break
-    if not entry or entry.get("code") != code:
+    try:
+        tenant_id = int(tenant_id) if tenant_id not in (None, "") else None
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="tenant_id invalido")
+    # El codigo se consume (o suma un intento fallido) aunque luego falle la validacion
+    entry = await redeem_portal_code(db, email, code, tenant_id)
+    await db.commit()
+    if not entry:
         raise HTTPException(status_code=400, detail="Codigo invalido")
-    if entry["expires"] < datetime.utcnow():
+    if entry.expires_at < datetime.utcnow():
         raise HTTPException(status_code=400, detail="Codigo expirado")
-    student_id = entry["student_id"]
-    tid = entry["tenant_id"]
+    student_id = entry.student_id
+    tid = entry.tenant_id
     sres = await db.execute(select(Student).where(Student.id == student_id, Student.tenant_id == tid))
     student = sres.scalar_one_or_none()
     if not student:
@@ -1047,9 +1082,6 @@ async def portal_login(payload: dict, db: AsyncSession = Depends(get_db_session)
         expires_delta=timedelta(days=settings.mobile_access_token_expire_days),
         extra={"role": "student", "tenant_id": tid}
     )
-    # invalidar
-    _portal_codes.pop((email, tenant_id), None)
-    _portal_codes.pop((email, tid), None)
     return {
         "access_token": token,
         "token_type": "bearer",
@@ -1065,6 +1097,7 @@ async def portal_login(payload: dict, db: AsyncSession = Depends(get_db_session)
 
 @router.get("/portal/me")
 async def portal_me(
+    request: Request,
     current_student: Student = Depends(get_current_student),
     db: AsyncSession = Depends(get_db_session),
 ):
@@ -1076,11 +1109,7 @@ async def portal_me(
     if not getattr(current_student, "portal_enabled", False):
         raise HTTPException(status_code=403, detail="Acceso mobile no habilitado para este alumno")
     # reutilizar el resumen del portal existente con el tenant real del alumno
-    return await student_portal_summary(
-        current_student.id,
-        tenant_id=current_student.tenant_id,
-        db=db,
-    )
+    return await _portal_summary_response(request, db, current_student.tenant_id, current_student.id)
 
 @router.get("/{student_id}/attendance_calendar")
 async def attendance_calendar(
@@ -1106,28 +1135,17 @@ async def attendance_calendar(
     )
     enrolls = eres.all()
 
-    expected: set[tuple[date, int]] = set()
+    expected: dict[date, set[int]] = {}
     for e, c in enrolls:
-        dows: list[int] = []
-        for attr in ("day_of_week", "day_of_week_2", "day_of_week_3", "day_of_week_4", "day_of_week_5"):
-            v = getattr(c, attr, None)
-            if v is not None:
-                dows.append(int(v))
+        dows = course_weekdays(c)
         if not dows:
             continue
         start = first_day if (e.start_date is None or e.start_date < first_day) else e.start_date
         end = last_day if (e.end_date is None or e.end_date > last_day) else e.end_date
-        if start is None or end is None or start > end:
+        if start > end:
             continue
-        for target in dows:
-            cur = start
-            while cur.weekday() != target:
-                cur += timedelta(days=1)
-                if cur > end:
-                    break
-            while cur <= end:
-                expected.add((cur, c.id))
-                cur += timedelta(days=7)
+        for class_day in class_dates_between(start, end, dows):
+            expected.setdefault(class_day, set()).add(c.id)
 
     ares = await db.execute(
         select(Attendance.course_id, Attendance.attended_at, Attendance.is_recovery, Attendance.notes)
@@ -1147,7 +1165,7 @@ async def attendance_calendar(
     days = []
     cur = first_day
     while cur <= last_day:
-        exp_ids = [cid for (d, cid) in expected if d == cur]
+        exp_ids = sorted(expected.get(cur, ()))
         att_info = attended_map.get(cur, [])
         att_ids = [i["course_id"] for i in att_info]
         has_recovery = any(i["is_recovery"] for i in att_info)
@@ -1168,97 +1186,44 @@ async def attendance_calendar(
 
 
 
-@router.get("/{student_id}/full_stats")
-async def get_student_full_stats(
-    student_id: int,
-    tenant_id: int = Depends(get_tenant_id),
-    db: AsyncSession = Depends(get_db_session),
-):
-    from datetime import date, timedelta
-    
-    # Obtener todas las matrículas del alumno con sus cursos
+async def _full_stats_by_student(
+    db: AsyncSession,
+    tenant_id: int,
+    student_ids: list[int],
+) -> dict[int, dict[int, dict[str, int]]]:
+    # Una consulta de matrículas para todos los alumnos; los conteos salen de los rollups
+    # (agregado condicional agrupado por matrícula, ver app.pms.rollups).
     eres = await db.execute(
         select(Enrollment, Course)
         .join(Course, Course.id == Enrollment.course_id)
-        .where(Enrollment.tenant_id == tenant_id, Enrollment.student_id == student_id)
+        .where(Enrollment.tenant_id == tenant_id, Enrollment.student_id.in_(student_ids))
     )
     enrolls = eres.all()
-    
     if not enrolls:
         return {}
 
-    # Fecha límite para cálculo (hoy + 6 meses para horizonte futuro)
-    today = date.today()
-    future_horizon = today + timedelta(days=180)
-    
-    results = {}
-    
+    rollups = await get_enrollment_rollups(db, tenant_id, [(e, c) for e, c in enrolls if e.start_date])
+    results: dict[int, dict[int, dict[str, int]]] = {}
     for e, c in enrolls:
-        start = e.start_date
-        end = e.end_date
-        if not start:
+        if not e.start_date or not course_weekdays(c):
             continue
-            
-        course_id = c.id
-        
-        # Días de la semana del curso
-        dows = []
-        for attr in ("day_of_week", "day_of_week_2", "day_of_week_3", "day_of_week_4", "day_of_week_5"):
-            v = getattr(c, attr, None)
-            if v is not None:
-                dows.append(int(v))
-        
-        if not dows:
-            continue
-
-        # 1. Calcular Esperados (dentro del periodo de matrícula)
-        expected_count = 0
-        if end:
-            for target_dow in dows:
-                cur = start
-                # Alinear al primer día de clase
-                diff = (target_dow - cur.weekday() + 7) % 7
-                cur += timedelta(days=diff)
-                while cur <= end:
-                    expected_count += 1
-                    cur += timedelta(days=7)
-
-        # 2. Calcular Asistidos (desde inicio hasta horizonte futuro)
-        ares = await db.execute(
-            select(func.count(Attendance.id))
-            .where(
-                Attendance.tenant_id == tenant_id,
-                Attendance.student_id == student_id,
-                Attendance.course_id == course_id,
-                cast(Attendance.attended_at, Date) >= start,
-                cast(Attendance.attended_at, Date) <= future_horizon,
-                or_(Attendance.notes == None, Attendance.notes != 'clase_suelta')
-            )
-        )
-        attended_count = ares.scalar() or 0
-        
-        # 3. Calcular Extra Outside (asistencias después del fin de matrícula)
-        extra_outside = 0
-        if end:
-            a_extra_res = await db.execute(
-                select(func.count(Attendance.id))
-                .where(
-                    Attendance.tenant_id == tenant_id,
-                    Attendance.student_id == student_id,
-                    Attendance.course_id == course_id,
-                    or_(
-                        cast(Attendance.attended_at, Date) > end,
-                        Attendance.notes == 'clase_suelta'
-                    ),
-                    cast(Attendance.attended_at, Date) <= future_horizon
-                )
-            )
-            extra_outside = a_extra_res.scalar() or 0
-
-        results[e.id] = {
-            "expected": expected_count,
-            "attended": attended_count,
-            "extraOutside": extra_outside
+        rollup = rollups.get(e.id) or {}
+        results.setdefault(e.student_id, {})[e.id] = {
+            # Esperados dentro del periodo de matrícula (0 si no tiene fin)
+            "expected": int(rollup.get("scheduled_classes") or 0),
+            # Asistidos desde el inicio de la matrícula (sin clases sueltas)
+            "attended": int(rollup.get("attended_since_start") or 0),
+            # Asistencias después del fin de matrícula o clases sueltas
+            "extraOutside": int(rollup.get("extra_outside") or 0),
         }
-
     return results
+
+
+@router.get("/{student_id}/full_stats")
+async def get_student_full_stats(
+    student_id: int,
+    tenant_id: int = Depends(get_tenant_id),
+    db: AsyncSession = Depends(get_db_session),
+):
+    results = await _full_stats_by_student(db, tenant_id, [student_id])
+    return results.get(student_id, {})
@@ -11,7 +11,13 @@ from app.core import security
 from app.pms.models import Teacher, Course, Payment, Tenant, User, Attendance
 from app.core.config import settings
 from app.pms.models import Student, Enrollment, Room
-from app.pms.deps import get_tenant_id, get_db_session, reusable_oauth2
+from app.pms.deps import get_tenant_id, get_db_session, reusable_oauth2, invalidate_principals
+from app.pms.rollups import refresh_enrollment_rollups
+from app.pms.portal_cache import invalidate_student_portal
+from app.pms.course_status_cache import invalidate_course_status
+from app.pms.pagination import Keyset
+from app.pms.serializers import course_slot_fields
+from app.core.responses import ORJSONResponse
 from app.schemas import token as token_schema
 from pydantic import BaseModel, EmailStr
 from typing import Optional
@@ -84,8 +90,9 @@ class TeacherStats(BaseModel):
 
 class TeacherListResponse(BaseModel):
     items: list[TeacherOut]
-    total: int
-    stats: TeacherStats
+    total: Optional[int] = None
+    stats: Optional[TeacherStats] = None
+    next_cursor: Optional[str] = None
 
 
 router = APIRouter(prefix="/api/pms/teachers", tags=["pms-teachers"])
@@ -219,13 +226,13 @@ async def _teacher_portal_summary(teacher: Teacher, db: AsyncSession) -> dict:
                 "email": student.email,
                 "phone": student.phone,
                 "gender": student.gender,
-                "birthdate": student.birthdate.isoformat() if student.birthdate else None,
+                "birthdate": student.birthdate,
                 "photo_url": student.photo_url,
                 "enrollment_id": enrollment.id,
-                "enrolled_since": enrollment.start_date.isoformat() if enrollment.start_date else None,
-                "renewal_date": enrollment.end_date.isoformat() if enrollment.end_date else None,
+                "enrolled_since": enrollment.start_date,
+                "renewal_date": enrollment.end_date,
                 "enrollment_mode": "single_class" if single_class_date else "regular",
-                "single_class_date": single_class_date.isoformat() if single_class_date else None,
+                "single_class_date": single_class_date,
                 "payment_status": (
                     "activo" if single_class_date and single_class_date >= today else
                     "inactivo" if single_class_date else
@@ -244,21 +251,7 @@ async def _teacher_portal_summary(teacher: Teacher, db: AsyncSession) -> dict:
             "image_url": course.image_url,
             "course_type": course.course_type,
             "classes_per_week": course.classes_per_week,
-            "day_of_week": course.day_of_week,
-            "start_time": course.start_time.isoformat() if course.start_time else None,
-            "end_time": course.end_time.isoformat() if course.end_time else None,
-            "day_of_week_2": course.day_of_week_2,
-            "start_time_2": course.start_time_2.isoformat() if course.start_time_2 else None,
-            "end_time_2": course.end_time_2.isoformat() if course.end_time_2 else None,
-            "day_of_week_3": course.day_of_week_3,
-            "start_time_3": course.start_time_3.isoformat() if course.start_time_3 else None,
-            "end_time_3": course.end_time_3.isoformat() if course.end_time_3 else None,
-            "day_of_week_4": course.day_of_week_4,
-            "start_time_4": course.start_time_4.isoformat() if course.start_time_4 else None,
-            "end_time_4": course.end_time_4.isoformat() if course.end_time_4 else None,
-            "day_of_week_5": course.day_of_week_5,
-            "start_time_5": course.start_time_5.isoformat() if course.start_time_5 else None,
-            "end_time_5": course.end_time_5.isoformat() if course.end_time_5 else None,
+            **course_slot_fields(course),
             "room_name": room_name,
             "student_count": len(students),
             "attended_today_student_ids": sorted(attended_by_course.get(course.id, set())),
@@ -302,7 +295,7 @@ async def teacher_portal_login(
         raise HTTPException(status_code=403, detail="Profesor no pertenece a este estudio")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Acceso profesor inactivo")
-    if not security.verify_password(payload.password, user.hashed_password):
+    if not await security.verify_password_async(payload.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Correo o clave incorrectos")
     if user.tenant_id is None:
         raise HTTPException(status_code=403, detail="Profesor sin tenant asignado")
@@ -354,7 +347,7 @@ async def teacher_portal_me(
     teacher: Teacher = Depends(_get_current_portal_teacher),
     db: AsyncSession = Depends(get_db_session),
 ):
-    return await _teacher_portal_summary(teacher, db)
+    return ORJSONResponse(await _teacher_portal_summary(teacher, db))
 
 
 @router.post("/portal/attendance")
@@ -433,7 +426,10 @@ async def teacher_portal_mark_attendance(
         notes="portal_profesor",
     )
     db.add(attendance)
+    await refresh_enrollment_rollups(db, teacher.tenant_id, student_id=student.id, course_id=course.id)
     await db.commit()
+    invalidate_student_portal(teacher.tenant_id, student.id)
+    invalidate_course_status(teacher.tenant_id, course.id)
     await db.refresh(attendance)
     return {
         "status": "ok",
@@ -452,6 +448,8 @@ async def list_teachers(
     q: str | None = Query(default=None, description="Filtro por nombre, email o teléfono"),
     limit: int = Query(default=20, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None, description="Cursor de la pagina anterior (reemplaza offset)"),
+    with_totals: bool | None = Query(default=None, description="Por defecto solo en la primera pagina"),
 ):
     conditions = [Teacher.tenant_id == tenant_id]
     if q:
@@ -460,15 +458,14 @@ async def list_teachers(
             (Teacher.name.ilike(like)) | (Teacher.email.ilike(like)) | (Teacher.phone.ilike(like))
         )
 
-    stmt = (
-        select(Teacher)
-        .where(*conditions)
-        .order_by(Teacher.name.asc())
-        .offset(offset)
-        .limit(limit)
-    )
-    res = await db.execute(stmt)
-    items = res.scalars().all()
+    keyset = Keyset("teachers:name", (Teacher.name, False), (Teacher.id, False))
+    stmt = select(Teacher, *keyset.columns).where(*conditions).order_by(*keyset.order_by()).limit(limit)
+    stmt = stmt.where(keyset.after(cursor)) if cursor else stmt.offset(offset)
+    rows = (await db.execute(stmt)).all()
+    items = [row.Teacher for row in rows]
+    next_cursor = keyset.next_cursor(rows, limit)
+    if not (with_totals if with_totals is not None else cursor is None):
+        return {"items": items, "next_cursor": next_cursor}
 
     # Stats calculation
     month_ago = date.today() - timedelta(days=30)
@@ -485,7 +482,7 @@ async def list_teachers(
         new_this_month=int(row.new_month or 0),
     )
 
-    return {"items": items, "total": stats.total, "stats": stats}
+    return {"items": items, "total": stats.total, "stats": stats, "next_cursor": next_cursor}
 
 
 @router.post("/{teacher_id}/portal/access", response_model=TeacherPortalAccessOut)
@@ -519,7 +516,7 @@ async def create_or_reset_teacher_portal_access(
     if not user:
         user = User(
             email=email,
-            hashed_password=security.get_password_hash(password),
+            hashed_password=await security.get_password_hash_async(password),
             full_name=teacher.name,
             is_active=True,
             is_superuser=False,
@@ -529,7 +526,7 @@ async def create_or_reset_teacher_portal_access(
         db.add(user)
         await db.flush()
     else:
-        user.hashed_password = security.get_password_hash(password)
+        user.hashed_password = await security.get_password_hash_async(password)
         user.full_name = teacher.name
         user.is_active = bool(payload.enabled)
         user.is_superuser = False
@@ -539,6 +536,7 @@ async def create_or_reset_teacher_portal_access(
     teacher.user_id = user.id
     teacher.portal_enabled = bool(payload.enabled)
     await db.commit()
+    invalidate_principals(user_id=user.id)
     await db.refresh(teacher)
     return TeacherPortalAccessOut(
         teacher_id=teacher.id,
@@ -567,6 +565,8 @@ async def disable_teacher_portal_access(
         if user and getattr(user, "role", None) == "teacher":
             user.is_active = False
     await db.commit()
+    if teacher.user_id:
+        invalidate_principals(user_id=teacher.user_id)
     return TeacherPortalAccessOut(
         teacher_id=teacher.id,
         user_id=teacher.user_id,
@@ -621,6 +621,7 @@ async def update_teacher(
     await db.flush()
     await db.refresh(obj)
     await db.commit()
+    invalidate_course_status(tenant_id)
     return obj
 
 
@@ -649,6 +650,7 @@ async def delete_teacher(
         )
     await db.delete(obj)
     await db.commit()
+    invalidate_course_status(tenant_id)
     return None
 
 
@@ -10,12 +10,13 @@ import secrets
 import re
 import unicodedata
 
-from app.pms.models import Tenant, TenantPlan, AppSetting, WhatsAppMessageLog
+from app.pms.models import Tenant, TenantPlan, WhatsAppMessageLog
 from app.pms.deps import (
     get_tenant_id,
     get_db_session,
     get_current_active_superuser,
     get_current_user,
+    invalidate_principals,
 )
 from app.pms.schemas import (
     TenantOut,
@@ -28,6 +29,9 @@ from app.pms.schemas import (
     TenantPlanUpdate,
 )
 from app.pms.phone_utils import resolve_tenant_phone_prefix
+from app.pms.app_settings import get_app_setting
+from app.pms.portal_cache import invalidate_student_portal
+from app.pms.session_presence import get_active_sessions_by_tenant, invalidate_session_presence
 from app.core import security
 from app.pms import models
 from pydantic import BaseModel
@@ -39,7 +43,6 @@ class VerifyUnlockPayload(BaseModel):
 router = APIRouter(prefix="/api/pms/tenants", tags=["pms-tenants"])
 logger = logging.getLogger(__name__)
 MAX_SESSIONS_PER_TENANT = 3
-SESSION_PRESENCE_MINUTES = 1
 
 DEFAULT_TENANT_PLANS = [
     {"name": "Inicio 15", "max_active_students": 15, "monthly_price": 12000, "annual_price": 115200, "is_custom": False},
@@ -96,7 +99,7 @@ async def list_tenants(
     res = await db.execute(select(Tenant).order_by(Tenant.created_at.desc()))
     tenants = res.scalars().all()
     month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    twilio_budget_raw = await db.scalar(select(AppSetting.value).where(AppSetting.key == "twilio_budget_usd"))
+    twilio_budget_raw = await get_app_setting(db, "twilio_budget_usd")
     try:
         twilio_budget = float((twilio_budget_raw or "").strip()) if twilio_budget_raw else 20.0
     except Exception:
@@ -115,19 +118,7 @@ async def list_tenants(
     )
     wa_map = {int(tid): float(total or 0) for tid, total in wa_res.all() if tid is not None}
 
-    now_dt = datetime.utcnow()
-    presence_cutoff = now_dt - timedelta(minutes=SESSION_PRESENCE_MINUTES)
-    sessions_res = await db.execute(
-        select(models.UserSession.tenant_id, func.count(models.UserSession.id))
-        .where(
-            models.UserSession.tenant_id.is_not(None),
-            models.UserSession.revoked_at.is_(None),
-            models.UserSession.expires_at > now_dt,
-            models.UserSession.last_seen_at > presence_cutoff,
-        )
-        .group_by(models.UserSession.tenant_id)
-    )
-    sessions_map = {int(tid): int(cnt) for tid, cnt in sessions_res.all() if tid is not None}
+    sessions_map = await get_active_sessions_by_tenant(db)
     for t in tenants:
         t.plan = await db.get(TenantPlan, t.plan_id) if t.plan_id else None
         _resolve_tenant_plan_snapshot(t)
@@ -271,7 +262,7 @@ async def create_tenant(
 
     user = models.User(
         email=normalized_email,
-        hashed_password=security.get_password_hash(payload.password),
+        hashed_password=await security.get_password_hash_async(payload.password),
         full_name=payload.name.strip(),
         is_active=True,
         is_superuser=payload.is_superuser,
@@ -386,6 +377,7 @@ async def update_current_tenant(
         setattr(tenant, field, value)
 
     await db.commit()
+    invalidate_student_portal(tenant.id)
     await db.refresh(tenant)
     return tenant
 
@@ -404,7 +396,7 @@ async def verify_unlock(
     if tenant.attendance_pin and payload.code == tenant.attendance_pin:
         return {"success": True}
         
-    if security.verify_password(payload.code, current_user.hashed_password):
+    if await security.verify_password_async(payload.code, current_user.hashed_password):
         return {"success": True}
         
     raise HTTPException(status_code=400, detail="Código o contraseña incorrectos")
@@ -586,9 +578,12 @@ async def update_tenant(
                 select(models.User).where(models.User.tenant_id == tenant_id).order_by(models.User.id)
             )
         if admin_user:
-            admin_user.hashed_password = security.get_password_hash(data["password"])
+            admin_user.hashed_password = await security.get_password_hash_async(data["password"])
 
     await db.commit()
+    invalidate_student_portal(tenant_id)
+    if admin_user is not None:
+        invalidate_principals(user_id=admin_user.id)
     await db.refresh(tenant)
     tenant.plan = await db.get(TenantPlan, tenant.plan_id) if tenant.plan_id else None
     _resolve_tenant_plan_snapshot(tenant)
@@ -608,6 +603,8 @@ async def delete_tenant(
     await db.execute(delete(models.User).where(models.User.tenant_id == tenant_id))
     await db.delete(tenant)
     await db.commit()
+    invalidate_principals(tenant_id=tenant_id)
+    invalidate_session_presence()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -629,6 +626,8 @@ async def revoke_all_tenant_sessions(
         .values(revoked_at=datetime.utcnow())
     )
     await db.commit()
+    invalidate_principals(tenant_id=tenant_id)
+    invalidate_session_presence()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -3,24 +3,51 @@
 from fastapi import APIRouter, Depends, HTTPException, Form
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError
+from sqlalchemy import select, insert, delete, update
 import base64
 import json
 import asyncio
-from datetime import datetime, timezone
+import httpx
+import logging
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 
 from app.core.config import settings
 from app.pms.deps import get_db_session, get_tenant_id, get_current_active_superuser, get_current_user
-from app.pms.models import Tenant, Student, Course, WhatsAppMessageLog, AppSetting
+from app.db.session import SessionLocal
+from app.pms.models import Tenant, Student, Course, Enrollment, WhatsAppMessageLog, WhatsAppCampaign, WhatsAppStatusEvent, AppSetting
 from app.pms.phone_utils import COUNTRY_PHONE_PRESETS, normalize_phone_value, resolve_tenant_phone_prefix
+from app.pms.app_settings import get_app_setting, get_app_settings, invalidate_app_settings
+from app.pms.twilio_client import get_twilio_client
 
 
 router = APIRouter(prefix="/api/pms/whatsapp", tags=["pms-whatsapp"])
+logger = logging.getLogger(__name__)
 DAY_NAMES = ["lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo"]
 DEFAULT_WHATSAPP_TEMPLATE_SID = "HXc48c3cc85e952f4801808ddaff9a809e"
+TWILIO_MAX_RETRIES = 2
+CAMPAIGN_FLUSH_SECONDS = 5.0
+CAMPAIGN_STALE_MINUTES = 10
+# Orden de avance de los estados de Twilio: los callbacks pueden llegar desordenados.
+# Todos los estados documentados tienen rango; los finales (entregado o no) nunca retroceden.
+STATUS_RANK = {
+    "scheduled": 0,
+    "accepted": 1,
+    "queued": 2,
+    "sending": 3,
+    "receiving": 3,
+    "sent": 4,
+    "delivered": 5,
+    "partially_delivered": 5,
+    "received": 5,
+    "undelivered": 5,
+    "failed": 5,
+    "canceled": 5,
+    "read": 6,
+}
+PRICED_STATUSES = ("sent", "delivered", "read", "undelivered", "failed")
+STATUS_EVENT_RETRY_SECONDS = 30
+STATUS_EVENT_MAX_AGE_MINUTES = 15
 
 
 class WhatsAppTestIn(BaseModel):
@@ -72,6 +99,22 @@ class TwilioBalanceOut(BaseModel):
     checked_at: str
 
 
+class WhatsAppCampaignOut(BaseModel):
+    id: int
+    kind: str
+    status: str
+    total: int
+    sent: int
+    failed: int
+    skipped: int
+    processed: int
+    progress_percent: float
+    last_error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
 def _mask_secret(value: str) -> str:
     if not value:
         return ""
@@ -80,9 +123,21 @@ def _mask_secret(value: str) -> str:
     return f"{value[:4]}{'*' * (len(value) - 8)}{value[-4:]}"
 
 
+TWILIO_SETTING_KEYS = (
+    "twilio_account_sid",
+    "twilio_auth_token",
+    "twilio_api_key_sid",
+    "twilio_api_key_secret",
+    "twilio_whatsapp_from",
+    "twilio_enabled",
+    "twilio_whatsapp_template_sid",
+    "twilio_budget_usd",
+    "twilio_alert_threshold_usd",
+)
+
+
 async def _get_app_setting(db: AsyncSession, key: str) -> str:
-    row = (await db.execute(select(AppSetting).where(AppSetting.key == key))).scalars().first()
-    return (row.value or "").strip() if row else ""
+    return await get_app_setting(db, key)
 
 
 async def _set_app_setting(db: AsyncSession, key: str, value: str) -> None:
@@ -91,15 +146,18 @@ async def _set_app_setting(db: AsyncSession, key: str, value: str) -> None:
         row.value = value
     else:
         db.add(AppSetting(key=key, value=value))
+    invalidate_app_settings(key)
 
 
 async def _resolve_twilio_config(db: AsyncSession) -> tuple[str, str, str, str, str, bool, str]:
-    sid_db = await _get_app_setting(db, "twilio_account_sid")
-    token_db = await _get_app_setting(db, "twilio_auth_token")
-    api_key_sid_db = await _get_app_setting(db, "twilio_api_key_sid")
-    api_key_secret_db = await _get_app_setting(db, "twilio_api_key_secret")
-    from_db = await _get_app_setting(db, "twilio_whatsapp_from")
-    enabled_raw = await _get_app_setting(db, "twilio_enabled")
+    # Una sola consulta (o ninguna si el cache esta caliente) para todas las claves de Twilio.
+    values = await get_app_settings(db, TWILIO_SETTING_KEYS)
+    sid_db = values["twilio_account_sid"]
+    token_db = values["twilio_auth_token"]
+    api_key_sid_db = values["twilio_api_key_sid"]
+    api_key_secret_db = values["twilio_api_key_secret"]
+    from_db = values["twilio_whatsapp_from"]
+    enabled_raw = values["twilio_enabled"]
     enabled_db = enabled_raw.lower() in ("1", "true", "yes", "on")
 
     if sid_db and from_db and ((api_key_sid_db and api_key_secret_db) or token_db):
@@ -197,7 +255,42 @@ def _build_template_variables(student_name: str, course_name: str, schedule: str
         "4": tenant_name.strip() or "la academia",
     }
 
-def _twilio_send_whatsapp(
+async def _twilio_request(
+    method: str,
+    path: str,
+    auth_b64: str,
+    error_label: str,
+    form: dict[str, str] | None = None,
+) -> dict:
+    for attempt in range(TWILIO_MAX_RETRIES + 1):
+        try:
+            res = await get_twilio_client().request(
+                method,
+                path,
+                data=form,
+                headers={"Authorization": f"Basic {auth_b64}"},
+            )
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=500, detail=f"{error_label}: {e}")
+        if res.status_code != 429 or attempt == TWILIO_MAX_RETRIES:
+            break
+        # Twilio limita por cuenta: respetar Retry-After antes de reintentar.
+        retry_after = _to_float(res.headers.get("Retry-After"), 1.0 + attempt)
+        await asyncio.sleep(min(max(retry_after, 0.5), 10.0))
+    if res.status_code >= 400:
+        try:
+            err = res.json()
+            detail = err.get("message") or err
+        except Exception:
+            detail = f"HTTP Error {res.status_code}: {res.reason_phrase}"
+        raise HTTPException(status_code=400, detail=f"Twilio error: {detail}")
+    try:
+        return res.json()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{error_label}: {e}")
+
+
+async def _twilio_send_whatsapp(
     to_phone: str,
     message: str,
     account_sid: str,
@@ -209,36 +302,21 @@ def _twilio_send_whatsapp(
     if not account_sid or not whatsapp_from:
         raise HTTPException(status_code=400, detail="Twilio no configurado en el servidor.")
 
-    form = urlencode(
-        {
+    auth_b64 = _twilio_auth_b64(account_sid, auth_token, api_key_sid, api_key_secret)
+    return await _twilio_request(
+        "POST",
+        f"/2010-04-01/Accounts/{account_sid}/Messages.json",
+        auth_b64,
+        "Error enviando WhatsApp",
+        form={
             "From": whatsapp_from,
             "To": to_phone,
             "Body": message,
-        }
-    ).encode("utf-8")
-
-    url = f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json"
-    auth_b64 = _twilio_auth_b64(account_sid, auth_token, api_key_sid, api_key_secret)
-    req = Request(url, data=form, method="POST")
-    req.add_header("Authorization", f"Basic {auth_b64}")
-    req.add_header("Content-Type", "application/x-www-form-urlencoded")
-
-    try:
-        with urlopen(req, timeout=20) as res:
-            payload = json.loads(res.read().decode("utf-8"))
-            return payload
-    except HTTPError as e:
-        try:
-            err = json.loads(e.read().decode("utf-8"))
-            detail = err.get("message") or err
-        except Exception:
-            detail = str(e)
-        raise HTTPException(status_code=400, detail=f"Twilio error: {detail}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error enviando WhatsApp: {e}")
+        },
+    )
 
 
-def _twilio_send_whatsapp_template(
+async def _twilio_send_whatsapp_template(
     to_phone: str,
     content_sid: str,
     content_variables: dict[str, str],
@@ -251,58 +329,34 @@ def _twilio_send_whatsapp_template(
     if not account_sid or not whatsapp_from or not content_sid:
         raise HTTPException(status_code=400, detail="Twilio template no configurado en el servidor.")
 
-    form = urlencode(
-        {
+    auth_b64 = _twilio_auth_b64(account_sid, auth_token, api_key_sid, api_key_secret)
+    return await _twilio_request(
+        "POST",
+        f"/2010-04-01/Accounts/{account_sid}/Messages.json",
+        auth_b64,
+        "Error enviando plantilla WhatsApp",
+        form={
             "From": whatsapp_from,
             "To": to_phone,
             "ContentSid": content_sid,
             "ContentVariables": json.dumps(content_variables, ensure_ascii=False),
-        }
-    ).encode("utf-8")
-
-    url = f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json"
-    auth_b64 = _twilio_auth_b64(account_sid, auth_token, api_key_sid, api_key_secret)
-    req = Request(url, data=form, method="POST")
-    req.add_header("Authorization", f"Basic {auth_b64}")
-    req.add_header("Content-Type", "application/x-www-form-urlencoded")
-
-    try:
-        with urlopen(req, timeout=20) as res:
-            payload = json.loads(res.read().decode("utf-8"))
-            return payload
-    except HTTPError as e:
-        try:
-            err = json.loads(e.read().decode("utf-8"))
-            detail = err.get("message") or err
-        except Exception:
-            detail = str(e)
-        raise HTTPException(status_code=400, detail=f"Twilio error: {detail}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error enviando plantilla WhatsApp: {e}")
+        },
+    )
 
 
-def _twilio_get_message_status(
+async def _twilio_get_message_status(
     sid: str, account_sid: str, auth_token: str, api_key_sid: str, api_key_secret: str
 ) -> dict:
     if not account_sid:
         raise HTTPException(status_code=400, detail="Twilio no configurado en el servidor.")
 
-    url = f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages/{sid}.json"
     auth_b64 = _twilio_auth_b64(account_sid, auth_token, api_key_sid, api_key_secret)
-    req = Request(url, method="GET")
-    req.add_header("Authorization", f"Basic {auth_b64}")
-    try:
-        with urlopen(req, timeout=20) as res:
-            return json.loads(res.read().decode("utf-8"))
-    except HTTPError as e:
-        try:
-            err = json.loads(e.read().decode("utf-8"))
-            detail = err.get("message") or err
-        except Exception:
-            detail = str(e)
-        raise HTTPException(status_code=400, detail=f"Twilio error: {detail}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error consultando estado Twilio: {e}")
+    return await _twilio_request(
+        "GET",
+        f"/2010-04-01/Accounts/{account_sid}/Messages/{sid}.json",
+        auth_b64,
+        "Error consultando estado Twilio",
+    )
 
 
 def _to_float(value: str | None, fallback: float) -> float:
@@ -324,25 +378,16 @@ def _twilio_price_usd(payload: dict | None) -> float | None:
         return None
 
 
-def _twilio_get_balance(account_sid: str, auth_token: str, api_key_sid: str, api_key_secret: str) -> dict:
+async def _twilio_get_balance(account_sid: str, auth_token: str, api_key_sid: str, api_key_secret: str) -> dict:
     if not account_sid:
         raise HTTPException(status_code=400, detail="Twilio no configurado en el servidor.")
-    url = f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Balance.json"
     auth_b64 = _twilio_auth_b64(account_sid, auth_token, api_key_sid, api_key_secret)
-    req = Request(url, method="GET")
-    req.add_header("Authorization", f"Basic {auth_b64}")
-    try:
-        with urlopen(req, timeout=20) as res:
-            return json.loads(res.read().decode("utf-8"))
-    except HTTPError as e:
-        try:
-            err = json.loads(e.read().decode("utf-8"))
-            detail = err.get("message") or err
-        except Exception:
-            detail = str(e)
-        raise HTTPException(status_code=400, detail=f"Twilio error: {detail}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error consultando balance Twilio: {e}")
+    return await _twilio_request(
+        "GET",
+        f"/2010-04-01/Accounts/{account_sid}/Balance.json",
+        auth_b64,
+        "Error consultando balance Twilio",
+    )
 
 
 @router.post("/test")
@@ -395,7 +440,7 @@ async def whatsapp_test_send(
         tenant_name=tenant.name or "la academia",
         custom_part=tenant.whatsapp_message,
     )
-    twilio_payload = _twilio_send_whatsapp_template(
+    twilio_payload = await _twilio_send_whatsapp_template(
         to_phone=to_phone,
         content_sid=template_sid,
         content_variables=template_variables,
@@ -448,7 +493,7 @@ async def whatsapp_status(
         raise HTTPException(status_code=404, detail="Mensaje no encontrado.")
 
     account_sid, auth_token, api_key_sid, api_key_secret, _, _, _ = await _resolve_twilio_config(db)
-    twilio_payload = _twilio_get_message_status(
+    twilio_payload = await _twilio_get_message_status(
         sid, account_sid=account_sid, auth_token=auth_token, api_key_sid=api_key_sid, api_key_secret=api_key_secret
     )
     log.status = twilio_payload.get("status")
@@ -479,31 +524,36 @@ async def whatsapp_status_callback(
 ):
     if not MessageSid:
         return {"ok": True}
-    log = (
-        await db.execute(select(WhatsAppMessageLog).where(WhatsAppMessageLog.sid == MessageSid))
-    ).scalars().first()
-    if log:
-        log.status = MessageStatus or log.status
-        log.error_code = ErrorCode or log.error_code
-        log.error_message = ErrorMessage or log.error_message
-        # Twilio callback does not always include price, so fetch full message state.
-        try:
-            account_sid, auth_token, api_key_sid, api_key_secret, _, _, _ = await _resolve_twilio_config(db)
-            st = _twilio_get_message_status(
-                MessageSid,
-                account_sid=account_sid,
-                auth_token=auth_token,
-                api_key_sid=api_key_sid,
-                api_key_secret=api_key_secret,
-            )
-            price = _twilio_price_usd(st)
-            if price is not None:
-                log.price_usd = price
-            if st.get("price_unit"):
-                log.price_unit = st.get("price_unit")
-        except Exception:
-            pass
-        await db.commit()
+    change = {
+        "status": (MessageStatus or "").lower() or None,
+        "error_code": ErrorCode or None,
+        "error_message": ErrorMessage or None,
+    }
+    if not settings.whatsapp_status_worker_enabled:
+        # Sin worker no hay quien vacie la cola: se aplica directo como antes.
+        log = (
+            await db.execute(select(WhatsAppMessageLog).where(WhatsAppMessageLog.sid == MessageSid))
+        ).scalars().first()
+        if log:
+            needs_price = _apply_status_change(log, change)
+            await db.commit()
+            if needs_price:
+                await _fetch_status_prices(db, [MessageSid])
+        return {"ok": True}
+    # Solo se encola: el worker aplica el estado y consulta el precio fuera del webhook.
+    await db.execute(
+        insert(WhatsAppStatusEvent).values(
+            sid=MessageSid,
+            status=MessageStatus or None,
+            error_code=ErrorCode or None,
+            error_message=ErrorMessage or None,
+            received_at=datetime.utcnow(),
+            next_attempt_at=datetime.utcnow(),
+        )
+    )
+    await db.commit()
+    if _status_wakeup is not None:
+        _status_wakeup.set()
     return {"ok": True}
 
 
@@ -581,6 +631,8 @@ async def set_twilio_admin_config(
     await _set_app_setting(db, "twilio_whatsapp_template_sid", template_sid)
     await _set_app_setting(db, "twilio_enabled", "true" if payload.enabled else "false")
     await db.commit()
+    # Invalidar tambien tras el commit: una lectura concurrente pudo recargar los valores viejos.
+    invalidate_app_settings(*TWILIO_SETTING_KEYS)
 
     return TwilioAdminConfigOut(
         account_sid=sid,
@@ -611,7 +663,7 @@ async def twilio_admin_test(
         raise HTTPException(status_code=400, detail="Numero destino invalido.")
     template_sid = await _resolve_twilio_template_sid(db)
     test_label = (payload.body or "Prueba rapida").strip()
-    sent = _twilio_send_whatsapp_template(
+    sent = await _twilio_send_whatsapp_template(
         to_phone=to_phone,
         content_sid=template_sid,
         content_variables=_build_template_variables(
@@ -637,7 +689,7 @@ async def twilio_admin_test(
         # Small polling window to provide clearer sandbox feedback (join / no join)
         for _ in range(3):
             await asyncio.sleep(1.5)
-            st = _twilio_get_message_status(
+            st = await _twilio_get_message_status(
                 sid, account_sid=account_sid, auth_token=auth_token, api_key_sid=api_key_sid, api_key_secret=api_key_secret
             )
             final_status = (st.get("status") or final_status or "").lower()
@@ -678,7 +730,7 @@ async def get_twilio_admin_balance(
     if not enabled:
         raise HTTPException(status_code=400, detail="Twilio esta desactivado en configuracion.")
 
-    payload = _twilio_get_balance(
+    payload = await _twilio_get_balance(
         account_sid=account_sid,
         auth_token=auth_token,
         api_key_sid=api_key_sid,
@@ -714,3 +766,458 @@ async def get_twilio_admin_balance(
 
 
 
+
+
+class _RateLimiter:
+    """Espacia los envios para no superar N mensajes por segundo hacia Twilio."""
+
+    def __init__(self, rate_per_second: float):
+        self._interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._lock = asyncio.Lock()
+        self._next_at = 0.0
+
+    async def wait(self) -> None:
+        if not self._interval:
+            return
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            if self._next_at > now:
+                await asyncio.sleep(self._next_at - now)
+                now = self._next_at
+            self._next_at = now + self._interval
+
+
+# Referencias fuertes a las campañas en curso para que el GC no las cancele.
+_campaign_tasks: set[asyncio.Task] = set()
+
+
+def _campaign_out(campaign: WhatsAppCampaign) -> WhatsAppCampaignOut:
+    processed = (campaign.sent or 0) + (campaign.failed or 0) + (campaign.skipped or 0)
+    total = campaign.total or 0
+    return WhatsAppCampaignOut(
+        id=campaign.id,
+        kind=campaign.kind,
+        status=campaign.status,
+        total=total,
+        sent=campaign.sent or 0,
+        failed=campaign.failed or 0,
+        skipped=campaign.skipped or 0,
+        processed=processed,
+        progress_percent=round((processed / total) * 100.0, 1) if total else 100.0,
+        last_error=campaign.last_error,
+        created_at=campaign.created_at,
+        started_at=campaign.started_at,
+        finished_at=campaign.finished_at,
+    )
+
+
+async def _run_payment_reminder_campaign(
+    campaign_id: int,
+    tenant_id: int,
+    recipients: list[dict],
+    twilio_config: tuple[str, str, str, str, str],
+    template_sid: str,
+) -> None:
+    account_sid, auth_token, api_key_sid, api_key_secret, whatsapp_from = twilio_config
+    semaphore = asyncio.Semaphore(max(settings.whatsapp_campaign_concurrency, 1))
+    limiter = _RateLimiter(settings.whatsapp_campaign_rate_per_second)
+    batch_size = max(settings.whatsapp_campaign_batch_size, 1)
+    loop = asyncio.get_running_loop()
+
+    pending_logs: list[WhatsAppMessageLog] = []
+    progress = {"sent": 0, "failed": 0, "last_error": None, "flushed_at": loop.time()}
+    flush_lock = asyncio.Lock()
+
+    async with SessionLocal() as db:
+        campaign = await db.get(WhatsAppCampaign, campaign_id)
+        if not campaign:
+            return
+        campaign.status = "running"
+        campaign.started_at = datetime.utcnow()
+        await db.commit()
+
+        def flush_due() -> bool:
+            return len(pending_logs) >= batch_size or loop.time() - progress["flushed_at"] >= CAMPAIGN_FLUSH_SECONDS
+
+        async def flush(force: bool = False) -> None:
+            # Una sola sesion compartida por todos los envios: los commits se serializan.
+            async with flush_lock:
+                if not force and not flush_due():
+                    return
+                if pending_logs:
+                    db.add_all(pending_logs)
+                    pending_logs.clear()
+                campaign.sent = progress["sent"]
+                campaign.failed = progress["failed"]
+                campaign.last_error = progress["last_error"]
+                campaign.updated_at = datetime.utcnow()
+                progress["flushed_at"] = loop.time()
+                await db.commit()
+
+        async def send_one(recipient: dict) -> None:
+            async with semaphore:
+                await limiter.wait()
+                try:
+                    payload = await _twilio_send_whatsapp_template(
+                        to_phone=recipient["to_phone"],
+                        content_sid=template_sid,
+                        content_variables=recipient["variables"],
+                        account_sid=account_sid,
+                        auth_token=auth_token,
+                        api_key_sid=api_key_sid,
+                        api_key_secret=api_key_secret,
+                        whatsapp_from=whatsapp_from,
+                    )
+                except HTTPException as e:
+                    progress["failed"] += 1
+                    progress["last_error"] = f"{recipient['to_phone']}: {e.detail}"
+                else:
+                    progress["sent"] += 1
+                    pending_logs.append(
+                        WhatsAppMessageLog(
+                            tenant_id=tenant_id,
+                            student_id=recipient["student_id"],
+                            course_id=recipient["course_id"],
+                            to_phone=recipient["to_phone"],
+                            message_body=recipient["body"],
+                            sid=payload.get("sid"),
+                            status=payload.get("status"),
+                            price_usd=_twilio_price_usd(payload),
+                            price_unit=payload.get("price_unit"),
+                            error_code=payload.get("error_code"),
+                            error_message=payload.get("error_message"),
+                        )
+                    )
+            if flush_due():
+                await flush()
+
+        try:
+            await asyncio.gather(*(send_one(r) for r in recipients))
+            await flush(force=True)
+            campaign.status = "completed"
+        except asyncio.CancelledError:
+            # Apagado del servidor: se guarda lo enviado y la campaña queda cerrada en vez de "running".
+            try:
+                await flush(force=True)
+            except Exception:
+                await db.rollback()
+            campaign = await db.get(WhatsAppCampaign, campaign_id)
+            if campaign:
+                campaign.status = "cancelled"
+                campaign.last_error = "Campaña interrumpida por reinicio del servidor."
+                campaign.finished_at = datetime.utcnow()
+                await db.commit()
+            raise
+        except Exception as e:
+            logger.exception("Campaña WhatsApp %s fallo", campaign_id)
+            await db.rollback()
+            campaign = await db.get(WhatsAppCampaign, campaign_id)
+            if not campaign:
+                return
+            campaign.status = "failed"
+            campaign.last_error = str(e)
+        campaign.finished_at = datetime.utcnow()
+        await db.commit()
+
+
+async def cancel_whatsapp_campaigns() -> None:
+    for task in list(_campaign_tasks):
+        task.cancel()
+    if _campaign_tasks:
+        await asyncio.gather(*_campaign_tasks, return_exceptions=True)
+
+
+@router.post("/campaigns/payment-reminders", response_model=WhatsAppCampaignOut, status_code=202)
+async def start_payment_reminder_campaign(
+    tenant_id: int = Depends(get_tenant_id),
+    db: AsyncSession = Depends(get_db_session),
+):
+    tenant = (
+        await db.execute(select(Tenant).where(Tenant.id == tenant_id))
+    ).scalars().first()
+    if not tenant:
+        raise HTTPException(status_code=404, detail="Tenant no encontrado.")
+
+    account_sid, auth_token, api_key_sid, api_key_secret, whatsapp_from, enabled, _ = await _resolve_twilio_config(db)
+    if not enabled:
+        raise HTTPException(status_code=400, detail="Twilio esta desactivado en configuracion.")
+    if not account_sid or not whatsapp_from:
+        raise HTTPException(status_code=400, detail="Twilio no configurado en el servidor.")
+    _twilio_auth_b64(account_sid, auth_token, api_key_sid, api_key_secret)
+
+    stale_cutoff = datetime.utcnow() - timedelta(minutes=CAMPAIGN_STALE_MINUTES)
+    in_progress = (
+        await db.execute(
+            select(WhatsAppCampaign.id).where(
+                WhatsAppCampaign.tenant_id == tenant_id,
+                WhatsAppCampaign.kind == "payment_reminders",
+                WhatsAppCampaign.status.in_(("queued", "running")),
+                WhatsAppCampaign.updated_at >= stale_cutoff,
+            )
+        )
+    ).scalars().first()
+    if in_progress:
+        raise HTTPException(status_code=409, detail=f"Ya hay una campaña en curso (#{in_progress}).")
+
+    template_sid = await _resolve_twilio_template_sid(db)
+    tenant_name = tenant.name or "la academia"
+    # Misma regla que el KPI "pendings" del dashboard.
+    today = datetime.now(ZoneInfo("America/Santiago")).date()
+    rows = (
+        await db.execute(
+            select(Student, Course)
+            .join(Enrollment, Enrollment.student_id == Student.id)
+            .join(Course, Course.id == Enrollment.course_id)
+            .where(
+                Enrollment.tenant_id == tenant_id,
+                Student.tenant_id == tenant_id,
+                Course.tenant_id == tenant_id,
+                Enrollment.is_active == True,
+                (Enrollment.end_date == None) | (Enrollment.end_date < today),
+            )
+            .order_by(Enrollment.id)
+        )
+    ).all()
+
+    recipients: list[dict] = []
+    skipped = 0
+    seen: set[tuple[int, int]] = set()
+    for student, course in rows:
+        if (student.id, course.id) in seen:
+            continue
+        seen.add((student.id, course.id))
+        to_phone = _normalize_phone(student.phone, tenant)
+        if not to_phone:
+            skipped += 1
+            continue
+        recipients.append(
+            {
+                "student_id": student.id,
+                "course_id": course.id,
+                "to_phone": to_phone,
+                "variables": _build_template_variables(
+                    student_name=student.first_name,
+                    course_name=course.name or "curso",
+                    schedule=_course_schedule_text(course),
+                    tenant_name=tenant_name,
+                ),
+                "body": _build_message(
+                    student_name=student.first_name,
+                    course=course,
+                    tenant_name=tenant_name,
+                    custom_part=tenant.whatsapp_message,
+                ),
+            }
+        )
+
+    now = datetime.utcnow()
+    campaign = WhatsAppCampaign(
+        tenant_id=tenant_id,
+        kind="payment_reminders",
+        status="queued" if recipients else "completed",
+        total=len(recipients) + skipped,
+        sent=0,
+        failed=0,
+        skipped=skipped,
+        finished_at=None if recipients else now,
+        created_at=now,
+        updated_at=now,
+    )
+    db.add(campaign)
+    await db.commit()
+
+    if recipients:
+        task = asyncio.create_task(
+            _run_payment_reminder_campaign(
+                campaign.id,
+                tenant_id,
+                recipients,
+                (account_sid, auth_token, api_key_sid, api_key_secret, whatsapp_from),
+                template_sid,
+            )
+        )
+        _campaign_tasks.add(task)
+        task.add_done_callback(_campaign_tasks.discard)
+    return _campaign_out(campaign)
+
+
+@router.get("/campaigns", response_model=list[WhatsAppCampaignOut])
+async def list_campaigns(
+    tenant_id: int = Depends(get_tenant_id),
+    db: AsyncSession = Depends(get_db_session),
+):
+    campaigns = (
+        await db.execute(
+            select(WhatsAppCampaign)
+            .where(WhatsAppCampaign.tenant_id == tenant_id)
+            .order_by(WhatsAppCampaign.id.desc())
+            .limit(20)
+        )
+    ).scalars().all()
+    return [_campaign_out(c) for c in campaigns]
+
+
+@router.get("/campaigns/{campaign_id}", response_model=WhatsAppCampaignOut)
+async def get_campaign(
+    campaign_id: int,
+    tenant_id: int = Depends(get_tenant_id),
+    db: AsyncSession = Depends(get_db_session),
+):
+    campaign = (
+        await db.execute(
+            select(WhatsAppCampaign).where(
+                WhatsAppCampaign.id == campaign_id,
+                WhatsAppCampaign.tenant_id == tenant_id,
+            )
+        )
+    ).scalars().first()
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaña no encontrada.")
+    return _campaign_out(campaign)
+
+
+_status_worker_task: asyncio.Task | None = None
+_status_wakeup: asyncio.Event | None = None
+
+
+def _status_rank(status: str | None) -> int:
+    # Un estado desconocido no pisa a uno conocido (ni a uno terminal).
+    return STATUS_RANK.get((status or "").lower(), -1)
+
+
+def _coalesce_status_events(events: list[WhatsAppStatusEvent]) -> dict[str, dict]:
+    merged: dict[str, dict] = {}
+    for event in sorted(events, key=lambda e: e.id):
+        current = merged.setdefault(event.sid, {"status": None, "error_code": None, "error_message": None})
+        status = (event.status or "").lower() or None
+        if status and (current["status"] is None or _status_rank(status) >= _status_rank(current["status"])):
+            current["status"] = status
+        current["error_code"] = event.error_code or current["error_code"]
+        current["error_message"] = event.error_message or current["error_message"]
+    return merged
+
+
+def _apply_status_change(log: WhatsAppMessageLog, change: dict) -> bool:
+    """Aplica un estado (ya combinado) al log. Devuelve True si falta consultar el precio."""
+    if change["status"] and _status_rank(change["status"]) >= _status_rank(log.status):
+        log.status = change["status"]
+    log.error_code = change["error_code"] or log.error_code
+    log.error_message = change["error_message"] or log.error_message
+    return log.price_usd is None and (log.status or "").lower() in PRICED_STATUSES
+
+
+async def _apply_status_events(db: AsyncSession) -> tuple[int, list[str]]:
+    """Aplica un lote de eventos pendientes. Devuelve (eventos procesados, sids sin precio)."""
+    now = datetime.utcnow()
+    events = (
+        await db.execute(
+            select(WhatsAppStatusEvent)
+            .where(WhatsAppStatusEvent.next_attempt_at <= now)
+            .order_by(WhatsAppStatusEvent.id)
+            .limit(max(settings.whatsapp_status_batch_size, 1))
+            .with_for_update(skip_locked=True)
+        )
+    ).scalars().all()
+    if not events:
+        return 0, []
+
+    merged = _coalesce_status_events(events)
+    logs = (
+        await db.execute(select(WhatsAppMessageLog).where(WhatsAppMessageLog.sid.in_(list(merged))))
+    ).scalars().all()
+    logs_by_sid = {log.sid: log for log in logs}
+
+    needs_price: list[str] = []
+    for sid, change in merged.items():
+        log = logs_by_sid.get(sid)
+        if log and _apply_status_change(log, change):
+            needs_price.append(sid)
+
+    done_ids = [e.id for e in events if e.sid in logs_by_sid]
+    # El log puede no existir aun (p.ej. campañas que escriben en lotes): reintentar mas tarde.
+    retry_cutoff = now - timedelta(minutes=STATUS_EVENT_MAX_AGE_MINUTES)
+    orphan_ids = [e.id for e in events if e.sid not in logs_by_sid and e.received_at >= retry_cutoff]
+    expired_ids = [e.id for e in events if e.sid not in logs_by_sid and e.received_at < retry_cutoff]
+    if done_ids or expired_ids:
+        await db.execute(delete(WhatsAppStatusEvent).where(WhatsAppStatusEvent.id.in_(done_ids + expired_ids)))
+    if orphan_ids:
+        await db.execute(
+            update(WhatsAppStatusEvent)
+            .where(WhatsAppStatusEvent.id.in_(orphan_ids))
+            .values(next_attempt_at=now + timedelta(seconds=STATUS_EVENT_RETRY_SECONDS))
+        )
+    await db.commit()
+    return len(events), needs_price
+
+
+async def _fetch_status_prices(db: AsyncSession, sids: list[str]) -> None:
+    if not sids:
+        return
+    account_sid, auth_token, api_key_sid, api_key_secret, _, _, _ = await _resolve_twilio_config(db)
+    semaphore = asyncio.Semaphore(max(settings.whatsapp_status_price_concurrency, 1))
+
+    async def fetch(sid: str) -> tuple[str, dict | None]:
+        async with semaphore:
+            try:
+                return sid, await _twilio_get_message_status(
+                    sid,
+                    account_sid=account_sid,
+                    auth_token=auth_token,
+                    api_key_sid=api_key_sid,
+                    api_key_secret=api_key_secret,
+                )
+            except HTTPException:
+                return sid, None
+
+    results = dict(await asyncio.gather(*(fetch(sid) for sid in sids)))
+    priced = {sid: payload for sid, payload in results.items() if _twilio_price_usd(payload) is not None}
+    if not priced:
+        return
+    logs = (
+        await db.execute(select(WhatsAppMessageLog).where(WhatsAppMessageLog.sid.in_(list(priced))))
+    ).scalars().all()
+    for log in logs:
+        payload = priced[log.sid]
+        log.price_usd = _twilio_price_usd(payload)
+        if payload.get("price_unit"):
+            log.price_unit = payload.get("price_unit")
+    await db.commit()
+
+
+async def _status_worker_loop() -> None:
+    while True:
+        try:
+            async with SessionLocal() as db:
+                processed, needs_price = await _apply_status_events(db)
+                # Precios fuera de la transaccion que bloquea los eventos.
+                await _fetch_status_prices(db, needs_price)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error procesando callbacks de estado WhatsApp")
+            processed = 0
+        if processed >= settings.whatsapp_status_batch_size:
+            continue
+        try:
+            await asyncio.wait_for(_status_wakeup.wait(), timeout=settings.whatsapp_status_poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+        _status_wakeup.clear()
+
+
+def start_whatsapp_status_worker() -> None:
+    global _status_worker_task, _status_wakeup
+    if not settings.whatsapp_status_worker_enabled or _status_worker_task is not None:
+        return
+    _status_wakeup = asyncio.Event()
+    _status_worker_task = asyncio.create_task(_status_worker_loop())
+
+
+async def stop_whatsapp_status_worker() -> None:
+    global _status_worker_task, _status_wakeup
+    if _status_worker_task is None:
+        return
+    _status_worker_task.cancel()
+    await asyncio.gather(_status_worker_task, return_exceptions=True)
+    _status_worker_task = None
+    _status_wakeup = None
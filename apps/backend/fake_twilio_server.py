@@ -0,0 +1,137 @@
+"""Servidor Twilio falso para probar latencia y concurrencia sin salir a internet.
+
+Levantar el servidor (latencia simulada de 800 ms por llamada):
+
+    FAKE_TWILIO_LATENCY_MS=800 uvicorn fake_twilio_server:app --port 8099
+
+Apuntar el backend a este servidor en el .env:
+
+    TWILIO_API_BASE_URL=http://127.0.0.1:8099
+    TWILIO_ACCOUNT_SID=ACfake
+    TWILIO_AUTH_TOKEN=fake
+
+Verificar que N envios concurrentes tardan ~1x la latencia y no N veces:
+
+    python fake_twilio_server.py probe --requests 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import secrets
+import time
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Form, HTTPException
+
+LATENCY_MS = int(os.getenv("FAKE_TWILIO_LATENCY_MS", "300"))
+JITTER_MS = int(os.getenv("FAKE_TWILIO_JITTER_MS", "50"))
+FAILURE_RATE = float(os.getenv("FAKE_TWILIO_FAILURE_RATE", "0"))
+
+app = FastAPI(title="Fake Twilio")
+_messages: dict[str, dict] = {}
+_stats = {"in_flight": 0, "max_in_flight": 0, "requests": 0}
+
+
+async def _simulate_latency() -> None:
+    _stats["requests"] += 1
+    _stats["in_flight"] += 1
+    _stats["max_in_flight"] = max(_stats["max_in_flight"], _stats["in_flight"])
+    try:
+        await asyncio.sleep(max(0, LATENCY_MS + random.randint(-JITTER_MS, JITTER_MS)) / 1000)
+    finally:
+        _stats["in_flight"] -= 1
+
+
+@app.post("/2010-04-01/Accounts/{account_sid}/Messages.json", status_code=201)
+async def create_message(
+    account_sid: str,
+    To: str = Form(default=""),
+    From: str = Form(default=""),
+    Body: str = Form(default=""),
+    ContentSid: str = Form(default=""),
+    ContentVariables: str = Form(default=""),
+):
+    await _simulate_latency()
+    if FAILURE_RATE and random.random() < FAILURE_RATE:
+        raise HTTPException(status_code=429, detail="Too Many Requests")
+    sid = f"SM{secrets.token_hex(16)}"
+    _messages[sid] = {
+        "sid": sid,
+        "account_sid": account_sid,
+        "to": To,
+        "from": From,
+        "body": Body or f"template:{ContentSid} {ContentVariables}",
+        "status": "queued",
+        "price": None,
+        "price_unit": "USD",
+        "error_code": None,
+        "error_message": None,
+        "date_created": datetime.now(timezone.utc).isoformat(),
+    }
+    return _messages[sid]
+
+
+@app.get("/2010-04-01/Accounts/{account_sid}/Messages/{sid}.json")
+async def get_message(account_sid: str, sid: str):
+    await _simulate_latency()
+    message = _messages.get(sid)
+    if not message:
+        raise HTTPException(status_code=404, detail=f"The requested resource {sid} was not found")
+    message["status"] = "delivered"
+    message["price"] = "-0.00500"
+    return message
+
+
+@app.get("/2010-04-01/Accounts/{account_sid}/Balance.json")
+async def get_balance(account_sid: str):
+    await _simulate_latency()
+    return {"account_sid": account_sid, "balance": "17.25", "currency": "USD"}
+
+
+@app.get("/_stats")
+async def get_stats():
+    return _stats
+
+
+async def probe(total: int) -> None:
+    from app.core.config import settings
+    from app.pms.twilio_client import close_twilio_client
+    from app.routers.pms_whatsapp import _twilio_send_whatsapp
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *[
+            _twilio_send_whatsapp(
+                to_phone=f"whatsapp:+5690000{i:04d}",
+                message="Mensaje de prueba",
+                account_sid=settings.twilio_account_sid or "ACfake",
+                auth_token=settings.twilio_auth_token or "fake",
+                api_key_sid="",
+                api_key_secret="",
+                whatsapp_from=settings.twilio_whatsapp_from,
+            )
+            for i in range(total)
+        ],
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - started
+    await close_twilio_client()
+    failures = [r for r in results if isinstance(r, Exception)]
+    print(f"Base URL: {settings.twilio_api_base_url}")
+    print(f"{total} envios en {elapsed:.2f}s ({len(failures)} fallidos)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["serve", "probe"])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+    if args.command == "serve":
+        import uvicorn
+
+        uvicorn.run(app, host="127.0.0.1", port=args.port)
+    else:
+        asyncio.run(probe(args.requests))
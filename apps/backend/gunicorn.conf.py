@@ -0,0 +1,17 @@
+# Perfil de produccion: gunicorn como gestor de procesos con workers uvicorn.
+# Uso: gunicorn -c gunicorn.conf.py app.main:app
+# WEB_CONCURRENCY define los workers y tambien el reparto del pool de Postgres (app/db/session.py).
+# Los caches en memoria son por worker; con mas de uno sus TTL por defecto bajan (app/core/config.py).
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+accesslog = "-"
+errorlog = "-"
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
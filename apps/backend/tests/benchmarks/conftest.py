@@ -0,0 +1,114 @@
+import os
+import time
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import insert, text
+
+from app.pms.models import Course, Enrollment, Student, Tenant
+
+
+# Benchmarks: se omiten salvo con RUN_BENCHMARKS=1 y se corren con -s para ver los numeros
+#   RUN_BENCHMARKS=1 TEST_DATABASE_URL=... python -m pytest -q -s tests/benchmarks
+RUN_BENCHMARKS = os.getenv("RUN_BENCHMARKS") == "1"
+
+
+@pytest.fixture(autouse=True)
+def _benchmarks_enabled():
+    if not RUN_BENCHMARKS:
+        pytest.skip("RUN_BENCHMARKS=1 no definido")
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    """Mejor tiempo (segundos) de fn() en repeat corridas."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def best_of_async(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def report(title: str, rows: list[tuple[str, float]]) -> None:
+    print(f"\n{title}")
+    for label, seconds in rows:
+        print(f"  {label:<48} {seconds * 1000:10.2f} ms")
+
+
+async def seed_attendance_history(
+    db,
+    *,
+    tenants: int,
+    students_per_tenant: int,
+    courses_per_tenant: int,
+    rows_per_enrollment: int,
+    days_between: int = 3,
+) -> list[int]:
+    """Alumnos con una matricula vigente cada uno y rows_per_enrollment asistencias hacia atras
+    (una cada days_between dias). Devuelve los ids de tenant."""
+    today = date.today()
+    tenant_ids: list[int] = []
+    for t in range(tenants):
+        tenant = Tenant(name=f"Bench {t}", slug=f"bench-{t}")
+        db.add(tenant)
+        await db.flush()
+        tenant_ids.append(tenant.id)
+        courses = [
+            Course(tenant_id=tenant.id, name=f"Curso {c}", day_of_week=c % 7, day_of_week_2=(c + 3) % 7)
+            for c in range(courses_per_tenant)
+        ]
+        db.add_all(courses)
+        await db.flush()
+        student_ids = (
+            await db.execute(
+                insert(Student)
+                .values(
+                    [
+                        {"tenant_id": tenant.id, "first_name": f"Alumno {s}", "last_name": "Bench"}
+                        for s in range(students_per_tenant)
+                    ]
+                )
+                .returning(Student.id)
+            )
+        ).scalars().all()
+        await db.execute(
+            insert(Enrollment).values(
+                [
+                    {
+                        "tenant_id": tenant.id,
+                        "student_id": student_id,
+                        "course_id": courses[i % len(courses)].id,
+                        "start_date": today - timedelta(days=20),
+                        "end_date": today + timedelta(days=8),
+                    }
+                    for i, student_id in enumerate(student_ids)
+                ]
+            )
+        )
+    await extend_attendance_history(db, 0, rows_per_enrollment, days_between)
+    return tenant_ids
+
+
+async def extend_attendance_history(db, first_row: int, last_row: int, days_between: int = 3) -> None:
+    """Agrega a cada matricula las asistencias first_row..last_row-1 hacia atras desde hoy y
+    actualiza las estadisticas del planificador."""
+    await db.execute(
+        text(
+            "INSERT INTO attendance (tenant_id, student_id, course_id, attended_at, is_recovery) "
+            "SELECT e.tenant_id, e.student_id, e.course_id, current_date - g.n + time '19:00', false "
+            "FROM enrollments e CROSS JOIN generate_series(CAST(:first AS integer), CAST(:last AS integer), CAST(:step AS integer)) AS g(n)"
+        ),
+        {"first": first_row * days_between, "last": (last_row - 1) * days_between, "step": days_between},
+    )
+    await db.commit()
+    await (await db.connection()).exec_driver_sql("ANALYZE")
+    await db.commit()
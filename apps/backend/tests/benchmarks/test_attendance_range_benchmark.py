@@ -0,0 +1,81 @@
+import os
+
+from sqlalchemy import Date, and_, cast, func, select
+
+from app.pms.models import Attendance, Enrollment
+from app.pms.rollups import attended_from, attended_through
+from tests.benchmarks.conftest import best_of_async, report, seed_attendance_history
+
+
+# Conteo de asistencia dentro del periodo de cada matricula sobre una tabla de asistencia de
+# ~1M filas: antes cast(attended_at, Date) contra las fechas de la matricula, ahora rangos
+# semiabiertos de timestamp que usan ix_attendance_tenant_student_course_at completo.
+ATTENDANCE_ROWS = int(os.getenv("BENCHMARK_ATTENDANCE_ROWS", "1000000"))
+TENANTS = 4
+STUDENTS_PER_TENANT = 500
+ROWS_PER_ENROLLMENT = max(1, ATTENDANCE_ROWS // (TENANTS * STUDENTS_PER_TENANT))
+
+
+def _cast_from(day):
+    return cast(Attendance.attended_at, Date) >= day
+
+
+def _cast_through(day):
+    return cast(Attendance.attended_at, Date) <= day
+
+
+def _period_counts(tenant_id: int, enrollment_ids: list[int], date_from, date_through):
+    return (
+        select(Enrollment.id, func.count(Attendance.id))
+        .select_from(Enrollment)
+        .join(
+            Attendance,
+            and_(
+                Attendance.tenant_id == Enrollment.tenant_id,
+                Attendance.student_id == Enrollment.student_id,
+                Attendance.course_id == Enrollment.course_id,
+                date_from(Enrollment.start_date),
+                date_through(Enrollment.end_date),
+            ),
+        )
+        .where(Enrollment.tenant_id == tenant_id, Enrollment.id.in_(enrollment_ids))
+        .group_by(Enrollment.id)
+    )
+
+
+def test_attendance_range_benchmark(pg):
+    async def scenario(db, engine):
+        tenant_ids = await seed_attendance_history(
+            db,
+            tenants=TENANTS,
+            students_per_tenant=STUDENTS_PER_TENANT,
+            courses_per_tenant=10,
+            rows_per_enrollment=ROWS_PER_ENROLLMENT,
+        )
+        tenant_id = tenant_ids[0]
+        enrollment_ids = (
+            await db.execute(select(Enrollment.id).where(Enrollment.tenant_id == tenant_id).order_by(Enrollment.id))
+        ).scalars().all()
+        total_rows = (await db.execute(select(func.count(Attendance.id)))).scalar_one()
+
+        timings = []
+        results = {}
+        for scope, ids in (("1 matricula (portal)", enrollment_ids[:1]), ("500 matriculas (tenant)", enrollment_ids)):
+            for label, date_from, date_through in (
+                ("cast a Date (anterior)", _cast_from, _cast_through),
+                ("rango semiabierto", attended_from, attended_through),
+            ):
+                stmt = _period_counts(tenant_id, ids, date_from, date_through)
+
+                async def run():
+                    results[(scope, label)] = sorted((await db.execute(stmt)).all())
+
+                timings.append((f"{scope}: {label}", await best_of_async(run)))
+        return total_rows, timings, results
+
+    total_rows, timings, results = pg(scenario)
+    report(f"asistencia en el periodo, {total_rows} filas de asistencia", timings)
+    for scope in ("1 matricula (portal)", "500 matriculas (tenant)"):
+        assert results[(scope, "cast a Date (anterior)")] == results[(scope, "rango semiabierto")]
+    timing = dict(timings)
+    assert timing["500 matriculas (tenant): rango semiabierto"] < timing["500 matriculas (tenant): cast a Date (anterior)"]
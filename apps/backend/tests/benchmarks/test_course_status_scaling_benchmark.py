@@ -0,0 +1,77 @@
+from sqlalchemy import Date, and_, cast, func, or_, select
+
+from app.pms.models import Attendance, Enrollment
+from app.routers.pms_course_status import _load_course_entries
+from tests.benchmarks.conftest import best_of_async, extend_attendance_history, report, seed_attendance_history
+
+
+# course_status de un tenant con 500 matriculas vigentes mientras crece el historial de
+# asistencia. La agregacion anterior (todas las asistencias del tenant, filtradas despues del
+# join) crece con el historial; _iter_course_entries solo lee el periodo de cada matricula.
+TENANTS = 4
+STUDENTS = 500
+HISTORY_STEPS = (10, 100, 300, 600)
+
+
+def _previous_aggregation(tenant_id: int):
+    attended_day = cast(Attendance.attended_at, Date)
+    joined = and_(
+        Enrollment.student_id == Attendance.student_id,
+        Enrollment.course_id == Attendance.course_id,
+        Enrollment.tenant_id == Attendance.tenant_id,
+    )
+    att = (
+        select(Enrollment.id.label("enrollment_id"), func.count(Attendance.id), func.array_agg(func.distinct(attended_day)))
+        .join(Enrollment, joined)
+        .where(
+            Attendance.tenant_id == tenant_id,
+            attended_day >= Enrollment.start_date,
+            or_(Enrollment.end_date == None, attended_day <= Enrollment.end_date),
+            or_(Attendance.notes == None, Attendance.notes != "clase_suelta"),
+        )
+        .group_by(Enrollment.id, Attendance.student_id, Attendance.course_id)
+    )
+    extra = (
+        select(Enrollment.id.label("enrollment_id"), func.count(Attendance.id), func.array_agg(func.distinct(attended_day)))
+        .join(Enrollment, joined)
+        .where(
+            Attendance.tenant_id == tenant_id,
+            or_(and_(Enrollment.end_date != None, attended_day > Enrollment.end_date), Attendance.notes == "clase_suelta"),
+        )
+        .group_by(Enrollment.id, Attendance.student_id, Attendance.course_id)
+    )
+    return att, extra
+
+
+def test_course_status_scaling_benchmark(pg):
+    async def scenario(db, engine):
+        tenant_ids = await seed_attendance_history(
+            db, tenants=TENANTS, students_per_tenant=STUDENTS, courses_per_tenant=10, rows_per_enrollment=HISTORY_STEPS[0]
+        )
+        tenant_id = tenant_ids[0]
+        timings = []
+        previous_rows = HISTORY_STEPS[0]
+        for rows in HISTORY_STEPS:
+            if rows > previous_rows:
+                await extend_attendance_history(db, previous_rows, rows)
+                previous_rows = rows
+            total = (await db.execute(select(func.count(Attendance.id)))).scalar_one()
+
+            async def current():
+                await _load_course_entries(db, tenant_id, True, None)
+
+            async def previous():
+                for stmt in _previous_aggregation(tenant_id):
+                    (await db.execute(stmt)).all()
+
+            timings.append((f"{total:>8} filas: _iter_course_entries", await best_of_async(current)))
+            timings.append((f"{total:>8} filas: agregacion anterior (solo asistencia)", await best_of_async(previous)))
+        return timings
+
+    timings = pg(scenario)
+    report(f"course_status, {STUDENTS} matriculas", timings)
+    current = [seconds for label, seconds in timings if "_iter_course_entries" in label]
+    previous = [seconds for label, seconds in timings if "anterior" in label]
+    # 100x mas historial: la agregacion anterior crece con el; course_status no
+    assert previous[-1] > previous[0] * 5
+    assert current[-1] < current[0] * 3
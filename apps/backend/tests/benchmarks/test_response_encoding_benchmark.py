@@ -0,0 +1,84 @@
+import json
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, text
+
+from app.core.config import settings
+from app.core.responses import ORJSONResponse
+from app.pms.models import Enrollment
+from app.pms.rollups import refresh_enrollment_rollups
+from app.routers import pms_dashboard
+from app.routers.pms_course_status import _course_block, _course_status_snapshot
+from app.routers.pms_students import _build_student_portal_summary
+from tests.benchmarks.conftest import best_of, report, seed_attendance_history
+
+
+# Serializacion de las respuestas grandes: antes JSONResponse(jsonable_encoder(payload)),
+# ahora ORJSONResponse(payload) sin pasar por jsonable_encoder. Los payloads son los reales
+# de course_status, del resumen del portal y del dashboard sobre un tenant de 500 alumnos.
+STUDENTS = 500
+
+
+async def _seed_payments(db) -> None:
+    await db.execute(
+        text(
+            "INSERT INTO payments (tenant_id, student_id, student_name, course_id, amount, payment_date, method, type, "
+            "period_start, period_end, created_at, updated_at) "
+            "SELECT e.tenant_id, e.student_id, 'Alumno Bench', e.course_id, 25000.50, e.start_date + g.n, 'transfer', "
+            "'monthly', e.start_date, e.end_date, now(), now() "
+            "FROM enrollments e CROSS JOIN generate_series(0, 2) AS g(n)"
+        )
+    )
+    await db.commit()
+
+
+async def _payloads(db, monkeypatch) -> dict[str, object]:
+    tenant_ids = await seed_attendance_history(
+        db, tenants=1, students_per_tenant=STUDENTS, courses_per_tenant=10, rows_per_enrollment=8
+    )
+    tenant_id = tenant_ids[0]
+    await _seed_payments(db)
+    await refresh_enrollment_rollups(db, tenant_id)
+    await db.commit()
+
+    local_now = datetime.now(ZoneInfo(settings.tz))
+    snapshot = await _course_status_snapshot(db, tenant_id, True, None)
+    course_status = [
+        block
+        for entry in sorted(snapshot.courses.values(), key=lambda item: item["position"])
+        if (block := _course_block(entry, local_now, None, "", "", [])) is not None
+    ]
+
+    student_id = (
+        await db.execute(select(Enrollment.student_id).where(Enrollment.tenant_id == tenant_id).limit(1))
+    ).scalar_one()
+    portal = await _build_student_portal_summary(db, tenant_id, student_id)
+
+    # get_summary arma el dict y lo entrega a ORJSONResponse: se captura el dict sin serializar
+    monkeypatch.setattr(pms_dashboard, "ORJSONResponse", lambda content: content)
+    dashboard = await pms_dashboard.get_summary(tenant_id=tenant_id, db=db)
+    return {"course_status": course_status, "portal": portal, "dashboard": dashboard}
+
+
+def test_response_encoding_benchmark(pg, monkeypatch):
+    async def scenario(db, engine):
+        return await _payloads(db, monkeypatch)
+
+    payloads = pg(scenario)
+    timings = []
+    for name, payload in payloads.items():
+        before = JSONResponse(jsonable_encoder(payload)).body
+        after = ORJSONResponse(payload).body
+        # Mismo JSON (salvo espacios): orjson escribe fechas y Decimal igual que jsonable_encoder
+        assert orjson.loads(after) == json.loads(before)
+        label = f"{name} ({len(after) // 1024} KB)"
+        timings.append((f"{label}: jsonable_encoder", best_of(lambda: JSONResponse(jsonable_encoder(payload)), 20)))
+        timings.append((f"{label}: ORJSONResponse", best_of(lambda: ORJSONResponse(payload), 20)))
+    report("serializacion de respuestas", timings)
+    timing = [seconds for _label, seconds in timings]
+    for before, after in zip(timing[::2], timing[1::2]):
+        assert after < before
@@ -0,0 +1,60 @@
+import random
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from app.pms.schedule import WEEKDAY_ATTRS, count_weekdays, count_weekdays_many, course_weekdays, period_end_for_course
+from tests.benchmarks.conftest import best_of, report
+from tests.test_schedule import _baseline_period_end_for_course
+
+
+# Conteo de clases y fin de periodo para 10k matriculas: recorrido anterior (semana por semana
+# y dia por dia) contra la aritmetica cerrada de app.pms.schedule.
+ENROLLMENTS = 10_000
+
+
+def _baseline_count(start: date, end: date, weekdays) -> int:
+    # _expected_classes_between anterior (pms_students)
+    total = 0
+    for target_dow in weekdays:
+        cur = start + timedelta(days=(target_dow - start.weekday() + 7) % 7)
+        while cur <= end:
+            total += 1
+            cur += timedelta(days=7)
+    return total
+
+
+def _periods():
+    rng = random.Random(7)
+    base = date(2024, 1, 1)
+    periods = []
+    for _ in range(ENROLLMENTS):
+        course = SimpleNamespace(**{attr: rng.choice([None, rng.randrange(7)]) for attr in WEEKDAY_ATTRS})
+        course.total_classes = rng.choice([4, 8, 12])
+        start = base + timedelta(days=rng.randrange(0, 700))
+        periods.append((start, start + timedelta(days=rng.randrange(0, 365)), course))
+    return periods
+
+
+def test_schedule_benchmark():
+    periods = _periods()
+    counts = [(start, end, course_weekdays(course)) for start, end, course in periods]
+
+    baseline_count = best_of(lambda: [_baseline_count(*item) for item in counts])
+    single_count = best_of(lambda: [count_weekdays(*item) for item in counts])
+    many_count = best_of(lambda: count_weekdays_many(counts))
+    baseline_end = best_of(lambda: [_baseline_period_end_for_course(start, course) for start, _end, course in periods])
+    closed_end = best_of(lambda: [period_end_for_course(start, course) for start, _end, course in periods])
+
+    report(
+        f"schedule: {ENROLLMENTS} matriculas",
+        [
+            ("conteo semana por semana (anterior)", baseline_count),
+            ("count_weekdays por fila", single_count),
+            ("count_weekdays_many", many_count),
+            ("fin de periodo dia por dia (anterior)", baseline_end),
+            ("period_end_for_course", closed_end),
+        ],
+    )
+    assert count_weekdays_many(counts) == [_baseline_count(*item) for item in counts]
+    assert many_count < baseline_count
+    assert closed_end < baseline_end
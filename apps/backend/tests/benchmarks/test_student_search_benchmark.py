@@ -0,0 +1,130 @@
+import os
+import random
+
+from sqlalchemy import and_, func, insert, select
+
+from app.pms.models import Student, Tenant
+from app.routers.pms_students import _student_search_conditions, search_students
+from tests.benchmarks.conftest import best_of_async, report
+
+
+# Busqueda de alumnos sobre ~50k alumnos repartidos en tenants de distinto tamano (uno grande
+# concentra la mitad): expresion anterior (translate/lower/concat_ws en cada fila) contra
+# search_text con y sin el indice trigram ix_students_search_text_trgm.
+TOTAL_STUDENTS = int(os.getenv("BENCHMARK_STUDENTS", "50000"))
+TENANT_SHARES = (0.5, 0.2, 0.1, 0.1, 0.05, 0.05)
+FIRST_NAMES = (
+    "José", "María", "Ana", "Sofía", "Lucía", "Martín", "Tomás", "Valentina", "Matías", "Camila",
+    "Benjamín", "Isidora", "Joaquín", "Antonia", "Agustín", "Florencia", "Vicente", "Catalina",
+    "Ignacio", "Javiera", "Diego", "Francisca", "Nicolás", "Fernanda", "Cristóbal", "Constanza",
+)
+LAST_NAMES = (
+    "Núñez", "Pérez", "González", "Muñoz", "Rojas", "Díaz", "Soto", "Contreras", "Silva", "Martínez",
+    "Sepúlveda", "Morales", "Rodríguez", "López", "Fuentes", "Hernández", "Torres", "Araya", "Flores",
+    "Espinoza", "Valenzuela", "Castillo", "Ramírez", "Reyes", "Gutiérrez", "Castro", "Vargas", "Álvarez",
+)
+# Consultas tipicas del listado: fragmento de telefono, email, nombre + apellido, apellido comun
+QUERIES = ("48213", "castillo4821", "joaquin nunez", "sepulveda")
+
+
+def _legacy_search_conditions(q: str) -> list:
+    search_blob = func.translate(
+        func.lower(
+            func.concat_ws(
+                " ",
+                func.coalesce(Student.first_name, ""),
+                func.coalesce(Student.last_name, ""),
+                func.coalesce(Student.email, ""),
+                func.coalesce(Student.phone, ""),
+            )
+        ),
+        "áéíóúüñ",
+        "aeiouun",
+    )
+    return [and_(*(search_blob.ilike(f"%{term}%") for term in q.split(" ")))]
+
+
+def _student_rows(tenant_id: int, count: int, rng: random.Random) -> list[dict]:
+    rows = []
+    for i in range(count):
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        plain_last = last_name.lower().translate(str.maketrans("áéíóúüñ", "aeiouun"))
+        rows.append(
+            {
+                "tenant_id": tenant_id,
+                "first_name": first_name,
+                "last_name": last_name,
+                "email": f"{plain_last}{rng.randint(1000, 9999)}.{i}@example.com",
+                "phone": f"+56 9 {rng.randint(10000000, 99999999)}",
+            }
+        )
+    return rows
+
+
+async def _seed_students(db, engine) -> int:
+    rng = random.Random(16)
+    tenant_ids = []
+    for t, share in enumerate(TENANT_SHARES):
+        tenant = Tenant(name=f"Bench {t}", slug=f"bench-{t}")
+        db.add(tenant)
+        await db.flush()
+        tenant_ids.append(tenant.id)
+        rows = _student_rows(tenant.id, int(TOTAL_STUDENTS * share), rng)
+        for offset in range(0, len(rows), 2000):
+            await db.execute(insert(Student).values(rows[offset:offset + 2000]))
+    await db.commit()
+    # VACUUM vacia la lista pendiente del GIN tras la carga masiva (en produccion lo hace autovacuum)
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("VACUUM ANALYZE students")
+    return tenant_ids[0]
+
+
+async def _time_queries(db, tenant_id: int, conditions_for, label: str, timings: list, results: dict) -> None:
+    for q in QUERIES:
+        stmt = select(Student.id).where(Student.tenant_id == tenant_id, *conditions_for(q)).order_by(Student.id)
+
+        async def run():
+            results[(label, q)] = (await db.execute(stmt)).scalars().all()
+
+        timings.append((f"listado '{q}': {label}", await best_of_async(run)))
+
+
+async def _time_typeahead(db, tenant_id: int, label: str, timings: list, results: dict) -> None:
+    for q in ("castillo48", "joaquin nu"):
+
+        async def run():
+            results[(label, q)] = await search_students(q=q, limit=10, tenant_id=tenant_id, db=db)
+
+        timings.append((f"typeahead '{q}': {label}", await best_of_async(run)))
+
+
+def test_student_search_benchmark(pg):
+    async def scenario(db, engine):
+        tenant_id = await _seed_students(db, engine)
+        total = (await db.execute(select(func.count(Student.id)))).scalar_one()
+        timings: list[tuple[str, float]] = []
+        results: dict = {}
+        await _time_queries(db, tenant_id, _legacy_search_conditions, "expresion anterior", timings, results)
+        await _time_queries(db, tenant_id, _student_search_conditions, "search_text + trigram", timings, results)
+        await _time_typeahead(db, tenant_id, "search_text + trigram", timings, results)
+        # Mismo search_text sin el indice: cada consulta recorre las filas del tenant
+        await (await db.connection()).exec_driver_sql("DROP INDEX ix_students_search_text_trgm")
+        await _time_queries(db, tenant_id, _student_search_conditions, "search_text sin indice", timings, results)
+        await _time_typeahead(db, tenant_id, "search_text sin indice", timings, results)
+        await db.rollback()
+        return total, timings, results
+
+    total, timings, results = pg(scenario)
+    report(f"busqueda de alumnos, {total} alumnos en {len(TENANT_SHARES)} tenants", timings)
+    timing = dict(timings)
+    for q in QUERIES:
+        assert results[("expresion anterior", q)] == results[("search_text + trigram", q)]
+        assert results[("search_text sin indice", q)] == results[("search_text + trigram", q)]
+    for q in ("castillo48", "joaquin nu"):
+        assert results[("search_text sin indice", q)] == results[("search_text + trigram", q)]
+    # Las consultas selectivas (telefono, email) son las que el indice trigram resuelve sin recorrer el tenant
+    for q in ("48213", "castillo4821"):
+        assert timing[f"listado '{q}': search_text + trigram"] < timing[f"listado '{q}': expresion anterior"]
+        assert timing[f"listado '{q}': search_text + trigram"] < timing[f"listado '{q}': search_text sin indice"]
+    assert timing["typeahead 'castillo48': search_text + trigram"] < timing["typeahead 'castillo48': search_text sin indice"]
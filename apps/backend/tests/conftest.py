@@ -0,0 +1,59 @@
+import asyncio
+import os
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db.base import Base
+from app.pms import models  # noqa: F401  (registra las tablas en Base.metadata)
+
+
+# Las pruebas contra Postgres usan una base desechable: el esquema se borra y se recrea en
+# cada prueba. Sin TEST_DATABASE_URL se omiten.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+async def create_schema(conn) -> None:
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    await conn.run_sync(Base.metadata.drop_all)
+    await conn.run_sync(Base.metadata.create_all)
+
+
+@pytest.fixture
+def pg():
+    """Ejecuta scenario(db, engine) sobre un esquema recien creado y devuelve su resultado."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL no definido (requiere Postgres)")
+
+    def run(scenario):
+        async def main():
+            engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+            try:
+                async with engine.begin() as conn:
+                    await create_schema(conn)
+                async with async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)() as db:
+                    return await scenario(db, engine)
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
+
+
+@contextmanager
+def capture_queries(engine: AsyncEngine):
+    """Lista de (sql, parametros) ejecutados en el engine dentro del bloque."""
+    queries: list[tuple[str, object]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        queries.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
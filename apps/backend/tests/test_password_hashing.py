@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+from app.core import security
+
+
+# El hashing corre en el pool de hilos: el event loop sigue atendiendo otras tareas mientras
+# se verifican varias contraseñas a la vez.
+MAX_LOOP_LAG_SECONDS = 0.1
+
+
+async def _max_loop_lag_during(make_work) -> tuple[list, float, float]:
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - started - 0.005)
+
+    tick_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    results = await make_work()
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick_task
+    return results, max(lags, default=0.0), elapsed
+
+
+def test_concurrent_logins_do_not_block_event_loop():
+    async def scenario():
+        hashed = await security.get_password_hash_async("secreta-123")
+        return await _max_loop_lag_during(
+            lambda: asyncio.gather(*(security.verify_password_async("secreta-123", hashed) for _ in range(8)))
+        )
+
+    results, max_lag, elapsed = asyncio.run(scenario())
+    assert all(results)
+    # Las 8 verificaciones tardan bastante mas que el lag tolerado; en el loop lo bloquearian.
+    assert elapsed > MAX_LOOP_LAG_SECONDS
+    assert max_lag < MAX_LOOP_LAG_SECONDS
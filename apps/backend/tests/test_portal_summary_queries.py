@@ -0,0 +1,76 @@
+from datetime import date, datetime, time, timedelta
+
+from app.pms.models import Attendance, Course, Enrollment, Payment, Student, Tenant
+from app.pms.rollups import refresh_enrollment_rollups
+from app.routers.pms_students import _build_student_portal_summary
+from tests.conftest import capture_queries
+
+
+# Presupuesto del resumen del portal: alumno/tenant, matriculas con rollups y asistencia
+# agrupada, asistencia reciente y pagos, sin importar cuantas matriculas tenga el alumno.
+MAX_PORTAL_SUMMARY_QUERIES = 4
+
+
+async def _seed_student(db, enrollments: int) -> tuple[int, int]:
+    today = date.today()
+    tenant = Tenant(name="Academia", slug=f"academia-{enrollments}")
+    db.add(tenant)
+    await db.flush()
+    student = Student(tenant_id=tenant.id, first_name="Ana", last_name="Perez")
+    db.add(student)
+    await db.flush()
+    for i in range(enrollments):
+        course = Course(tenant_id=tenant.id, name=f"Curso {i}", day_of_week=i % 7, day_of_week_2=(i + 3) % 7)
+        db.add(course)
+        await db.flush()
+        db.add(
+            Enrollment(
+                tenant_id=tenant.id,
+                student_id=student.id,
+                course_id=course.id,
+                start_date=today - timedelta(days=20),
+                end_date=today + timedelta(days=8),
+            )
+        )
+        for days_ago in (1, 4, 8):
+            db.add(
+                Attendance(
+                    tenant_id=tenant.id,
+                    student_id=student.id,
+                    course_id=course.id,
+                    attended_at=datetime.combine(today - timedelta(days=days_ago), time(18, 0)),
+                )
+            )
+        db.add(
+            Payment(
+                tenant_id=tenant.id,
+                student_id=student.id,
+                course_id=course.id,
+                amount=20000,
+                payment_date=today - timedelta(days=20),
+                method="cash",
+                type="monthly",
+            )
+        )
+    await db.flush()
+    # Como los endpoints de asistencia y matriculas: los rollups quedan al dia
+    await refresh_enrollment_rollups(db, tenant.id)
+    await db.commit()
+    return tenant.id, student.id
+
+
+def test_portal_summary_query_count_does_not_grow_with_enrollments(pg):
+    async def scenario(db, engine):
+        counts = {}
+        for enrollments in (1, 6):
+            tenant_id, student_id = await _seed_student(db, enrollments)
+            db.expunge_all()
+            with capture_queries(engine) as queries:
+                summary = await _build_student_portal_summary(db, tenant_id, student_id)
+            assert len(summary["enrollments"]) == enrollments
+            counts[enrollments] = len(queries)
+        return counts
+
+    counts = pg(scenario)
+    assert counts[1] == counts[6]
+    assert counts[6] <= MAX_PORTAL_SUMMARY_QUERIES
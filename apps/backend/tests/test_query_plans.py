@@ -0,0 +1,132 @@
+import json
+
+from sqlalchemy import select, text
+
+from app.pms.models import Enrollment
+from app.pms.rollups import refresh_enrollment_rollups
+from app.pms.session_presence import count_active_sessions
+from app.routers.pms_attendance import attendance_today
+from app.routers.pms_course_status import _load_course_entries
+from app.routers.pms_dashboard import get_summary
+from app.routers.pms_students import _build_student_portal_summary, list_students
+from tests.benchmarks.conftest import seed_attendance_history
+from tests.conftest import capture_queries
+
+
+# Con enable_seqscan=off Postgres solo elige un Seq Scan si ningun indice sirve a la consulta.
+# Ademas cada consulta caliente debe leer con el indice compuesto o parcial pensado para ella
+# (migraciones b17c8d9e0f1a y e4a5b6c7d8e9), no con otro indice de una sola columna.
+EXPECTED_INDEXES = {
+    # matriculas vigentes / por vencer y pagos del mes
+    "dashboard": {"ix_enrollments_tenant_active_end", "ix_payments_tenant_date_created_id"},
+    # asistencia del periodo, clases sueltas y pagos por tipo de cada matricula
+    "course_status": {
+        "ix_attendance_tenant_student_course_at",
+        "ix_attendance_single_class",
+        "ix_payments_tenant_type_student_course",
+    },
+    # asistencia por alumno/curso del resumen y de los destacados
+    "portal": {"ix_attendance_tenant_student_course_at"},
+    # asistencia de hoy de un curso (pantalla de marcar asistencia)
+    "attendance_today": {"ix_attendance_tenant_course_at"},
+    # cursor joined_at/created_at/id y flag de matricula pagada
+    "student_list": {"ix_students_tenant_joined_created_id", "ix_payments_registration_student"},
+    # limite de sesiones presentes al hacer login
+    "session_presence": {"ix_user_sessions_presence"},
+}
+
+
+def _plan_nodes(plan: dict) -> list[dict]:
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+
+async def _seed_tenant(db) -> tuple[int, int, int]:
+    """Cuatro tenants de 300 alumnos con historial, matriculas vencidas/inactivas, pagos de
+    matricula y mensuales, clases sueltas y sesiones: con estadisticas reales el planificador
+    elige entre los indices por selectividad y no por tamano."""
+    tenant_id, *_others = await seed_attendance_history(
+        db, tenants=4, students_per_tenant=300, courses_per_tenant=3, rows_per_enrollment=40
+    )
+    for statement in (
+        "UPDATE enrollments SET is_active = false WHERE id % 4 = 0",
+        "UPDATE enrollments SET end_date = current_date - (id % 90) WHERE id % 4 = 1",
+        "INSERT INTO payments (tenant_id, student_id, course_id, amount, payment_date, method, type, created_at, updated_at) "
+        "SELECT e.tenant_id, e.student_id, e.course_id, 20000, current_date - (e.id % 120), 'cash', "
+        "CASE WHEN e.id % 5 = 0 THEN 'registration' ELSE 'monthly' END, now(), now() FROM enrollments e",
+        "INSERT INTO attendance (tenant_id, student_id, course_id, attended_at, is_recovery, notes) "
+        "SELECT e.tenant_id, e.student_id, e.course_id, e.start_date - 30 + time '19:00', false, 'clase_suelta' "
+        "FROM enrollments e WHERE e.id % 3 = 0",
+        "INSERT INTO users (email, hashed_password, is_active, is_superuser, role, tenant_id, created_at, updated_at) "
+        "SELECT 'plan' || t.id || '@example.com', 'x', true, false, 'admin', t.id, now(), now() FROM tenants t",
+        "INSERT INTO user_sessions (tenant_id, user_id, token_jti, created_at, last_seen_at, expires_at, revoked_at) "
+        "SELECT u.tenant_id, u.id, 'plan-' || u.id || '-' || g.n, now(), now() - g.n * interval '1 minute', "
+        "now() + interval '1 day', CASE WHEN g.n % 2 = 0 THEN now() END FROM users u CROSS JOIN generate_series(1, 200) AS g(n)",
+    ):
+        await db.execute(text(statement))
+    await refresh_enrollment_rollups(db, tenant_id)
+    await db.commit()
+    student_id, course_id = (
+        await db.execute(
+            select(Enrollment.student_id, Enrollment.course_id)
+            .where(Enrollment.tenant_id == tenant_id)
+            .order_by(Enrollment.id)
+            .limit(1)
+        )
+    ).one()
+    return tenant_id, student_id, course_id
+
+
+def test_hot_queries_use_their_indexes(pg):
+    async def scenario(db, engine):
+        tenant_id, student_id, course_id = await _seed_tenant(db)
+        db.expunge_all()
+        calls = {
+            "dashboard": lambda: get_summary(tenant_id=tenant_id, db=db),
+            "course_status": lambda: _load_course_entries(db, tenant_id, True, None),
+            "portal": lambda: _build_student_portal_summary(db, tenant_id, student_id),
+            "attendance_today": lambda: attendance_today(course_id=course_id, tenant_id=tenant_id, db=db),
+            "student_list": lambda: list_students(
+                tenant_id=tenant_id,
+                db=db,
+                q=None,
+                limit=20,
+                offset=0,
+                joined_sort="desc",
+                name_sort=None,
+                cursor=None,
+                with_totals=False,
+                stream=False,
+            ),
+            "session_presence": lambda: count_active_sessions(db, tenant_id),
+        }
+        captured = {}
+        for name, call in calls.items():
+            with capture_queries(engine) as queries:
+                await call()
+            captured[name] = queries
+
+        conn = await db.connection()
+        await conn.exec_driver_sql("ANALYZE")
+        await conn.exec_driver_sql("SET enable_seqscan = off")
+        plans = {}
+        for name, queries in captured.items():
+            plans[name] = []
+            for statement, parameters in queries:
+                result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+                plan = result.scalar()
+                plans[name].append((statement, json.loads(plan) if isinstance(plan, str) else plan))
+        return plans
+
+    plans = pg(scenario)
+    for name, expected in EXPECTED_INDEXES.items():
+        assert plans[name], f"{name} no ejecuto consultas"
+        used_indexes = set()
+        for statement, plan in plans[name]:
+            nodes = _plan_nodes(plan[0]["Plan"])
+            seq_scans = [node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"]
+            assert not seq_scans, f"{name}: Seq Scan sobre {seq_scans} en: {statement[:200]}"
+            used_indexes.update(node["Index Name"] for node in nodes if node.get("Index Name"))
+        assert expected <= used_indexes, f"{name}: faltan {expected - used_indexes}, usa {sorted(used_indexes)}"
@@ -0,0 +1,49 @@
+from sqlalchemy import select
+
+from app.pms.models import Course, Enrollment, EnrollmentAttendanceRollup
+from app.pms.rollups import get_enrollment_rollups
+from app.pms.schemas import CourseUpdate
+from app.routers.pms_courses import update_course
+from tests.conftest import capture_queries
+from tests.test_portal_summary_queries import _seed_student
+
+
+async def _enrollment_rows(db, tenant_id):
+    rows = await db.execute(
+        select(Enrollment, Course).join(Course, Course.id == Enrollment.course_id).where(Enrollment.tenant_id == tenant_id)
+    )
+    return [tuple(row) for row in rows.all()]
+
+
+def test_rollup_reads_do_not_aggregate_attendance(pg):
+    async def scenario(db, engine):
+        tenant_id, _student_id = await _seed_student(db, 3)
+        rows = await _enrollment_rows(db, tenant_id)
+        with capture_queries(engine) as queries:
+            rollups = await get_enrollment_rollups(db, tenant_id, rows)
+        return rollups, [statement for statement, _params in queries]
+
+    rollups, statements = pg(scenario)
+    assert len(rollups) == 3
+    assert all(item["attended_in_period"] == 3 for item in rollups.values())
+    assert len(statements) == 1
+    assert "attendance " not in statements[0].replace("enrollment_attendance_rollups", "")
+
+
+def test_update_course_refreshes_rollups(pg):
+    async def scenario(db, engine):
+        tenant_id, _student_id = await _seed_student(db, 1)
+        (enr, course), = await _enrollment_rows(db, tenant_id)
+        await update_course(course.id, CourseUpdate(name=course.name, total_classes=12), tenant_id=tenant_id, db=db)
+        db.expunge_all()
+        row = await db.get(EnrollmentAttendanceRollup, enr.id)
+        rows = await _enrollment_rows(db, tenant_id)
+        with capture_queries(engine) as queries:
+            await get_enrollment_rollups(db, tenant_id, rows)
+        return row.expected_classes, row.course_updated_at == rows[0][1].updated_at, len(queries)
+
+    expected, up_to_date, query_count = pg(scenario)
+    assert expected == 12
+    # La fila refleja el curso editado: la lectura no recalcula desde asistencia
+    assert up_to_date
+    assert query_count == 1
@@ -0,0 +1,143 @@
+import random
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from app.pms.schedule import (
+    WEEKDAY_ATTRS,
+    class_dates_between,
+    count_weekdays,
+    count_weekdays_many,
+    course_weekdays,
+    next_class_date,
+    next_payment_period,
+    nth_class_date,
+    period_end_for_course,
+)
+
+
+# Comparacion contra un recorrido dia por dia sobre entradas aleatorias.
+RNG = random.Random(20261017)
+BASE = date(2024, 1, 1)
+
+
+def _brute_dates(start: date, end: date, weekdays) -> list[date]:
+    days = set(weekdays)
+    result = []
+    current = start
+    while current <= end:
+        if current.weekday() in days:
+            result.append(current)
+        current += timedelta(days=1)
+    return result
+
+
+# Implementaciones anteriores (pms_students/pms_mercadopago), dia por dia con tope de 370 dias.
+def _baseline_next_course_date(after_date: date, course) -> date:
+    days = course_weekdays(course)
+    if not days:
+        return after_date + timedelta(days=1)
+    current = after_date + timedelta(days=1)
+    for _ in range(14):
+        if current.weekday() in days:
+            return current
+        current += timedelta(days=1)
+    return after_date + timedelta(days=1)
+
+
+def _baseline_period_end_for_course(start: date, course) -> date:
+    total_classes = int(getattr(course, "total_classes", None) or 4)
+    if total_classes <= 1:
+        return start
+    days = course_weekdays(course)
+    if not days:
+        return start + timedelta(days=21)
+    class_dates: list[date] = []
+    current = start
+    guard = 0
+    while len(class_dates) < total_classes and guard < 370:
+        if current.weekday() in days:
+            class_dates.append(current)
+        current += timedelta(days=1)
+        guard += 1
+    return class_dates[-1] if class_dates else start + timedelta(days=21)
+
+
+def _baseline_next_payment_period(enrollment, course, today_dt: date) -> tuple[date, date]:
+    if enrollment.end_date:
+        start = _baseline_next_course_date(enrollment.end_date, course)
+    else:
+        start = today_dt
+    if start < today_dt:
+        start = today_dt if today_dt.weekday() in course_weekdays(course) else _baseline_next_course_date(today_dt - timedelta(days=1), course)
+    return start, _baseline_period_end_for_course(start, course)
+
+
+def _random_course():
+    values = {attr: RNG.choice([None, RNG.randrange(7)]) for attr in WEEKDAY_ATTRS}
+    values["total_classes"] = RNG.choice([None, 0, 1, 2, 4, 8, 12, RNG.randrange(1, 200), 500000])
+    return SimpleNamespace(**values)
+
+
+def _random_case():
+    start = BASE + timedelta(days=RNG.randrange(0, 800))
+    end = start + timedelta(days=RNG.randrange(-5, 120))
+    weekdays = RNG.sample(range(7), RNG.randrange(0, 8))
+    return start, end, weekdays
+
+
+def test_count_weekdays_matches_day_by_day():
+    for _ in range(3000):
+        start, end, weekdays = _random_case()
+        assert count_weekdays(start, end, weekdays) == len(_brute_dates(start, end, weekdays))
+
+
+def test_count_weekdays_many_matches_single():
+    cases = [_random_case() for _ in range(500)]
+    assert count_weekdays_many(cases) == [count_weekdays(*case) for case in cases]
+
+
+def test_class_dates_match_day_by_day():
+    for _ in range(1000):
+        start, end, weekdays = _random_case()
+        expected = _brute_dates(start, end, weekdays)
+        assert list(class_dates_between(start, end, weekdays)) == expected
+        for n, day in enumerate(expected, start=1):
+            assert nth_class_date(start, n, weekdays) == day
+        if weekdays:
+            following = _brute_dates(start + timedelta(days=1), start + timedelta(days=7), weekdays)
+            assert next_class_date(start, weekdays) == following[0]
+        else:
+            assert nth_class_date(start, 1, weekdays) is None
+
+
+def test_period_end_matches_previous_implementation():
+    for _ in range(3000):
+        start = BASE + timedelta(days=RNG.randrange(0, 800))
+        course = _random_course()
+        assert period_end_for_course(start, course) == _baseline_period_end_for_course(start, course)
+
+
+def test_period_end_is_capped_at_370_days():
+    # 2026-01-05 es lunes: 60 clases semanales exceden el tope y terminan en el ultimo lunes dentro de el
+    course = SimpleNamespace(**{attr: None for attr in WEEKDAY_ATTRS}, total_classes=60)
+    course.day_of_week = 0
+    assert period_end_for_course(date(2026, 1, 5), course) == date(2027, 1, 4)
+    course.total_classes = 500000
+    assert period_end_for_course(date(2026, 1, 5), course) == date(2027, 1, 4)
+
+
+def test_next_payment_period_matches_previous_implementation():
+    for _ in range(3000):
+        course = _random_course()
+        today = BASE + timedelta(days=RNG.randrange(0, 800))
+        end_date = RNG.choice([None, today + timedelta(days=RNG.randrange(-60, 60))])
+        enrollment = SimpleNamespace(end_date=end_date)
+        assert next_payment_period(enrollment, course, today) == _baseline_next_payment_period(enrollment, course, today)
+
+
+def test_repeated_weekdays_count_once():
+    # Un curso con el mismo dia en dos columnas tiene una clase ese dia (antes course_status la contaba doble)
+    course = SimpleNamespace(day_of_week=0, day_of_week_2=0, day_of_week_3=2, day_of_week_4=None, day_of_week_5=None)
+    assert course_weekdays(course) == [0, 2]
+    # 2024-01-01 es lunes: 4 lunes y 4 miercoles hasta el 2024-01-28
+    assert count_weekdays(date(2024, 1, 1), date(2024, 1, 28), course_weekdays(course)) == 8
@@ -0,0 +1,44 @@
+from sqlalchemy import select
+
+from app.pms.models import Student, Tenant
+from app.routers.pms_students import _student_search_conditions
+
+
+# La busqueda del listado compara contra search_text (columna generada, sin acentos ni
+# mayusculas): cada termino debe aparecer en nombre, apellido, email o telefono.
+async def _seed(db) -> tuple[int, int]:
+    tenant, other = Tenant(name="Academia", slug="academia"), Tenant(name="Otra", slug="otra")
+    db.add_all([tenant, other])
+    await db.flush()
+    db.add_all(
+        [
+            Student(tenant_id=tenant.id, first_name="José", last_name="Núñez", email="jose@example.com"),
+            Student(tenant_id=tenant.id, first_name="Ana", last_name="Pérez", phone="+56 9 1234 5678"),
+            Student(tenant_id=tenant.id, first_name="Josefina", last_name="Rojas"),
+            Student(tenant_id=other.id, first_name="José", last_name="Núñez"),
+        ]
+    )
+    await db.commit()
+    return tenant.id, other.id
+
+
+def test_list_search_is_accent_and_case_insensitive(pg):
+    async def scenario(db, engine):
+        tenant_id, _other_id = await _seed(db)
+
+        async def names(q: str) -> set[str]:
+            rows = await db.execute(
+                select(Student.first_name)
+                .where(Student.tenant_id == tenant_id, *_student_search_conditions(q))
+            )
+            return set(rows.scalars())
+
+        return {q: await names(q) for q in ("JOSE", "jose nunez", "núñez", "perez 1234", "example.com", "zzz")}
+
+    results = pg(scenario)
+    assert results["JOSE"] == {"José", "Josefina"}
+    assert results["jose nunez"] == {"José"}
+    assert results["núñez"] == {"José"}
+    assert results["perez 1234"] == {"Ana"}
+    assert results["example.com"] == {"José"}
+    assert results["zzz"] == set()